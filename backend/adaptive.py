@@ -0,0 +1,95 @@
+import logging
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+import lambda_modules  # noqa: F401
+from aws_metrics import THROTTLE_CODES
+
+logger = logging.getLogger(__name__)
+
+
+def is_throttle_code(code):
+    return code in THROTTLE_CODES
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and is_throttle_code(error.response.get("Error", {}).get("Code"))
+
+
+def backoff_delay(attempt, base=0.2, cap=10.0):
+    # equal jitter: 최소 절반은 기다리고 나머지는 무작위로 흩어 동시 재시도가 몰리지 않게 한다
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# AIMD 동시성 제어: 성공하면 천천히 늘리고 (창마다 +1) 스로틀이면 절반으로 줄인다.
+# 계정/파티션이 허용하는 최대 속도 근처에서 자동으로 머문다.
+class AdaptiveConcurrency:
+    def __init__(self, name, initial=4, minimum=1, maximum=32, decrease_factor=0.5,
+                 cooldown=1.0, max_throttle_retries=10):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.max_throttle_retries = max_throttle_retries
+        self._limit = float(max(minimum, min(initial, maximum)))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.successes = 0
+        self.throttles = 0
+        self.peak = self.limit
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self._limit))
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                now = time.monotonic()
+                # 같은 혼잡 구간에 동시에 돌아온 스로틀들로 여러 번 줄이지 않도록 쿨다운 동안 한 번만 감소
+                if now - self._last_decrease >= self.cooldown:
+                    before = self.limit
+                    self._limit = max(float(self.minimum), self._limit * self.decrease_factor)
+                    self._last_decrease = now
+                    logger.warning(f"🐢 [{self.name}] 스로틀 감지: 동시성 {before} → {self.limit}")
+            else:
+                self.successes += 1
+                self._limit = min(float(self.maximum), self._limit + 1.0 / self._limit)
+                self.peak = max(self.peak, self.limit)
+            self._cond.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        # 스로틀 오류는 동시성을 줄이고 백오프 후 다시 시도한다. 그 밖의 오류는 그대로 올린다
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttle(e)
+                self.release(throttled=throttled)
+                if not throttled or attempt >= self.max_throttle_retries:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            self.release()
+            return result
+
+    def stats(self):
+        with self._cond:
+            return {"limit": self.limit, "peak": self.peak, "successes": self.successes, "throttles": self.throttles}
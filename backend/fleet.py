@@ -0,0 +1,165 @@
+# 여러 계정/환경/리전의 상태 백엔드를 매니페스트 하나로 동시에 프로비저닝
+#
+# 매니페스트 예시 (YAML 또는 JSON):
+#   max_workers: 8            # 동시에 처리할 백엔드 수
+#   region_concurrency: 2     # 리전별 동시 처리 상한 (API 속도 제한 보호)
+#   defaults:
+#     ddb_table: terraform-lock
+#     repo_owner: your-org
+#   backends:
+#     - name: prod-apne2
+#       region: ap-northeast-2
+#       bucket_name: prod-terraform-state
+#       repo_name: infra
+#       profile: prod          # 선택: 계정별 AWS 프로필
+#       mode: reconcile        # 선택: provision(기본) | reconcile
+#       snapshot_buckets: [prod-pre-state, prod-post-state]  # 선택: CI 역할이 상태 스냅샷을 올릴 버킷
+#
+# 사용법: python backend/fleet.py backends.yaml [--report fleet_report.json]
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+import lambda_modules  # noqa: F401
+from aws_metrics import metrics
+from provisioning import backend_bootstrap_steps, failed_steps, run_provisioning
+from reconcile import BackendReconciler
+from terraform_backend_minimum import TerraformBackendManager
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("YAML 매니페스트를 읽으려면 PyYAML이 필요합니다 (pip install pyyaml)")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    if not isinstance(manifest, dict) or not manifest.get("backends"):
+        raise ValueError(f"매니페스트에 backends 목록이 없습니다: {path}")
+    return manifest
+
+
+# (프로필, 리전, 서비스)별로 클라이언트를 한 번만 만들어 모든 백엔드가 공유한다
+class ClientPool:
+    def __init__(self, max_pool_connections=20):
+        self._config = Config(max_pool_connections=max_pool_connections)
+        self._sessions = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, profile, region, service):
+        key = (profile, region, service)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                session = self._sessions.get(profile)
+                if session is None:
+                    session = boto3.session.Session(profile_name=profile)
+                    self._sessions[profile] = session
+                client = session.client(service, region_name=region, config=self._config)
+                self._clients[key] = client
+            return client
+
+    def factory(self, profile):
+        return lambda region, service: self.client(profile, region, service)
+
+
+class FleetProvisioner:
+    def __init__(self, manifest, client_pool=None):
+        self.defaults = manifest.get("defaults", {})
+        self.backends = [dict(self.defaults, **backend) for backend in manifest["backends"]]
+        self.max_workers = int(manifest.get("max_workers", 8))
+        self.region_concurrency = int(manifest.get("region_concurrency", 2))
+        self.clients = client_pool or ClientPool()
+        self._region_slots = {}
+        self._slots_lock = threading.Lock()
+
+    def _region_slot(self, region):
+        with self._slots_lock:
+            slot = self._region_slots.get(region)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.region_concurrency)
+                self._region_slots[region] = slot
+            return slot
+
+    def _provision_one(self, backend):
+        name = backend.get("name") or f"{backend.get('region')}/{backend.get('bucket_name')}"
+        report = {"name": name, "region": backend.get("region"), "bucket_name": backend.get("bucket_name"),
+                  "mode": backend.get("mode", "provision"), "status": "failed", "elapsed": 0.0}
+        started = time.monotonic()
+        try:
+            with self._region_slot(backend["region"]):
+                manager = TerraformBackendManager(
+                    backend["region"], backend["bucket_name"],
+                    ddb_table=backend.get("ddb_table", "terraform-lock"),
+                    client_factory=self.clients.factory(backend.get("profile")),
+                    snapshot_buckets=backend.get("snapshot_buckets", ()),
+                )
+                if report["mode"] == "reconcile":
+                    result = BackendReconciler(manager, backend.get("repo_owner"), backend.get("repo_name")).reconcile()
+                    report["steps"] = result
+                    report["status"] = "failed" if result["failed"] else "ok"
+                else:
+                    steps = backend_bootstrap_steps(manager, backend.get("repo_owner"), backend.get("repo_name"))
+                    results, _ = run_provisioning(steps)
+                    report["steps"] = {step: {"status": value["status"], "elapsed": round(value["elapsed"], 2)}
+                                       for step, value in results.items()}
+                    report["status"] = "failed" if failed_steps(results) else "ok"
+        except Exception as e:
+            # 한 백엔드의 실패가 나머지를 멈추지 않도록 결과에만 기록
+            logger.error(f"❗ [{name}] 프로비저닝 실패: {str(e)}")
+            report["error"] = str(e)
+        report["elapsed"] = round(time.monotonic() - started, 2)
+        logger.info(f"⏱️ [{name}] {report['status']} ({report['elapsed']}초)")
+        return report
+
+    def run(self):
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            reports = list(pool.map(self._provision_one, self.backends))
+        return {
+            "total_elapsed": round(time.monotonic() - started, 2),
+            "succeeded": sum(1 for report in reports if report["status"] == "ok"),
+            "failed": sum(1 for report in reports if report["status"] != "ok"),
+            "backends": reports,
+        }
+
+
+def print_fleet_report(summary):
+    print(f"\n📋 백엔드 {len(summary['backends'])}개: 성공 {summary['succeeded']} / 실패 {summary['failed']} "
+          f"(전체 {summary['total_elapsed']}초)")
+    for report in summary["backends"]:
+        mark = "✅" if report["status"] == "ok" else "❌"
+        detail = f" - {report['error']}" if report.get("error") else ""
+        print(f"  {mark} {report['name']:<32} {report['region'] or '-':<16} {report['elapsed']:>7.1f}초{detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="매니페스트 기반 Terraform 상태 백엔드 일괄 프로비저닝")
+    parser.add_argument("manifest")
+    parser.add_argument("--report", default="fleet_report.json")
+    args = parser.parse_args()
+
+    summary = FleetProvisioner(load_manifest(args.manifest)).run()
+    print_fleet_report(summary)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"\n🧾 결과 저장: {args.report}")
+    print("\n" + metrics.summary_table())
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,12 @@
+# backend 도구가 Lambda 모듈(aws_metrics, state_codec, tfstate_reader ...)을 Lambda zip 안과 같은 평탄한 이름으로
+# import 하도록 backend/lambda_package를 모듈 경로에 한 번 추가한다.
+# Lambda 모듈끼리도 평탄한 이름으로 import 하므로, 모두 같은 이름을 써야 모듈(과 호출 통계)이 한 번만 로드된다.
+#
+# 사용법: import lambda_modules  # noqa: F401  (Lambda 모듈 import 전에)
+import os
+import sys
+
+LAMBDA_PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lambda_package")
+
+if LAMBDA_PACKAGE_DIR not in sys.path:
+    sys.path.append(LAMBDA_PACKAGE_DIR)
@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+
+# 재시도를 유발하는 속도 제한 오류 코드
+THROTTLE_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "TooManyRequestsException", "RequestLimitExceeded",
+    "SlowDown", "ProvisionedThroughputExceededException",
+    "LimitExceededException", "BandwidthLimitExceeded", "EC2ThrottledException",
+}
+
+# 지연 시간 히스토그램 구간 상한 (ms). 마지막 칸은 그 이상 전부
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_STARTED_KEY = "aws_metrics_started"
+
+
+class OperationStats:
+    __slots__ = ("calls", "errors", "retries", "throttles", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, latency_ms):
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        for i, upper in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= upper:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, ratio):
+        # 히스토그램에서 구간 상한으로 근사한 백분위수
+        target = self.calls * ratio
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+# 프로세스 전체에서 공유하는 작업별 AWS 호출 통계
+class AwsMetrics:
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, service, operation):
+        key = (service, operation)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = OperationStats()
+        return stats
+
+    def record_call(self, service, operation, latency_ms, retries=0, error_code=None):
+        with self._lock:
+            stats = self._get(service, operation)
+            stats.calls += 1
+            stats.retries += retries
+            if error_code:
+                stats.errors += 1
+            stats.observe(latency_ms)
+
+    def record_throttle(self, service, operation):
+        with self._lock:
+            self._get(service, operation).throttles += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: stats for key, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def summary_table(self):
+        rows = self.snapshot()
+        if not rows:
+            return "📈 AWS 호출 없음"
+        lines = [
+            "📈 AWS 호출 요약",
+            f"  {'서비스.작업':<40} {'호출':>6} {'오류':>5} {'재시도':>6} {'스로틀':>6} "
+            f"{'평균ms':>8} {'p95ms':>8} {'최대ms':>8}",
+        ]
+        for (service, operation), stats in sorted(rows.items(), key=lambda item: -item[1].total_ms):
+            average = stats.total_ms / stats.calls if stats.calls else 0.0
+            lines.append(
+                f"  {service + '.' + operation:<40} {stats.calls:>6} {stats.errors:>5} {stats.retries:>6} "
+                f"{stats.throttles:>6} {average:>8.1f} {stats.percentile(0.95):>8.0f} {stats.max_ms:>8.1f}"
+            )
+        total_calls = sum(stats.calls for stats in rows.values())
+        total_ms = sum(stats.total_ms for stats in rows.values())
+        lines.append(f"  합계: {total_calls}회 호출, 누적 {total_ms / 1000:.1f}초")
+        return "\n".join(lines)
+
+    def emf_documents(self, namespace, dimensions=None):
+        # CloudWatch Embedded Metric Format: 작업마다 한 줄씩, 로그로 출력하면 지표가 된다
+        dimensions = dict(dimensions or {})
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for (service, operation), stats in self.snapshot().items():
+            document = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [{
+                        "Namespace": namespace,
+                        "Dimensions": [list(dimensions) + ["Service", "Operation"]],
+                        "Metrics": [
+                            {"Name": "Calls", "Unit": "Count"},
+                            {"Name": "Errors", "Unit": "Count"},
+                            {"Name": "Retries", "Unit": "Count"},
+                            {"Name": "Throttles", "Unit": "Count"},
+                            {"Name": "LatencyAvg", "Unit": "Milliseconds"},
+                            {"Name": "LatencyMax", "Unit": "Milliseconds"},
+                        ],
+                    }],
+                },
+                "Service": service,
+                "Operation": operation,
+                "Calls": stats.calls,
+                "Errors": stats.errors,
+                "Retries": stats.retries,
+                "Throttles": stats.throttles,
+                "LatencyAvg": round(stats.total_ms / stats.calls, 2) if stats.calls else 0.0,
+                "LatencyMax": round(stats.max_ms, 2),
+                "LatencyHistogram": dict(zip([f"le_{upper}" for upper in LATENCY_BUCKETS_MS] + ["gt_max"],
+                                             stats.buckets)),
+            }
+            document.update(dimensions)
+            documents.append(document)
+        return documents
+
+    def emit_emf(self, namespace, dimensions=None, reset=True):
+        for document in self.emf_documents(namespace, dimensions):
+            print(json.dumps(document, ensure_ascii=False))
+        if reset:
+            self.reset()
+
+
+metrics = AwsMetrics()
+
+
+def emit_lambda_metrics(namespace, context=None, registry=None):
+    # Lambda 호출 하나의 집계를 EMF로 내보내고 비운다. Lambda 밖(로컬 실행, 벤치마크)에서는 비우기만 한다
+    registry = registry or metrics
+    if not os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        registry.reset()
+        return
+    function_name = getattr(context, "function_name", None) or os.environ["AWS_LAMBDA_FUNCTION_NAME"]
+    registry.emit_emf(namespace, {"FunctionName": function_name})
+
+
+def _operation(event_name):
+    # 이벤트 이름 형식: after-call.<service>.<Operation>
+    _, service, operation = event_name.split(".", 2)
+    return service, operation
+
+
+def instrument_client(client, registry=None):
+    registry = registry or metrics
+    events = client.meta.events
+
+    def before_call(event_name, context=None, **kwargs):
+        if context is not None:
+            context[_STARTED_KEY] = time.perf_counter()
+
+    def after_call(event_name, parsed=None, context=None, **kwargs):
+        started = (context or {}).get(_STARTED_KEY)
+        if started is None:
+            return
+        metadata = (parsed or {}).get("ResponseMetadata", {})
+        error_code = (parsed or {}).get("Error", {}).get("Code")
+        service, operation = _operation(event_name)
+        registry.record_call(service, operation, (time.perf_counter() - started) * 1000,
+                             retries=metadata.get("RetryAttempts", 0), error_code=error_code)
+
+    def after_call_error(event_name, exception=None, context=None, **kwargs):
+        started = (context or {}).get(_STARTED_KEY)
+        if started is None:
+            return
+        service, operation = _operation(event_name)
+        registry.record_call(service, operation, (time.perf_counter() - started) * 1000,
+                             error_code=type(exception).__name__)
+
+    def needs_retry(event_name, response=None, **kwargs):
+        # 시도마다 호출되므로 재시도된 스로틀까지 모두 센다. 재시도 여부 결정에는 관여하지 않는다
+        if response is None:
+            return None
+        parsed = response[1] or {}
+        if parsed.get("Error", {}).get("Code") in THROTTLE_CODES:
+            service, operation = _operation(event_name)
+            registry.record_throttle(service, operation)
+        return None
+
+    # unique_id 덕분에 같은 클라이언트를 여러 번 계측해도 핸들러는 한 번만 등록된다
+    events.register("before-call.*.*", before_call, unique_id="aws-metrics-before-call")
+    events.register("after-call.*.*", after_call, unique_id="aws-metrics-after-call")
+    events.register("after-call-error.*.*", after_call_error, unique_id="aws-metrics-after-call-error")
+    events.register("needs-retry.*.*", needs_retry, unique_id="aws-metrics-needs-retry")
+    return client
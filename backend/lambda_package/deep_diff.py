@@ -0,0 +1,159 @@
+import hashlib
+import json
+import re
+from collections import defaultdict
+
+# 리소스 하나당 보고할 최대 변경 경로 수와 값 표시 길이
+MAX_CHANGES_PER_RESOURCE = 20
+MAX_VALUE_CHARS = 120
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+
+
+# 경로 단위 변경 하나 (kind: added / removed / changed)
+class Change:
+    __slots__ = ("path", "kind", "before", "after")
+
+    def __init__(self, path, kind, before=None, after=None):
+        self.path = path
+        self.kind = kind
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return f"Change({self.path!r}, {self.kind!r})"
+
+
+def decode_json_string(value):
+    # IAM 정책 등 JSON 문자열로 저장된 속성은 구조로 풀어서 비교한다
+    if isinstance(value, str) and value[:1] in ("{", "[") and value[-1:] in ("}", "]"):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(decoded, (dict, list)):
+            return decoded
+    return value
+
+
+def join_path(path, key):
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    if not _IDENTIFIER.match(key):
+        return f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+    return f"{path}.{key}" if path else key
+
+
+def format_value(value, limit=MAX_VALUE_CHARS):
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class _Hasher:
+    # 하위 트리 해시를 한 번만 계산해 id로 기억한다. 같은 해시면 그 가지 전체를 O(1)에 건너뛴다
+    def __init__(self):
+        self._memo = {}
+
+    def __call__(self, value):
+        key = id(value)
+        cached = self._memo.get(key)
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        h = hashlib.blake2b(digest_size=16)
+        if isinstance(value, dict):
+            h.update(b"{")
+            for k in sorted(value):
+                h.update(k.encode("utf-8"))
+                h.update(b"\0")
+                h.update(self(value[k]))
+        elif isinstance(value, list):
+            h.update(b"[")
+            for item in value:
+                h.update(self(item))
+        else:
+            h.update(json.dumps(value).encode("utf-8"))
+        digest = h.digest()
+        # 원본 객체도 같이 보관해 diff 도중 id가 재사용되지 않게 한다
+        self._memo[key] = (value, digest)
+        return digest
+
+
+class _DiffWalker:
+    def __init__(self, limit):
+        self.limit = limit
+        self.changes = []
+        self.truncated = 0
+        self.hash = _Hasher()
+
+    def emit(self, change):
+        if len(self.changes) < self.limit:
+            self.changes.append(change)
+        else:
+            self.truncated += 1
+
+    def walk(self, before, after, path):
+        if self.hash(before) == self.hash(after):
+            return
+        before = decode_json_string(before)
+        after = decode_json_string(after)
+        if isinstance(before, dict) and isinstance(after, dict):
+            self._walk_dict(before, after, path)
+        elif isinstance(before, list) and isinstance(after, list):
+            self._walk_list(before, after, path)
+        elif before != after:
+            self.emit(Change(path, "changed", before, after))
+
+    def _walk_dict(self, before, after, path):
+        for key in sorted(set(before) | set(after)):
+            child = join_path(path, key)
+            if key not in after:
+                self.emit(Change(child, "removed", before=before[key]))
+            elif key not in before:
+                self.emit(Change(child, "added", after=after[key]))
+            else:
+                self.walk(before[key], after[key], child)
+
+    def _walk_list(self, before, after, path):
+        if len(before) == len(after):
+            for i, (b, a) in enumerate(zip(before, after)):
+                self.walk(b, a, join_path(path, i))
+            return
+        # 길이가 다르면 같은 원소끼리 먼저 짝짓고 (순서가 바뀐 집합 블록 대비) 남은 것만 보고한다
+        remaining = defaultdict(list)
+        for i, item in enumerate(after):
+            remaining[self.hash(item)].append(i)
+        unmatched_before = []
+        for i, item in enumerate(before):
+            matches = remaining.get(self.hash(item))
+            if matches:
+                matches.pop(0)
+            else:
+                unmatched_before.append(i)
+        unmatched_after = sorted(i for indexes in remaining.values() for i in indexes)
+        for b, a in zip(unmatched_before, unmatched_after):
+            self.walk(before[b], after[a], join_path(path, a))
+        for b in unmatched_before[len(unmatched_after):]:
+            self.emit(Change(join_path(path, b), "removed", before=before[b]))
+        for a in unmatched_after[len(unmatched_before):]:
+            self.emit(Change(join_path(path, a), "added", after=after[a]))
+
+
+def diff_attributes(before, after, limit=MAX_CHANGES_PER_RESOURCE):
+    # (변경 목록, 한도를 넘어 생략된 변경 수)
+    walker = _DiffWalker(limit)
+    walker.walk(before or {}, after or {}, "")
+    return walker.changes, walker.truncated
+
+
+def format_changes(changes, truncated=0):
+    lines = []
+    for change in changes:
+        if change.kind == "added":
+            lines.append(f"    + {change.path}: {format_value(change.after)}")
+        elif change.kind == "removed":
+            lines.append(f"    - {change.path}: {format_value(change.before)}")
+        else:
+            lines.append(f"    • {change.path}: {format_value(change.before)} → {format_value(change.after)}")
+    if truncated:
+        lines.append(f"    … 외 {truncated}건 생략")
+    return lines
@@ -0,0 +1,210 @@
+# 버킷(접두어) 안의 모든 상태 키를 한 번에 훑어, 키마다 최신 버전과 직전 버전을 비교한 요약을 만든다.
+# Lambda에서는 lambda_function의 mode=drift_sweep으로, 로컬에서는 아래처럼 실행한다.
+#   python backend/lambda_package/drift_sweep.py <bucket> [--prefix env:/] [--workers 8]
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from state_history import latest_versions, load_version
+from state_index import classify_resources
+
+logger = logging.getLogger(__name__)
+
+STATE_SUFFIX = ".tfstate"
+# 워크스페이스마다 요약에 보여줄 변경 주소 수
+SAMPLE_ADDRESSES = 5
+# 파싱하는 동안 리소스마다 Python dict/문자열을 만들므로 JSON 원문보다 몇 배 많은 메모리를 쓴다
+PARSE_EXPANSION = 4
+# 압축 해제 크기 메타데이터가 없는 gzip/zstd 스냅샷은 이 비율로 원문 크기를 어림한다 (tfstate는 보통 10~20배 줄어든다)
+COMPRESSION_RATIO_GUESS = 20
+
+
+def workspace_of(key):
+    # Terraform 워크스페이스 상태는 env:/<workspace>/<key>에 저장된다
+    if key.startswith("env:/"):
+        return key.split("/", 2)[1]
+    return "default"
+
+
+def list_state_keys(s3, bucket, prefix=""):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(STATE_SUFFIX):
+                yield obj["Key"], obj["Size"]
+
+
+def default_memory_budget():
+    # Lambda라면 할당 메모리의 절반, 아니면 512MB
+    memory_mb = os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+    if memory_mb:
+        return int(memory_mb) * 1024 * 1024 // 2
+    return 512 * 1024 * 1024
+
+
+# 동시에 메모리에 올라가는 상태 크기의 합을 제한하는 바이트 단위 세마포어
+class MemoryBudget:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._available = max_bytes
+        self._cond = threading.Condition()
+
+    def acquire(self, size):
+        # 한도보다 큰 상태 하나는 혼자서라도 처리할 수 있게 한도로 자른다
+        size = min(size, self.max_bytes)
+        with self._cond:
+            while self._available < size:
+                self._cond.wait()
+            self._available -= size
+        return size
+
+    def release(self, size):
+        with self._cond:
+            self._available += size
+            self._cond.notify_all()
+
+
+class DriftSweep:
+    def __init__(self, s3, bucket, prefix="", max_workers=8, memory_budget=None, cache=None, remaining_ms=None,
+                 margin_ms=5000):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_workers = max_workers
+        self.budget = MemoryBudget(memory_budget or default_memory_budget())
+        self.cache = cache
+        self.remaining_ms = remaining_ms
+        self.margin_ms = margin_ms
+
+    def _out_of_time(self):
+        return self.remaining_ms is not None and self.remaining_ms() < self.margin_ms
+
+    def _parsed_bytes(self, key, version):
+        # 버전 하나를 파싱할 때 필요한 메모리 어림값. 목록의 Size는 압축 스냅샷이면 압축된 크기라
+        # state_snapshot.py가 남긴 tfstate-uncompressed-size 메타데이터를 먼저 본다
+        if version is None or version["IsDeleteMarker"]:
+            return 0
+        head = self.s3.head_object(Bucket=self.bucket, Key=key, VersionId=version["VersionId"])
+        raw_size = head.get("Metadata", {}).get("tfstate-uncompressed-size", "")
+        if raw_size.isdigit():
+            raw = int(raw_size)
+        elif (head.get("ContentEncoding") or "").lower() in ("gzip", "x-gzip", "zstd"):
+            raw = head.get("ContentLength", version["Size"]) * COMPRESSION_RATIO_GUESS
+        else:
+            raw = head.get("ContentLength", version["Size"])
+        return raw * PARSE_EXPANSION
+
+    def _sweep_key(self, key, size):
+        result = {"key": key, "workspace": workspace_of(key), "status": "unchanged",
+                  "added": 0, "removed": 0, "changed": 0}
+        if self._out_of_time():
+            result["status"] = "skipped"
+            return result
+        try:
+            versions = latest_versions(self.s3, self.bucket, key, count=2)
+            if versions and versions[0]["IsDeleteMarker"]:
+                # 목록 조회 뒤에 상태가 지워졌다 (최신이 삭제 마커). 비교하지 않고 요약에 알린다
+                result.update({"status": "deleted", "error": "최신 항목이 삭제 마커 (상태 파일이 삭제됨)"})
+                return result
+            if len(versions) < 2:
+                result["status"] = "new"
+                return result
+            latest, previous = versions
+            # 이전 항목이 삭제 마커면 지웠다가 다시 만든 상태이므로 빈 상태와 비교한다
+            previous_id = None if previous["IsDeleteMarker"] else previous["VersionId"]
+            # 두 버전을 함께 올리므로 둘의 파싱 메모리 어림값을 합쳐 예약한다
+            reserved = self.budget.acquire(self._parsed_bytes(key, latest) + self._parsed_bytes(key, previous))
+            try:
+                pre, pre_meta = load_version(self.s3, self.bucket, key, previous_id, self.cache)
+                post, post_meta = load_version(self.s3, self.bucket, key, latest["VersionId"], self.cache)
+                added, removed, changed = classify_resources(pre, post)
+                del pre, post
+            finally:
+                self.budget.release(reserved)
+            result.update({
+                "status": "changed" if added or removed or changed else "unchanged",
+                "added": len(added), "removed": len(removed), "changed": len(changed),
+                "serial_from": pre_meta.get("serial"), "serial_to": post_meta.get("serial"),
+                "version_from": previous_id, "version_to": latest["VersionId"],
+                "sample": (added + removed + changed)[:SAMPLE_ADDRESSES],
+            })
+        except Exception as e:
+            logger.error(f"❗ {key} 비교 실패: {str(e)}")
+            result.update({"status": "error", "error": str(e)})
+        return result
+
+    def run(self):
+        started = time.monotonic()
+        keys = list(list_state_keys(self.s3, self.bucket, self.prefix))
+        logger.info(f"🔎 s3://{self.bucket}/{self.prefix} 상태 키 {len(keys)}개 비교 시작 "
+                    f"(워커 {self.max_workers}, 메모리 한도 {self.budget.max_bytes // (1024 * 1024)}MB)")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(lambda item: self._sweep_key(*item), keys))
+
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        changed = sorted((r for r in results if r["status"] == "changed"),
+                         key=lambda r: (-(r["added"] + r["removed"] + r["changed"]), r["key"]))
+        return {
+            "bucket": self.bucket,
+            "prefix": self.prefix,
+            "keys": len(results),
+            "counts": counts,
+            "elapsed": round(time.monotonic() - started, 2),
+            "changed": changed,
+            "problems": [r for r in results if r["status"] in ("error", "skipped", "deleted")],
+        }
+
+
+def iter_summary_lines(summary):
+    counts = summary["counts"]
+    yield ""
+    yield "=================== 🌐 Terraform 상태 드리프트 요약 🌐 ==================="
+    yield ""
+    yield f"📁 [버킷]: s3://{summary['bucket']}/{summary['prefix']}"
+    yield (f"📊 상태 키 {summary['keys']}개: 변경 {counts.get('changed', 0)} / 변경 없음 {counts.get('unchanged', 0)} / "
+           f"첫 버전 {counts.get('new', 0)} / 삭제됨 {counts.get('deleted', 0)} / 오류 {counts.get('error', 0)} / "
+           f"시간 초과 {counts.get('skipped', 0)} ({summary['elapsed']}초)")
+    if summary["changed"]:
+        yield ""
+        yield "🔁 변경된 워크스페이스:"
+    for result in summary["changed"]:
+        yield (f"  • [{result['workspace']}] {result['key']}: +{result['added']} -{result['removed']} "
+               f"~{result['changed']} (serial {result['serial_from']} → {result['serial_to']})")
+        for address in result["sample"]:
+            yield f"      {address}"
+    for result in summary["problems"]:
+        reason = result.get("error") or "시간 부족으로 건너뜀"
+        yield f"  ⚠️ {result['key']}: {reason}"
+    yield ""
+    yield "================================================================"
+
+
+def main():
+    import boto3
+    from botocore.config import Config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="버킷 전체 Terraform 상태 드리프트 요약")
+    parser.add_argument("bucket")
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", help="요약을 JSON으로 저장할 경로")
+    args = parser.parse_args()
+
+    s3 = boto3.client("s3", config=Config(max_pool_connections=args.workers + 2))
+    summary = DriftSweep(s3, args.bucket, args.prefix, max_workers=args.workers).run()
+    for line in iter_summary_lines(summary):
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
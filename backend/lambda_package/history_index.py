@@ -0,0 +1,167 @@
+import gzip
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from state_history import list_versions, load_version
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".history.jsonl.gz"
+INDEX_FORMAT = 1
+# 주소별 다이제스트는 앞 8바이트만 저장한다 (변경 감지용으로 충분, 색인 크기 절반)
+DIGEST_HEX_CHARS = 16
+
+
+def index_key(state_key):
+    return state_key + INDEX_SUFFIX
+
+
+def short_digest(record):
+    return record.digest.hex()[:DIGEST_HEX_CHARS]
+
+
+# 상태 키의 모든 버전에 대한 이력 색인.
+# JSONL 한 줄이 버전 하나이고, 앞 버전 대비 추가/삭제/변경된 주소만 담는다 (추가만 하는 로그).
+# 처음부터 다시 재생하면 어느 시점의 주소별 다이제스트든 복원할 수 있다.
+class HistoryIndex:
+    def __init__(self, state_key, entries=None):
+        self.state_key = state_key
+        self.entries = []
+        self._known = set()
+        self._current = {}
+        for entry in entries or []:
+            self._apply(entry)
+
+    def _apply(self, entry):
+        for address in entry.get("removed", []):
+            self._current.pop(address, None)
+        self._current.update(entry.get("added", {}))
+        self._current.update(entry.get("changed", {}))
+        self.entries.append(entry)
+        self._known.add(entry["version_id"])
+
+    def knows(self, version_id):
+        return version_id in self._known
+
+    def append(self, version, meta, digests):
+        # digests가 None이면 삭제 마커 (그 시점에 상태 파일이 없음)
+        deleted = digests is None
+        digests = digests or {}
+        entry = {
+            "version_id": version["VersionId"],
+            "last_modified": version["LastModified"].isoformat(),
+            "deleted": deleted,
+            "serial": meta.get("serial"),
+            "lineage": meta.get("lineage"),
+            "terraform_version": meta.get("terraform_version"),
+            "resource_count": len(digests),
+            "added": {a: d for a, d in digests.items() if a not in self._current},
+            "removed": sorted(a for a in self._current if a not in digests),
+            "changed": {a: d for a, d in digests.items() if a in self._current and self._current[a] != d},
+        }
+        self._apply(entry)
+        return entry
+
+    def dumps(self):
+        header = {"format": INDEX_FORMAT, "state_key": self.state_key}
+        lines = [json.dumps(header, separators=(",", ":"))]
+        lines.extend(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) for entry in self.entries)
+        return gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), compresslevel=6)
+
+    @classmethod
+    def loads(cls, state_key, data):
+        lines = gzip.decompress(data).decode("utf-8").splitlines()
+        header = json.loads(lines[0]) if lines else {}
+        if header.get("format") != INDEX_FORMAT:
+            logger.warning(f"⚠️ 이력 색인 형식 불일치 ({header.get('format')}), 새로 만듭니다")
+            return cls(state_key)
+        return cls(state_key, [json.loads(line) for line in lines[1:] if line])
+
+    def address_history(self, address):
+        # 주소가 추가/변경/삭제된 버전 목록 (색인만 읽으므로 상태 파일을 내려받지 않는다)
+        events = []
+        for entry in self.entries:
+            if address in entry.get("added", {}):
+                action = "added"
+            elif address in entry.get("changed", {}):
+                action = "changed"
+            elif address in entry.get("removed", []):
+                action = "removed"
+            else:
+                continue
+            events.append({"action": action, "version_id": entry["version_id"],
+                           "last_modified": entry["last_modified"], "serial": entry.get("serial")})
+        return events
+
+    def versions(self):
+        return [{key: entry.get(key) for key in ("version_id", "last_modified", "deleted", "serial", "lineage",
+                                                   "terraform_version", "resource_count")}
+                for entry in self.entries]
+
+
+def load_index(s3, bucket, state_key):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=index_key(state_key))
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return HistoryIndex(state_key)
+        raise
+    return HistoryIndex.loads(state_key, obj["Body"].read())
+
+
+def save_index(s3, bucket, index):
+    body = index.dumps()
+    s3.put_object(Bucket=bucket, Key=index_key(index.state_key), Body=body,
+                  ContentType="application/x-ndjson", ContentEncoding="gzip")
+    logger.info(f"🗂️ 이력 색인 저장: s3://{bucket}/{index_key(index.state_key)} "
+                f"({len(index.entries)}개 버전, {len(body)} bytes)")
+
+
+def rebase_index(index, ordered):
+    # ordered: 상태 키의 버전 목록 (오래된 순). 색인 항목은 앞 항목 대비 차이라서 중간에 빠진 버전이 있으면
+    # 그 뒤 항목을 그대로 둘 수 없다. 처음 빠진 버전 앞까지만 남기고, 그 이후 버전은 모두 다시 색인한다.
+    # 반환: (남긴 색인, 다시 색인할 버전 목록)
+    first = next((pos for pos, entry in enumerate(ordered) if not index.knows(entry["VersionId"])), None)
+    if first is None:
+        return index, []
+    positions = {entry["VersionId"]: pos for pos, entry in enumerate(ordered)}
+    kept = []
+    for entry in index.entries:
+        # 목록에 없는 버전(수명 주기로 만료된 이전 버전)은 위치를 모르므로 앞쪽 이력으로 남긴다
+        if positions.get(entry["version_id"], -1) >= first:
+            break
+        kept.append(entry)
+    if len(kept) < len(index.entries):
+        logger.warning(f"⚠️ 이력 색인 중간에 빠진 버전이 있어 {len(index.entries) - len(kept)}개 항목을 다시 만듭니다: "
+                       f"{index.state_key}")
+        index = HistoryIndex(index.state_key, kept)
+    return index, ordered[first:]
+
+
+def update_index(s3, bucket, state_key, cache=None, max_workers=4):
+    # 색인에 없는 버전만 내려받아 오래된 순으로 덧붙인다.
+    # 별도 잠금은 두지 않는다. 동시 갱신으로 한쪽 저장이 덮어써지면 그쪽이 덧붙인 버전이 색인에서 빠지는데,
+    # 다음 갱신이 rebase_index로 처음 빠진 버전부터 다시 색인하므로 순서와 차이가 어긋난 채로 남지 않는다.
+    index, pending = rebase_index(load_index(s3, bucket, state_key),
+                                  list(reversed(list_versions(s3, bucket, state_key))))
+    if not pending:
+        logger.info(f"✅ 이력 색인 최신 상태: {state_key} ({len(index.entries)}개 버전)")
+        return index, 0
+
+    def load(entry):
+        if entry["IsDeleteMarker"]:
+            return entry, {}, None
+        resources, meta = load_version(s3, bucket, state_key, entry["VersionId"], cache)
+        # 속성은 바로 버리고 짧은 다이제스트만 남겨 대기 중인 결과의 메모리를 줄인다
+        return entry, meta, {address: short_digest(record) for address, record in resources.items()}
+
+    # 내려받기는 동시에, 덧붙이기는 버전 순서대로
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for entry, meta, digests in pool.map(load, pending):
+            index.append(entry, meta, digests)
+    save_index(s3, bucket, index)
+    logger.info(f"🆕 이력 색인에 {len(pending)}개 버전 추가: {state_key}")
+    return index, len(pending)
@@ -1,9 +1,27 @@
+import time
+
+_INIT_STARTED = time.monotonic()
+
 import boto3
 import json
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
 
+from aws_metrics import emit_lambda_metrics, instrument_client
+from deep_diff import MAX_CHANGES_PER_RESOURCE, diff_attributes, format_changes
+from drift_sweep import DriftSweep, iter_summary_lines
+from history_index import load_index, update_index
+from report import deliver_report
+from state_cache import StateCache
+from state_codec import open_state_body
+from state_history import load_version, resolve_version
+from state_index import classify_resources, extract_resources
+from state_manifest import load_manifest, manifest_matches, manifest_records, save_manifest
+from tfstate_reader import TfstateReader
+from version_cache import VersionCache
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger()
@@ -12,92 +30,271 @@ logger = logging.getLogger()
 SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN", "")
 PRE_DEPLOY_STATE_BUCKET = os.environ.get("PRE_DEPLOY_STATE_BUCKET", "")
 POST_DEPLOY_STATE_BUCKET = os.environ.get("POST_DEPLOY_STATE_BUCKET", "")
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "TerraformStateAutomation")
+DIFF_MAX_CHANGES = int(os.environ.get("DIFF_MAX_CHANGES", str(MAX_CHANGES_PER_RESOURCE)))
+# 보고서가 SNS 한 건(256KB)을 넘으면 여기에 전체 본문을 올리고 링크만 보낸다 (비우면 번호 붙인 여러 건으로 전송)
+REPORT_BUCKET = os.environ.get("REPORT_BUCKET", "")
+REPORT_PREFIX = os.environ.get("REPORT_PREFIX", "tfstate-reports")
+REPORT_SUBJECT = "📣 Terraform 리소스 상태 비교 결과 (tfstate 기반)"
 
-# AWS 클라이언트
-s3 = boto3.client("s3")
-sns = boto3.client("sns")
+# 버킷 전체 드리프트 요약 (mode=drift_sweep) 동시 비교 수
+SWEEP_MAX_WORKERS = int(os.environ.get("SWEEP_MAX_WORKERS", "8"))
 
-def extract_resources(state):
-    resources = {}
-    for res in state.get("resources", []):
-        res_key = f"{res['type']}.{res['name']}"
-        attr = res.get("instances", [{}])[0].get("attributes", {})
-        resources[res_key] = attr
-    return resources
+# 이력 비교 모드: 버전 관리되는 백엔드 버킷의 상태 키 (이벤트로 덮어쓸 수 있음)
+STATE_BUCKET = os.environ.get("STATE_BUCKET", "")
+STATE_KEY = os.environ.get("STATE_KEY", "global/s3/terraform.tfstate")
 
-def compare_resources(pre, post):
-    pre_keys = set(pre.keys())
-    post_keys = set(post.keys())
-    added = post_keys - pre_keys
-    removed = pre_keys - post_keys
-    changed = []
+PRE_STATE_KEY = "pre_terraform.tfstate"
+POST_STATE_KEY = "post_terraform.tfstate"
+
+# 웜 컨테이너 간 재사용되는 파싱 결과 캐시 (ETag 조건부 GET으로 재검증)
+STATE_CACHE_MAX_BYTES = int(os.environ.get("STATE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+state_cache = StateCache(STATE_CACHE_MAX_BYTES)
+
+# 버전별 상태 원본은 바뀌지 않으므로 /tmp에 VersionId 기준으로 보관 (LRU)
+VERSION_CACHE_DIR = os.environ.get("VERSION_CACHE_DIR", "/tmp/tfstate-versions")
+VERSION_CACHE_MAX_BYTES = int(os.environ.get("VERSION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+version_cache = VersionCache(VERSION_CACHE_DIR, VERSION_CACHE_MAX_BYTES)
+
+# AWS 클라이언트
+s3 = instrument_client(boto3.client("s3"))
+sns = instrument_client(boto3.client("sns"))
 
-    for key in pre_keys & post_keys:
-        if pre[key] != post[key]:
-            changed.append(key)
+_cold_start = True
+_init_duration = time.monotonic() - _INIT_STARTED
 
-    messages = []
+def iter_comparison(pre, post):
+    # 보고서 줄을 하나씩 만든다. 변경 리소스의 속성은 한 번에 하나만 복원한다
+    added, removed, changed = classify_resources(pre, post)
+    reported = False
     if added:
-        messages.append("\n🆕 추가된 리소스:")
-        messages.extend(f"  + {k}" for k in sorted(added))
+        reported = True
+        yield "\n🆕 추가된 리소스:"
+        for k in added:
+            yield f"  + {k}"
     if removed:
-        messages.append("\n❌ 삭제된 리소스:")
-        messages.extend(f"  - {k}" for k in sorted(removed))
-    for key in sorted(changed):
-        pre_attr = pre[key]
-        post_attr = post[key]
-        diffs = [f"    • {k}: '{pre_attr.get(k)}' → '{post_attr.get(k)}'"
-                 for k in set(pre_attr) | set(post_attr) if pre_attr.get(k) != post_attr.get(k)]
-        if diffs:
-            messages.append(f"\n🔁 변경된 리소스: {key}")
-            messages.extend(diffs)
-
-    return "\n".join(messages) if messages else "✅ 리소스 구성 변경 없음"
+        reported = True
+        yield "\n❌ 삭제된 리소스:"
+        for k in removed:
+            yield f"  - {k}"
+    for key in changed:
+        # 경로 단위 diff: 같은 하위 트리는 해시로 건너뛰고 리소스당 DIFF_MAX_CHANGES건까지만 보고
+        changes, truncated = diff_attributes(pre[key].attributes, post[key].attributes, limit=DIFF_MAX_CHANGES)
+        if changes:
+            reported = True
+            yield f"\n🔁 변경된 리소스: {key}"
+            yield from format_changes(changes, truncated)
+    if not reported:
+        yield "✅ 리소스 구성 변경 없음"
 
-def lambda_handler(event, context):
+def compare_resources(pre, post):
+    return "\n".join(iter_comparison(pre, post))
+
+def source_lines():
+    return [
+        f"📁 [Pre-State 버킷]: {PRE_DEPLOY_STATE_BUCKET}",
+        f"📁 [Post-State 버킷]: {POST_DEPLOY_STATE_BUCKET}",
+    ]
+
+def iter_report(pre, post, sources=None):
+    yield ""
+    yield "=================== 🔍 Terraform 상태 비교 결과 🔍 ==================="
+    yield ""
+    yield from sources or source_lines()
+    yield ""
+    yield "📊 [리소스 비교 결과 요약]"
+    yield from iter_comparison(pre, post)
+    yield ""
+    yield "================================================================"
+
+def report_summary(pre, post, sources=None):
+    added, removed, changed = classify_resources(pre, post)
+    return [
+        "=================== 🔍 Terraform 상태 비교 결과 🔍 ===================",
+        "",
+        *(sources or source_lines()),
+        "",
+        f"📊 추가 {len(added)}건 / 삭제 {len(removed)}건 / 변경 {len(changed)}건",
+    ]
+
+def load_state(bucket, key):
+    cached = state_cache.get(bucket, key)
+    params = {"Bucket": bucket, "Key": key}
+    if cached:
+        params["IfNoneMatch"] = cached[0]
     try:
-        # pre 상태 로드
-        try:
-            pre_obj = s3.get_object(Bucket=PRE_DEPLOY_STATE_BUCKET, Key="pre_terraform.tfstate")
-            pre_state = json.loads(pre_obj["Body"].read().decode("utf-8"))
-        except ClientError as e:
-            if e.response["Error"]["Code"] == "NoSuchKey":
-                logger.warning(f"⚠️ pre_terraform.tfstate 파일이 {PRE_DEPLOY_STATE_BUCKET}에 없습니다. 빈 상태로 간주합니다.")
-                pre_state = {"version": 4, "terraform_version": "1.5.7", "resources": []}
-            else:
-                raise
+        obj = s3.get_object(**params)
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if cached and code in ("304", "NotModified"):
+            state_cache.record(hit=True)
+            logger.info(f"♻️ 캐시 재사용: s3://{bucket}/{key} ({cached[0]})")
+            return cached[1], cached[2]
+        if code == "NoSuchKey":
+            logger.warning(f"⚠️ {key} 파일이 {bucket}에 없습니다. 빈 상태로 간주합니다.")
+            return {}, {}
+        raise
+    state_cache.record(hit=False)
+    # gzip/zstd 스냅샷은 받으면서 바로 풀어 파서에 넘긴다 (압축본과 원본을 통째로 들고 있지 않음)
+    body, encoding = open_state_body(obj["Body"], obj.get("ContentEncoding"))
+    if encoding != "identity":
+        logger.info(f"🗜️ {encoding} 스냅샷: s3://{bucket}/{key} ({obj.get('ContentLength')} bytes 압축)")
+    reader = TfstateReader(body)
+    try:
+        resources = extract_resources(reader.resources())
+    finally:
+        body.close()
+    meta = dict(reader.meta, etag=obj.get("ETag"))
+    state_cache.put(bucket, key, meta["etag"], resources, meta)
+    return resources, meta
+
+def fetch_pre_resources():
+    # 캐시에 있으면 조건부 GET 한 번으로 끝난다
+    if state_cache.get(PRE_DEPLOY_STATE_BUCKET, PRE_STATE_KEY):
+        return load_state(PRE_DEPLOY_STATE_BUCKET, PRE_STATE_KEY)[0]
 
-        # post 상태 로드
+    # 직전 실행의 post 매니페스트가 지금의 pre 상태와 같으면 pre를 받지도 파싱하지도 않는다
+    # (매니페스트에 속성까지 들어 있어 변경된 주소의 상세 비교도 그대로 된다)
+    manifest = load_manifest(s3, POST_DEPLOY_STATE_BUCKET, POST_STATE_KEY)
+    if manifest:
         try:
-            post_obj = s3.get_object(Bucket=POST_DEPLOY_STATE_BUCKET, Key="post_terraform.tfstate")
-            post_state = json.loads(post_obj["Body"].read().decode("utf-8"))
+            head = s3.head_object(Bucket=PRE_DEPLOY_STATE_BUCKET, Key=PRE_STATE_KEY)
         except ClientError as e:
-            if e.response["Error"]["Code"] == "NoSuchKey":
-                logger.warning(f"⚠️ post_terraform.tfstate 파일이 {POST_DEPLOY_STATE_BUCKET}에 없습니다. 빈 상태로 간주합니다.")
-                post_state = {"version": 4, "terraform_version": "1.5.7", "resources": []}
-            else:
+            if e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
                 raise
+            logger.warning(f"⚠️ {PRE_STATE_KEY} 파일이 {PRE_DEPLOY_STATE_BUCKET}에 없습니다. 빈 상태로 간주합니다.")
+            return {}
+        if manifest_matches(manifest, head):
+            logger.info(f"🧾 매니페스트 재사용 (serial {manifest.get('serial')})")
+            return manifest_records(manifest)
+    return load_state(PRE_DEPLOY_STATE_BUCKET, PRE_STATE_KEY)[0]
 
-        pre = extract_resources(pre_state)
-        post = extract_resources(post_state)
-        result = compare_resources(pre, post)
+def store_manifest(post, post_meta):
+    if not post_meta:
+        return
+    try:
+        save_manifest(s3, POST_DEPLOY_STATE_BUCKET, POST_STATE_KEY, post, post_meta)
+    except Exception as e:
+        logger.warning(f"⚠️ 다이제스트 매니페스트 저장 실패 (다음 실행은 전체 비교): {str(e)}")
 
-        message = f"""
-=================== 🔍 Terraform 상태 비교 결과 🔍 ===================
+def log_invocation_latency(started):
+    global _cold_start
+    elapsed_ms = (time.monotonic() - started) * 1000
+    if _cold_start:
+        logger.info(f"⏱️ 콜드 스타트: 초기화 {_init_duration * 1000:.0f}ms, 처리 {elapsed_ms:.0f}ms")
+        _cold_start = False
+    else:
+        logger.info(f"⏱️ 웜 스타트: 처리 {elapsed_ms:.0f}ms "
+                    f"(캐시 적중 {state_cache.hits}, 미스 {state_cache.misses})")
 
-📁 [Pre-State 버킷]: {PRE_DEPLOY_STATE_BUCKET}
-📁 [Post-State 버킷]: {POST_DEPLOY_STATE_BUCKET}
+def emit_call_metrics(context):
+    # 작업별 AWS 호출 수/지연/재시도를 EMF 로그로 남긴다 (CloudWatch 지표로 자동 추출)
+    try:
+        emit_lambda_metrics(METRICS_NAMESPACE, context)
+    except Exception as e:
+        logger.warning(f"⚠️ 호출 지표 출력 실패: {str(e)}")
 
-📊 [리소스 비교 결과 요약]
-{result}
+def compare_history(event, context):
+    # 버전 관리 버킷에서 두 시점(VersionId 또는 시각)의 상태를 직접 비교한다. to를 비우면 최신 버전
+    bucket = event.get("bucket") or STATE_BUCKET
+    key = event.get("key") or STATE_KEY
+    if not bucket:
+        raise ValueError("이력 비교에는 bucket (또는 STATE_BUCKET 환경 변수)이 필요합니다")
+    if not (event.get("from_version") or event.get("from_time")):
+        raise ValueError("이력 비교에는 from_version 또는 from_time이 필요합니다")
+    from_version = resolve_version(s3, bucket, key, event.get("from_version"), event.get("from_time"))
+    to_version = resolve_version(s3, bucket, key, event.get("to_version"), event.get("to_time"))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pre_future = pool.submit(load_version, s3, bucket, key, from_version, version_cache)
+        post_future = pool.submit(load_version, s3, bucket, key, to_version, version_cache)
+        pre, pre_meta = pre_future.result()
+        post, post_meta = post_future.result()
+
+    sources = [
+        f"📁 [상태 파일]: s3://{bucket}/{key}",
+        f"🕘 [이전 버전]: {from_version} (serial {pre_meta.get('serial')})",
+        f"🕒 [이후 버전]: {to_version} (serial {post_meta.get('serial')})",
+    ]
+    deliver_report(
+        sns, SNS_TOPIC_ARN, "📣 Terraform 상태 이력 비교 결과",
+        lambda: iter_report(pre, post, sources),
+        summary_lines=report_summary(pre, post, sources),
+        s3=s3, report_bucket=REPORT_BUCKET, report_prefix=REPORT_PREFIX,
+        request_id=getattr(context, "aws_request_id", None),
+    )
+    logger.info(f"✅ 이력 비교 완료 (버전 캐시 적중 {version_cache.hits}, 미스 {version_cache.misses})")
+    return {"status": "done", "message": "이력 비교 완료 및 알림 전송됨",
+            "from_version": from_version, "to_version": to_version}
+
+def history_index(event):
+    # mode=index: 새 버전만 색인에 덧붙인다
+    # mode=address_history: 색인만 읽어 주소가 추가/변경/삭제된 버전을 돌려준다 (상태 파일 다운로드 없음)
+    bucket = event.get("bucket") or STATE_BUCKET
+    key = event.get("key") or STATE_KEY
+    if not bucket:
+        raise ValueError("이력 색인에는 bucket (또는 STATE_BUCKET 환경 변수)이 필요합니다")
+    if event["mode"] == "index":
+        index, added = update_index(s3, bucket, key, version_cache)
+        return {"status": "done", "key": key, "versions": len(index.entries), "indexed": added}
+    address = event.get("address")
+    if not address:
+        raise ValueError("address_history에는 address가 필요합니다")
+    index = load_index(s3, bucket, key)
+    if event.get("refresh"):
+        index, _ = update_index(s3, bucket, key, version_cache)
+    events = index.address_history(address)
+    logger.info(f"🔎 {address}: {len(events)}건 (색인 {len(index.entries)}개 버전)")
+    return {"status": "done", "key": key, "address": address, "events": events}
+
+def sweep_drift(event, context):
+    # 접두어 아래 모든 상태 키를 최신/직전 버전으로 동시에 비교해 요약 하나로 보낸다
+    bucket = event.get("bucket") or STATE_BUCKET
+    if not bucket:
+        raise ValueError("드리프트 요약에는 bucket (또는 STATE_BUCKET 환경 변수)이 필요합니다")
+    sweep = DriftSweep(
+        s3, bucket, event.get("prefix", ""),
+        max_workers=int(event.get("max_workers") or SWEEP_MAX_WORKERS),
+        cache=version_cache,
+        remaining_ms=getattr(context, "get_remaining_time_in_millis", None),
+    )
+    summary = sweep.run()
+    deliver_report(
+        sns, SNS_TOPIC_ARN, "📣 Terraform 상태 드리프트 요약",
+        lambda: iter_summary_lines(summary),
+        summary_lines=list(iter_summary_lines(dict(summary, changed=[], problems=[]))),
+        s3=s3, report_bucket=REPORT_BUCKET, report_prefix=REPORT_PREFIX,
+        request_id=getattr(context, "aws_request_id", None),
+    )
+    return {"status": "done", "keys": summary["keys"], "counts": summary["counts"],
+            "changed": [result["key"] for result in summary["changed"]]}
+
+def lambda_handler(event, context):
+    started = time.monotonic()
+    try:
+        mode = (event or {}).get("mode")
+        if mode == "history":
+            return compare_history(event, context)
+        if mode in ("index", "address_history"):
+            return history_index(event)
+        if mode == "drift_sweep":
+            return sweep_drift(event, context)
 
-================================================================
-"""
+        # pre/post를 동시에 가져온다. post는 스트리밍 파싱, pre는 가능하면 캐시/매니페스트로 대체
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            post_future = pool.submit(load_state, POST_DEPLOY_STATE_BUCKET, POST_STATE_KEY)
+            pre_future = pool.submit(fetch_pre_resources)
+            post, post_meta = post_future.result()
+            pre = pre_future.result()
+        store_manifest(post, post_meta)
 
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject="📣 Terraform 리소스 상태 비교 결과 (tfstate 기반)",
-            Message=message
+        # 보고서는 생성기로 렌더링해 크기 제한에 맞춰 나눠 보낸다 (전체 문자열을 만들지 않음)
+        deliver_report(
+            sns, SNS_TOPIC_ARN, REPORT_SUBJECT,
+            lambda: iter_report(pre, post),
+            summary_lines=report_summary(pre, post),
+            s3=s3, report_bucket=REPORT_BUCKET, report_prefix=REPORT_PREFIX,
+            request_id=getattr(context, "aws_request_id", None),
         )
         logger.info("✅ 비교 결과 SNS 전송 완료")
         return {"status": "done", "message": "비교 완료 및 알림 전송됨"}
@@ -118,4 +315,7 @@ def lambda_handler(event, context):
         return {
             "statusCode": 500,
             "body": json.dumps({"message": "Lambda 함수 실행 중 오류 발생", "error": str(e)})
-        }
\ No newline at end of file
+        }
+    finally:
+        log_invocation_latency(started)
+        emit_call_metrics(context)
@@ -1,30 +1,289 @@
 import boto3
+import hashlib
+import json
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-dynamodb = boto3.resource('dynamodb')
+from aws_metrics import emit_lambda_metrics, instrument_client
+
+# 세그먼트 스캔을 여러 스레드에서 돌리므로 스레드 안전한 저수준 클라이언트를 사용
+dynamodb = instrument_client(boto3.client('dynamodb'))
 table_name = os.environ.get('LOCK_TABLE_NAME', 'terraform-lock')
 lock_id = os.environ.get('LOCK_ID', 'global/s3/terraform.tfstate')
 max_age_seconds = int(os.environ.get('MAX_LOCK_AGE_SECONDS', '300'))
+sweep_segments = int(os.environ.get('SWEEP_SEGMENTS', '8'))
+sweep_by_default = os.environ.get('LOCK_SWEEP', 'false').lower() == 'true'
+metrics_namespace = os.environ.get('METRICS_NAMESPACE', 'TerraformStateAutomation')
+
+# 스트림 모드에서 기한이 미래인 잠금은 EventBridge Scheduler 일회성 일정으로 기한 시각에 다시 깨운다.
+# 역할 ARN이 없으면 기한이 이미 지난 잠금만 스트림에서 바로 정리하고 나머지는 백스톱 스윕에 맡긴다.
+scheduler_role_arn = os.environ.get('LOCK_SCHEDULER_ROLE_ARN', '')
+expiry_target_arn = os.environ.get('LOCK_EXPIRY_TARGET_ARN', '')
+SCHEDULE_PREFIX = 'tflock-'
+# Scheduler는 과거 시각의 at() 일정을 ValidationException으로 거절하므로 최소 이만큼 뒤로 잡는다
+SCHEDULE_MIN_LEAD_SECONDS = 60
+_scheduler = None
+
+# Lambda 제한 시간에 걸리기 전에 스윕을 멈추기 위한 여유 시간
+TIMEOUT_MARGIN_MS = 5000
+
+
+def parse_lock_info(info):
+    # Terraform은 Info를 JSON 문자열로 저장한다: {"ID", "Operation", "Who", "Version", "Created", "Path", ...}
+    if isinstance(info, str):
+        try:
+            info = json.loads(info)
+        except ValueError:
+            return None
+    return info if isinstance(info, dict) else None
+
+
+def lock_created_at(info):
+    parsed = parse_lock_info(info)
+    if not parsed:
+        return None
+    created = parsed.get("Created") or parsed.get("CreatedTime")
+    if created is None:
+        return None
+    if isinstance(created, (int, float)):
+        return float(created)
+    # RFC3339, 나노초 자리까지 올 수 있음: 2024-01-02T03:04:05.123456789Z
+    created = str(created).replace("Z", "+00:00")
+    if "." in created:
+        head, rest = created.split(".", 1)
+        digits = rest[:len(rest) - len(rest.lstrip("0123456789"))]
+        # fromisoformat(3.9)은 소수점 이하가 정확히 3자리나 6자리여야 하므로 6자리로 맞춘다
+        created = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    try:
+        return datetime.fromisoformat(created).timestamp()
+    except ValueError:
+        return None
+
+
+def unwrap_item(item):
+    # LockID/Info/Digest는 모두 문자열 속성
+    return {key: value["S"] for key, value in item.items() if "S" in value}
+
+
+def is_digest_item(item):
+    # S3 백엔드는 상태 파일마다 "<경로>-md5" 항목에 Digest를 저장한다. 잠금이 아니므로 건드리지 않는다
+    return item["LockID"].endswith("-md5") and "Info" not in item
+
+
+def expire_lock(item, now):
+    created = lock_created_at(item.get("Info"))
+    if created is None:
+        print(f"⚠️ 생성 시간 없음 → 삭제 생략: {item['LockID']}")
+        return "skipped"
+    lock_age = now - created
+    if lock_age <= max_age_seconds:
+        print(f"🕒 아직 유효한 Lock → 유지: {item['LockID']} ({int(lock_age)}초 경과)")
+        return "kept"
+    try:
+        # 읽은 뒤 다시 잡힌 잠금은 Info가 달라지므로 지우지 않는다
+        dynamodb.delete_item(
+            TableName=table_name,
+            Key={"LockID": {"S": item["LockID"]}},
+            ConditionExpression="#info = :info",
+            ExpressionAttributeNames={"#info": "Info"},
+            ExpressionAttributeValues={":info": {"S": item["Info"]}},
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        print(f"↪️ 그 사이 잠금이 바뀜 → 삭제 생략: {item['LockID']}")
+        return "changed"
+    print(f"🧹 {int(lock_age)}초 경과된 Lock 삭제: {item['LockID']}")
+    return "expired"
+
+
+def lock_deadline(info):
+    created = lock_created_at(info)
+    return None if created is None else created + max_age_seconds
+
+
+def scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = instrument_client(boto3.client('scheduler'))
+    return _scheduler
+
+
+def schedule_name(lock_id):
+    # 일정 이름은 64자, [0-9a-zA-Z-_.]만 허용되므로 LockID 해시로 만든다
+    return SCHEDULE_PREFIX + hashlib.sha256(lock_id.encode("utf-8")).hexdigest()[:48]
+
+
+def schedule_expiry(item, deadline, target_arn):
+    if not (scheduler_role_arn and target_arn):
+        return False
+    # 스트림 지연으로 기한이 코앞이어도 과거 시각이 되어 일정 생성이 거절되지 않게 한다
+    fire_at = max(deadline + 1, time.time() + SCHEDULE_MIN_LEAD_SECONDS)
+    at = datetime.fromtimestamp(fire_at, timezone.utc).strftime("at(%Y-%m-%dT%H:%M:%S)")
+    params = {
+        "Name": schedule_name(item["LockID"]),
+        "ScheduleExpression": at,
+        "ScheduleExpressionTimezone": "UTC",
+        "FlexibleTimeWindow": {"Mode": "OFF"},
+        "Target": {
+            "Arn": target_arn,
+            "RoleArn": scheduler_role_arn,
+            "Input": json.dumps({"mode": "expire", "lock_id": item["LockID"], "info": item["Info"]}),
+        },
+    }
+    client = scheduler()
+    try:
+        client.create_schedule(**params)
+    except client.exceptions.ConflictException:
+        # 같은 LockID가 다시 잡혔거나 실행을 마친 일정이 남아 있음 → 새 Info와 기한으로 덮어쓴다
+        client.update_schedule(**params)
+    return True
+
+
+def cancel_expiry(lock_id):
+    if not scheduler_role_arn:
+        return
+    client = scheduler()
+    try:
+        client.delete_schedule(Name=schedule_name(lock_id))
+    except client.exceptions.ResourceNotFoundException:
+        pass
+
+
+def handle_stream(records, context=None):
+    # DynamoDB Stream 레코드로 잠금 획득(INSERT/MODIFY)과 해제(REMOVE)를 추적한다. 테이블을 읽지 않는다.
+    # 기한이 지난 잠금은 바로 정리하고, 남은 잠금은 일정으로만 다시 깨운다 (웜 컨테이너 메모리에 의존하지 않음)
+    target_arn = expiry_target_arn or getattr(context, "invoked_function_arn", "")
+    stats = {"tracked": 0, "scheduled": 0, "released": 0, "ignored": 0,
+             "expired": 0, "kept": 0, "changed": 0, "skipped": 0, "errors": 0}
+    for record in records:
+        change = record.get("dynamodb", {})
+        if record.get("eventName") == "REMOVE":
+            lock_id = change.get("Keys", {}).get("LockID", {}).get("S")
+            if not lock_id or lock_id.endswith("-md5"):
+                stats["ignored"] += 1
+                continue
+            cancel_expiry(lock_id)
+            stats["released"] += 1
+            continue
+        item = unwrap_item(change.get("NewImage", {}))
+        if "LockID" not in item or is_digest_item(item):
+            stats["ignored"] += 1
+            continue
+        deadline = lock_deadline(item.get("Info"))
+        if deadline is None:
+            print(f"⚠️ 생성 시간 없음 → 추적 생략: {item['LockID']}")
+            stats["skipped"] += 1
+            continue
+        stats["tracked"] += 1
+        now = time.time()
+        if deadline <= now:
+            # Info 조건부 삭제라 그 사이 새로 잡힌 잠금은 지우지 않는다
+            stats[expire_lock(item, now)] += 1
+            continue
+        try:
+            if schedule_expiry(item, deadline, target_arn):
+                stats["scheduled"] += 1
+        except scheduler().exceptions.ValidationException as e:
+            # 재시도해도 같은 입력은 계속 거절되므로 배치를 실패시키지 않는다 (백스톱 스윕이 정리)
+            print(f"❗ 만료 일정 생성 거절 → 스윕에 맡김: {item['LockID']} ({e})")
+            stats["errors"] += 1
+    print(f"📡 스트림 레코드 {len(records)}건 처리: {stats}")
+    return stats
+
+
+def expire_scheduled(event, context=None):
+    # 일정이 기한 시각에 넘겨준 Info와 여전히 같을 때만 지운다 (이미 해제됐으면 조건 실패로 끝)
+    item = {"LockID": event["lock_id"], "Info": event["info"]}
+    result = expire_lock(item, time.time())
+    if result == "kept":
+        # 시계 차이로 조금 일찍 깨어남 → 같은 일정을 기한 뒤로 다시 잡는다
+        target_arn = expiry_target_arn or getattr(context, "invoked_function_arn", "")
+        schedule_expiry(item, lock_deadline(item["Info"]), target_arn)
+    elif result != "changed":
+        # 일회성 일정은 실행 뒤에도 남으므로 직접 지운다.
+        # "changed"면 일정이 새 잠금 것으로 갱신됐거나 해제 레코드가 지울 것이므로 두고 간다
+        cancel_expiry(item["LockID"])
+    return result
+
+
+def scan_segment(segment, total_segments, deadline):
+    params = {
+        "TableName": table_name,
+        "ProjectionExpression": "LockID, #info",
+        "ExpressionAttributeNames": {"#info": "Info"},
+        "Segment": segment,
+        "TotalSegments": total_segments,
+    }
+    stats = {"scanned": 0, "expired": 0, "kept": 0, "changed": 0, "skipped": 0, "digests": 0, "errors": 0}
+    now = time.time()
+    while True:
+        response = dynamodb.scan(**params)
+        for item in map(unwrap_item, response.get("Items", [])):
+            stats["scanned"] += 1
+            if is_digest_item(item):
+                stats["digests"] += 1
+                continue
+            try:
+                stats[expire_lock(item, now)] += 1
+            except Exception as e:
+                # 잠금 하나의 삭제 실패로 나머지 스윕을 멈추지 않는다 (다음 스윕에서 다시 시도)
+                print(f"❗ 잠금 정리 실패 → 건너뜀: {item['LockID']} ({e})")
+                stats["errors"] += 1
+        if "LastEvaluatedKey" not in response:
+            return stats
+        if deadline is not None and time.monotonic() > deadline:
+            print(f"⏳ 제한 시간 임박 → 세그먼트 {segment} 스윕 중단")
+            stats["truncated"] = 1
+            return stats
+        params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def sweep_locks(context=None):
+    deadline = None
+    if context is not None:
+        remaining_ms = context.get_remaining_time_in_millis() - TIMEOUT_MARGIN_MS
+        deadline = time.monotonic() + max(remaining_ms, 0) / 1000
+
+    totals = {}
+    with ThreadPoolExecutor(max_workers=sweep_segments) as pool:
+        futures = [pool.submit(scan_segment, segment, sweep_segments, deadline)
+                   for segment in range(sweep_segments)]
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] = totals.get(key, 0) + value
+    print(f"✅ 잠금 테이블 스윕 완료: {totals}")
+    return totals
+
+
+def check_single_lock():
+    response = dynamodb.get_item(TableName=table_name, Key={"LockID": {"S": lock_id}})
+    item = response.get("Item")
+    if not item:
+        print("✅ 현재 잠금 없음")
+        return
+    expire_lock(unwrap_item(item), time.time())
+
 
 def lambda_handler(event, context):
-    table = dynamodb.Table(table_name)
+    event = event or {}
+    if event.get("Records"):
+        mode = "stream"
+    else:
+        mode = event.get("mode") or ("sweep" if sweep_by_default else "single")
     try:
-        response = table.get_item(Key={"LockID": lock_id})
-        item = response.get("Item")
-        if not item:
-            print("✅ 현재 잠금 없음")
-            return
-        created_time = item.get("Info", {}).get("CreatedTime")
-        if not created_time:
-            print("⚠️ 생성 시간 없음 → 삭제 생략")
-            return
-        lock_age = time.time() - float(created_time)
-        if lock_age > max_age_seconds:
-            print(f"⏱️ Lock이 {int(lock_age)}초 경과됨 → 삭제")
-            table.delete_item(Key={"LockID": lock_id})
-            print("🧹 Lock 삭제 완료")
-        else:
-            print(f"🕒 아직 유효한 Lock → 유지 ({int(lock_age)}초 경과)")
+        if mode == "stream":
+            return handle_stream(event["Records"], context)
+        if mode == "expire":
+            return expire_scheduled(event, context)
+        if mode == "sweep":
+            return sweep_locks(context)
+        check_single_lock()
     except Exception as e:
         print(f"❗ 오류 발생: {e}")
+        if mode == "stream":
+            # 스트림 배치는 실패로 돌려줘야 Lambda가 같은 배치를 다시 전달한다
+            raise
+    finally:
+        # 작업별 DynamoDB 호출 수/지연/재시도를 EMF 로그로 남긴다
+        emit_lambda_metrics(metrics_namespace, context)
@@ -0,0 +1,148 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# SNS 메시지 한도는 256KB. 번호 표시와 인코딩 여유를 두고 자른다
+SNS_MAX_BYTES = 256 * 1024
+PART_MAX_BYTES = 240 * 1024
+
+# S3 멀티파트 업로드 최소 파트 크기 (마지막 파트 제외)
+S3_PART_BYTES = 5 * 1024 * 1024
+
+# SigV4 presigned URL 최대 유효 기간 (7일)
+MAX_URL_EXPIRES = 7 * 24 * 3600
+# 임시 자격 증명(Lambda 실행 역할)으로 서명한 URL은 ExpiresIn과 상관없이 세션 토큰이 만료되면 함께 무효가 된다.
+# 실행 역할 자격 증명은 몇 시간 안에 교체되므로 실제로 열리는 기간에 맞춰 짧게 잡는다
+TEMPORARY_CREDENTIAL_URL_EXPIRES = 3600
+
+
+def _split_line(line, max_bytes):
+    # 한 줄이 파트 한도보다 길면 UTF-8 글자 경계에서 잘라 여러 조각으로 낸다
+    encoded = line.encode("utf-8")
+    while len(encoded) > max_bytes:
+        cut = max_bytes
+        while cut > 0 and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        yield encoded[:cut].decode("utf-8")
+        encoded = encoded[cut:]
+    yield encoded.decode("utf-8")
+
+
+def iter_parts(lines, max_bytes=PART_MAX_BYTES):
+    # 줄 생성기를 max_bytes 이하 문자열 조각으로 묶는다. 한 번에 한 파트만 메모리에 둔다
+    part, size = [], 0
+    for line in lines:
+        for piece in _split_line(line, max_bytes):
+            piece_size = len(piece.encode("utf-8")) + 1
+            if part and size + piece_size > max_bytes:
+                yield "\n".join(part)
+                part, size = [], 0
+            part.append(piece)
+            size += piece_size
+    if part:
+        yield "\n".join(part)
+
+
+def count_parts(lines_factory, max_bytes=PART_MAX_BYTES):
+    # 번호(i/N)를 붙이려면 전체 개수가 필요하다. 결과를 보관하지 않고 한 번 더 렌더링해서 센다
+    return sum(1 for _ in iter_parts(lines_factory(), max_bytes))
+
+
+def _publish_numbered(sns, topic_arn, subject, parts, total):
+    for number, part in enumerate(parts, start=1):
+        part_subject = subject if total == 1 else f"{subject} ({number}/{total})"
+        message = part if total == 1 else f"📄 [{number}/{total}]\n{part}"
+        sns.publish(TopicArn=topic_arn, Subject=part_subject[:100], Message=message)
+    logger.info(f"📨 SNS 메시지 {total}건 전송 완료")
+    return total
+
+
+def publish_parts(sns, topic_arn, subject, lines_factory, max_bytes=PART_MAX_BYTES, total=None):
+    # total을 이미 셌다면 넘겨받아 보고서를 한 번만 더 렌더링한다
+    if total is None:
+        total = count_parts(lines_factory, max_bytes)
+    return _publish_numbered(sns, topic_arn, subject, iter_parts(lines_factory(), max_bytes), total)
+
+
+def upload_report(s3, bucket, key, lines):
+    # 멀티파트 업로드로 5MB씩 흘려보내 보고서 크기와 상관없이 메모리 사용량을 고정한다
+    buffer, size = [], 0
+    upload_id = None
+    parts = []
+
+    def flush():
+        nonlocal buffer, size, upload_id
+        body = "".join(buffer).encode("utf-8")
+        if upload_id is None:
+            upload_id = s3.create_multipart_upload(
+                Bucket=bucket, Key=key, ContentType="text/plain; charset=utf-8")["UploadId"]
+        response = s3.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                  PartNumber=len(parts) + 1, Body=body)
+        parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+        buffer, size = [], 0
+
+    try:
+        for line in lines:
+            text = line + "\n"
+            buffer.append(text)
+            size += len(text.encode("utf-8"))
+            if size >= S3_PART_BYTES:
+                flush()
+        if upload_id is None:
+            # 작은 보고서는 한 번에 올린다
+            s3.put_object(Bucket=bucket, Key=key, Body="".join(buffer).encode("utf-8"),
+                          ContentType="text/plain; charset=utf-8")
+            return
+        if buffer:
+            flush()
+        s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                     MultipartUpload={"Parts": parts})
+    except Exception:
+        if upload_id is not None:
+            s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+def report_key(prefix, request_id=None):
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    suffix = f"-{request_id}" if request_id else ""
+    return f"{prefix.rstrip('/')}/{stamp}{suffix}.txt" if prefix else f"{stamp}{suffix}.txt"
+
+
+def presigned_url_expires(url_expires):
+    # 세션 토큰이 있으면 임시 자격 증명이다 (Lambda는 실행 역할 자격 증명을 환경 변수로 준다)
+    if os.environ.get("AWS_SESSION_TOKEN"):
+        return min(url_expires, TEMPORARY_CREDENTIAL_URL_EXPIRES)
+    return min(url_expires, MAX_URL_EXPIRES)
+
+
+def deliver_report(sns, topic_arn, subject, lines_factory, summary_lines=(), s3=None, report_bucket=None,
+                   report_prefix="reports", url_expires=MAX_URL_EXPIRES, request_id=None):
+    # 한 메시지에 들어가면 그대로 보내고, 넘치면 S3 보고서 + 요약 링크, 버킷이 없으면 번호 붙인 여러 메시지
+    # 개수를 세면서 첫 파트만 들고 있다가, 한 메시지 분량이면 다시 렌더링하지 않고 그대로 보낸다
+    first, parts = None, 0
+    for part in iter_parts(lines_factory()):
+        if first is None:
+            first = part
+        parts += 1
+    if parts <= 1:
+        return {"mode": "sns", "parts": _publish_numbered(sns, topic_arn, subject, [first] if parts else [], parts)}
+    if not (s3 and report_bucket):
+        return {"mode": "sns", "parts": publish_parts(sns, topic_arn, subject, lines_factory, total=parts)}
+
+    key = report_key(report_prefix, request_id)
+    upload_report(s3, report_bucket, key, lines_factory())
+    expires = presigned_url_expires(url_expires)
+    url = s3.generate_presigned_url("get_object", Params={"Bucket": report_bucket, "Key": key}, ExpiresIn=expires)
+    logger.info(f"🗂️ 전체 보고서 업로드: s3://{report_bucket}/{key}")
+    message = "\n".join(list(summary_lines) + [
+        "",
+        f"📎 전체 보고서가 커서 S3에 저장했습니다 (SNS {parts}건 분량)",
+        f"   s3://{report_bucket}/{key}",
+        f"   {url}",
+        f"   ⏰ 링크는 약 {expires // 60}분 동안 유효합니다. 만료 후에는 위 S3 경로에서 직접 받으세요",
+    ])
+    sns.publish(TopicArn=topic_arn, Subject=subject[:100], Message=message)
+    return {"mode": "s3", "parts": parts, "key": key}
@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+
+# 레코드 하나당 객체/dict 오버헤드 추정치 (bytes)
+RECORD_OVERHEAD = 250
+
+
+def estimate_size(resources):
+    return sum(len(address) + len(record._payload or b"") + RECORD_OVERHEAD
+               for address, record in resources.items())
+
+
+# 웜 컨테이너에서 재사용하는 파싱된 상태 캐시.
+# (bucket, key) 별로 마지막 ETag와 색인을 보관하고, 전체 크기 상한을 넘으면
+# 가장 오래 쓰이지 않은 항목부터 내보낸다.
+class StateCache:
+    def __init__(self, max_bytes, max_entries=16):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bucket, key):
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            if entry is not None:
+                self._entries.move_to_end((bucket, key))
+            return entry
+
+    def put(self, bucket, key, etag, resources, meta):
+        size = estimate_size(resources)
+        with self._lock:
+            old = self._entries.pop((bucket, key), None)
+            if old is not None:
+                self._size -= old[3]
+            if not etag or size > self.max_bytes:
+                return
+            self._entries[(bucket, key)] = (etag, resources, meta, size)
+            self._size += size
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[3]
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
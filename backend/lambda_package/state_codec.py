@@ -0,0 +1,74 @@
+import gzip
+
+# 상태 스냅샷은 평문 JSON, gzip, zstd 중 하나로 올라온다.
+# Content-Encoding을 먼저 보고, 없거나 모르는 값이면 앞 4바이트(매직 넘버)로 판별한다.
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_ENCODINGS = {"gzip": "gzip", "x-gzip": "gzip", "zstd": "zstd", "identity": "identity"}
+
+
+# 판별하느라 먼저 읽은 바이트를 다시 앞에 붙여 돌려주는 읽기 전용 스트림
+class _PrefixedStream:
+    def __init__(self, prefix, body):
+        self._prefix = prefix
+        self._body = body
+
+    def read(self, size=-1):
+        if not self._prefix:
+            return self._body.read() if size is None or size < 0 else self._body.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._body.read(), b""
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        if len(data) < size:
+            data += self._body.read(size - len(data))
+        return data
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self._body.close()
+
+
+# 압축 해제 스트림을 닫으면 원본 본문(S3 연결)까지 닫히게 한다
+class _DecodedStream:
+    def __init__(self, stream, body):
+        self._stream = stream
+        self._body = body
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._body.close()
+
+
+def detect_encoding(prefix, content_encoding=None):
+    encoding = _ENCODINGS.get((content_encoding or "").strip().lower())
+    if encoding and encoding != "identity":
+        return encoding
+    if prefix.startswith(GZIP_MAGIC):
+        return "gzip"
+    if prefix.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "identity"
+
+
+def open_state_body(body, content_encoding=None):
+    # 압축된 본문을 한꺼번에 풀지 않고, 읽는 만큼만 풀어 주는 스트림을 돌려준다 (TfstateReader 입력용)
+    prefix = body.read(4)
+    stream = _PrefixedStream(prefix, body)
+    encoding = detect_encoding(prefix, content_encoding)
+    if encoding == "gzip":
+        return _DecodedStream(gzip.GzipFile(fileobj=stream, mode="rb"), body), encoding
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd로 압축된 상태를 읽으려면 zstandard 패키지가 필요합니다 (Lambda 레이어에 추가)")
+        return _DecodedStream(zstandard.ZstdDecompressor().stream_reader(stream, closefd=False), body), encoding
+    return stream, encoding
@@ -0,0 +1,90 @@
+import gzip
+import logging
+from datetime import datetime, timezone
+
+from state_codec import open_state_body
+from state_index import extract_resources
+from tfstate_reader import TfstateReader
+
+logger = logging.getLogger(__name__)
+
+
+def parse_timestamp(value):
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def list_versions(s3, bucket, key):
+    # 해당 키의 버전과 삭제 마커를 최신순으로 (Prefix는 접두어 일치라 같은 키만 남긴다)
+    entries = []
+    paginator = s3.get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket, Prefix=key):
+        for version in page.get("Versions", []):
+            if version["Key"] == key:
+                entries.append(dict(version, IsDeleteMarker=False))
+        for marker in page.get("DeleteMarkers", []):
+            if marker["Key"] == key:
+                entries.append(dict(marker, IsDeleteMarker=True))
+    entries.sort(key=lambda entry: entry["LastModified"], reverse=True)
+    return entries
+
+
+def latest_versions(s3, bucket, key, count=2):
+    # 최신 버전/삭제 마커 count개만 필요할 때: 키의 항목은 최신순으로 나오므로 다 모이면 목록 조회를 멈춘다.
+    # 한 페이지 안에서 버전과 삭제 마커는 따로 오므로 시각순으로 합친다 (같은 시각이면 IsLatest가 앞)
+    found = []
+    paginator = s3.get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket, Prefix=key, PaginationConfig={"PageSize": max(count * 2, 10)}):
+        entries = [dict(version, IsDeleteMarker=False) for version in page.get("Versions", []) if version["Key"] == key]
+        entries += [dict(marker, IsDeleteMarker=True) for marker in page.get("DeleteMarkers", []) if marker["Key"] == key]
+        entries.sort(key=lambda entry: (entry["LastModified"], entry.get("IsLatest", False)), reverse=True)
+        found.extend(entries)
+        if len(found) >= count:
+            return found[:count]
+        if any(version["Key"] > key for version in page.get("Versions", []) + page.get("DeleteMarkers", [])):
+            break
+    return found
+
+
+def resolve_version(s3, bucket, key, version_id=None, at=None):
+    # VersionId를 주면 그대로, 시각을 주면 그 시각에 최신이던 버전 (그때 삭제된 상태였다면 None)
+    if version_id:
+        return version_id
+    moment = parse_timestamp(at) if at else datetime.now(timezone.utc)
+    for entry in list_versions(s3, bucket, key):
+        if entry["LastModified"] <= moment:
+            if entry["IsDeleteMarker"]:
+                logger.warning(f"⚠️ {moment.isoformat()} 시점에 s3://{bucket}/{key}는 삭제된 상태입니다")
+                return None
+            return entry["VersionId"]
+    raise ValueError(f"{moment.isoformat()} 이전의 s3://{bucket}/{key} 버전이 없습니다")
+
+
+def load_version(s3, bucket, key, version_id, cache=None):
+    if version_id is None:
+        return {}, {"version_id": None}
+    body = cache.open(bucket, key, version_id) if cache else None
+    if body is None:
+        obj = s3.get_object(Bucket=bucket, Key=key, VersionId=version_id)
+        # 압축 스냅샷이면 풀면서 읽는다. 캐시에는 풀린 JSON을 저장하므로 캐시 경로는 그대로다
+        body, _ = open_state_body(obj["Body"], obj.get("ContentEncoding"))
+        if cache:
+            try:
+                path = cache.store(bucket, key, version_id, body)
+            finally:
+                body.close()
+            body = gzip.open(path, "rb")
+            logger.info(f"⬇️ 버전 다운로드 후 캐시: {key}@{version_id}")
+    else:
+        logger.info(f"♻️ 버전 캐시 재사용: {key}@{version_id}")
+    reader = TfstateReader(body)
+    try:
+        resources = extract_resources(reader.resources())
+    finally:
+        body.close()
+    return resources, dict(reader.meta, version_id=version_id)
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import zlib
+
+
+def canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def attributes_digest(canonical):
+    return hashlib.blake2b(canonical, digest_size=16).digest()
+
+
+# 인스턴스 하나를 표현하는 최소 레코드.
+# 속성은 dict 대신 정규화된 JSON을 압축한 bytes로 들고 있다가 필요할 때만 복원한다.
+class ResourceRecord:
+    __slots__ = ("digest", "_payload")
+
+    def __init__(self, digest, payload=None):
+        self.digest = digest
+        self._payload = payload
+
+    @classmethod
+    def from_attributes(cls, attributes):
+        return cls.from_canonical(canonical_json(attributes))
+
+    @classmethod
+    def from_canonical(cls, canonical, digest=None):
+        return cls(digest or attributes_digest(canonical), zlib.compress(canonical, 1))
+
+    @property
+    def canonical(self):
+        return None if self._payload is None else zlib.decompress(self._payload)
+
+    @property
+    def attributes(self):
+        if self._payload is None:
+            return None
+        return json.loads(zlib.decompress(self._payload))
+
+
+def resource_address(res, instance):
+    # Terraform 주소 형식: module.a.module.b["x"].data.aws_x.name[0]
+    parts = []
+    if res.get("module"):
+        parts.append(res["module"])
+    if res.get("mode") == "data":
+        parts.append("data")
+    parts.append(res["type"])
+    parts.append(res["name"])
+    address = ".".join(parts)
+
+    index_key = instance.get("index_key")
+    if index_key is not None:
+        address += f"[{json.dumps(index_key, ensure_ascii=False)}]"
+    if instance.get("deposed"):
+        address += f" (deposed {instance['deposed']})"
+    return address
+
+
+def extract_resources(state_resources, only=None):
+    # 전체 Terraform 주소(모듈 경로, mode, type, name, index_key) 기준으로 모든 인스턴스를 색인
+    # only가 주어지면 해당 주소의 속성만 보관한다
+    resources = {}
+    for res in state_resources:
+        for instance in res.get("instances", []):
+            address = resource_address(res, instance)
+            if only is not None and address not in only:
+                continue
+            resources[address] = ResourceRecord.from_attributes(instance.get("attributes", {}))
+    return resources
+
+
+def classify_resources(pre, post):
+    pre_keys = set(pre.keys())
+    post_keys = set(post.keys())
+    added = sorted(post_keys - pre_keys)
+    removed = sorted(pre_keys - post_keys)
+    # 다이제스트만 비교해 변경 없는 인스턴스는 속성을 복원하지 않고 건너뜀
+    changed = sorted(key for key in pre_keys & post_keys if pre[key].digest != post[key].digest)
+    return added, removed, changed
@@ -0,0 +1,97 @@
+import gzip
+import json
+import logging
+
+from botocore.exceptions import ClientError
+
+from state_index import ResourceRecord
+
+logger = logging.getLogger()
+
+MANIFEST_SUFFIX = ".digests.json.gz"
+# 2: 다이제스트와 함께 주소별 정규화 속성(JSON)도 담는다. 1은 다이제스트만 있어 pre를 다시 받아야 했다
+MANIFEST_FORMAT = 2
+# 매니페스트를 만든 상태 파일의 ETag를 객체 메타데이터에도 남겨, HEAD 한 번으로 다시 쓸 필요가 있는지 본다
+STATE_ETAG_METADATA = "state-etag"
+
+
+def manifest_key(state_key):
+    return f"{state_key}{MANIFEST_SUFFIX}"
+
+
+def build_manifest(resources, meta):
+    # 주소 → 속성 다이제스트(hex)와 정규화 속성. 다음 실행에서 pre로 쓸 때 상태 파일을 받거나 파싱하지 않는다.
+    # 속성은 문자열로 넣어 두므로 읽을 때 JSON 문자열만 풀고, 실제 dict는 변경된 주소만 복원한다
+    return {
+        "format": MANIFEST_FORMAT,
+        "etag": meta.get("etag"),
+        "serial": meta.get("serial"),
+        "lineage": meta.get("lineage"),
+        "digests": {address: record.digest.hex() for address, record in resources.items()},
+        "attributes": {address: record.canonical.decode("utf-8") for address, record in resources.items()},
+    }
+
+
+def recorded_etag(s3, bucket, state_key):
+    # 저장된 매니페스트가 어느 상태 ETag로 만들어졌는지 (없으면 None)
+    try:
+        head = s3.head_object(Bucket=bucket, Key=manifest_key(state_key))
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404", "NotFound"):
+            return None
+        raise
+    return head.get("Metadata", {}).get(STATE_ETAG_METADATA)
+
+
+def save_manifest(s3, bucket, state_key, resources, meta):
+    etag = meta.get("etag")
+    if etag and recorded_etag(s3, bucket, state_key) == etag:
+        logger.info(f"🧾 매니페스트 최신 상태 (ETag {etag}) → 저장 생략")
+        return False
+    body = gzip.compress(json.dumps(build_manifest(resources, meta), separators=(",", ":")).encode("utf-8"))
+    s3.put_object(
+        Bucket=bucket,
+        Key=manifest_key(state_key),
+        Body=body,
+        ContentType="application/json",
+        ContentEncoding="gzip",
+        Metadata={STATE_ETAG_METADATA: etag or ""},
+    )
+    logger.info(f"🧾 다이제스트 매니페스트 저장 완료: s3://{bucket}/{manifest_key(state_key)} ({len(body)} bytes)")
+    return True
+
+
+def load_manifest(s3, bucket, state_key):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=manifest_key(state_key))
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None
+        raise
+    try:
+        manifest = json.loads(gzip.decompress(obj["Body"].read()))
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ 매니페스트를 읽을 수 없어 무시합니다: {str(e)}")
+        return None
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    return manifest
+
+
+def manifest_matches(manifest, head):
+    # 같은 내용의 단일 파트 업로드는 ETag가 같다. 스냅샷 작성기가 serial/lineage를
+    # 메타데이터로 남긴 경우에는 그것으로도 같은 상태임을 확인할 수 있다.
+    if manifest.get("etag") and manifest["etag"] == head.get("ETag"):
+        return True
+    metadata = head.get("Metadata", {})
+    return (
+        manifest.get("lineage") is not None
+        and metadata.get("tfstate-lineage") == manifest["lineage"]
+        and metadata.get("tfstate-serial") == str(manifest.get("serial"))
+    )
+
+
+def manifest_records(manifest):
+    attributes = manifest["attributes"]
+    return {address: ResourceRecord.from_canonical(attributes[address].encode("utf-8"), bytes.fromhex(digest))
+            for address, digest in manifest["digests"].items()}
@@ -0,0 +1,105 @@
+import codecs
+import json
+
+# S3 본문을 한 번에 읽지 않고 이 크기 단위로 읽는다
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+# tfstate 본문을 스트리밍으로 파싱해 resources 항목을 하나씩 돌려준다.
+# 버퍼에는 현재 파싱 중인 값 하나만 남으므로 최대 메모리는 전체 파일이 아니라
+# 가장 큰 리소스 항목 크기에 비례한다. 최상위 스칼라 값(version, serial, lineage,
+# terraform_version 등)은 파싱하면서 meta에 채워진다.
+class TfstateReader:
+    def __init__(self, body, chunk_size=CHUNK_SIZE):
+        self._body = body
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.meta = {}
+
+    def _fill(self):
+        if self._eof:
+            return False
+        # 소비한 앞부분은 버리고, 남은 값이 클수록 더 크게 읽어 재시도 비용을 선형으로 유지
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        data = self._body.read(max(self._chunk_size, len(self._buf)))
+        if not data:
+            self._eof = True
+            self._buf += self._decoder.decode(b"", final=True)
+            return False
+        self._buf += self._decoder.decode(data)
+        return True
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("tfstate가 예상보다 일찍 끝났습니다")
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"tfstate 형식 오류: '{char}' 대신 '{found}' 발견 (offset {self._pos})")
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 버퍼 끝에서 끝난 숫자는 잘렸을 수 있으므로 더 읽고 다시 파싱
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def resources(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "resources":
+                yield from self._resource_items()
+            else:
+                value = self._value()
+                if not isinstance(value, (dict, list)):
+                    self.meta[key] = value
+            if self._peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("}")
+            return
+
+    def _resource_items(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("]")
+            return
+
+
+def iter_resources(body, chunk_size=CHUNK_SIZE):
+    return TfstateReader(body, chunk_size).resources()
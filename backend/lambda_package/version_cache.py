@@ -0,0 +1,78 @@
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK = 1024 * 1024
+
+
+# S3 객체 버전은 바뀌지 않으므로 VersionId 기준으로 디스크(/tmp)에 gzip으로 보관한다.
+# 웜 컨테이너가 살아 있는 동안 같은 이력을 다시 조회해도 S3 전송이 없다.
+# 용량을 넘으면 가장 오래 전에 쓰인 파일부터 지운다 (mtime을 접근 시각으로 사용).
+class VersionCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, bucket, key, version_id):
+        name = hashlib.sha256(f"{bucket}\0{key}\0{version_id}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".json.gz")
+
+    def open(self, bucket, key, version_id):
+        # 캐시에 있으면 압축을 풀며 읽는 파일 객체, 없으면 None
+        path = self._path(bucket, key, version_id)
+        try:
+            os.utime(path)
+            f = gzip.open(path, "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return f
+
+    def store(self, bucket, key, version_id, body):
+        # 스트리밍 본문을 그대로 압축해 쓴다. 다 쓴 뒤에만 이름을 바꿔 반쯤 쓴 파일을 읽지 않게 한다
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(bucket, key, version_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+                shutil.copyfileobj(body, f, COPY_CHUNK)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep=None):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json.gz"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                logger.info(f"🧹 버전 캐시 정리: {os.path.basename(path)} ({size} bytes)")
@@ -0,0 +1,146 @@
+# lambda_package 소스로 함수별 Lambda zip을 결정적으로 만든다.
+# 같은 소스면 바이트 단위로 같은 zip이 나오고, 파일 이름에 내용 해시가 들어가므로
+# 이미 만들어 둔 zip이 있으면 다시 만들지 않는다. Terraform은 source_code_hash가 같으면 재배포하지 않는다.
+#
+# 사용법: python backend/lambda_packaging.py
+import ast
+import base64
+import hashlib
+import json
+import logging
+import os
+import zipfile
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_PACKAGE_DIR = os.path.join(ROOT, "backend", "lambda_package")
+TERRAFORM_DIR = os.path.join(ROOT, "terraform")
+BUILD_DIR = os.path.join(TERRAFORM_DIR, "build")
+ARTIFACTS_TFVARS = os.path.join(TERRAFORM_DIR, "lambda_artifacts.auto.tfvars.json")
+
+# Terraform 함수 이름 → 핸들러 모듈
+FUNCTIONS = {
+    "tfstate_compare": "lambda_function",
+    "lock_cleaner": "lock_cleaner",
+}
+
+# zip 형식을 바꾸면 올려서 기존 해시를 무효화한다
+PACKAGE_FORMAT = b"1"
+# zip 항목 시각 고정 (zip 형식이 표현할 수 있는 가장 이른 시각)
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def _imported_modules(path):
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            yield node.module.split(".")[0]
+
+
+def import_closure(entry, package_dir=LAMBDA_PACKAGE_DIR):
+    # 핸들러 모듈에서 시작해 lambda_package 안의 모듈만 따라가며 필요한 파일을 모은다
+    found = set()
+    pending = [entry]
+    while pending:
+        module = pending.pop()
+        if module in found:
+            continue
+        path = os.path.join(package_dir, module + ".py")
+        if not os.path.isfile(path):
+            continue
+        found.add(module)
+        pending.extend(_imported_modules(path))
+    return sorted(module + ".py" for module in found)
+
+
+def content_hash(files, package_dir=LAMBDA_PACKAGE_DIR):
+    h = hashlib.sha256(PACKAGE_FORMAT)
+    for name in files:
+        with open(os.path.join(package_dir, name), "rb") as f:
+            data = f.read()
+        h.update(name.encode("utf-8") + b"\0" + str(len(data)).encode("ascii") + b"\0")
+        h.update(data)
+    return h.hexdigest()
+
+
+def write_zip(zip_path, files, package_dir=LAMBDA_PACKAGE_DIR):
+    # 항목 순서, 시각, 권한을 고정해 같은 입력이면 같은 바이트가 나오게 한다
+    tmp_path = zip_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+        for name in sorted(files):
+            info = zipfile.ZipInfo(name, date_time=FIXED_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o100644 << 16
+            info.create_system = 3
+            with open(os.path.join(package_dir, name), "rb") as f:
+                zipf.writestr(info, f.read(), compresslevel=9)
+    os.replace(tmp_path, zip_path)
+
+
+def file_base64_sha256(path):
+    # Terraform filebase64sha256()와 같은 값
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return base64.b64encode(h.digest()).decode("ascii")
+
+
+def build_function(function_name, entry, build_dir=BUILD_DIR, package_dir=LAMBDA_PACKAGE_DIR):
+    files = import_closure(entry, package_dir)
+    if not files:
+        raise FileNotFoundError(f"핸들러 모듈을 찾을 수 없습니다: {entry}.py")
+    digest = content_hash(files, package_dir)
+    zip_name = f"{function_name}-{digest[:16]}.zip"
+    zip_path = os.path.join(build_dir, zip_name)
+
+    built = not os.path.isfile(zip_path)
+    if built:
+        os.makedirs(build_dir, exist_ok=True)
+        write_zip(zip_path, files, package_dir)
+        logger.info(f"📦 {function_name}: {zip_name} 생성 ({len(files)}개 파일: {', '.join(files)})")
+    else:
+        logger.info(f"♻️ {function_name}: 소스 변경 없음, {zip_name} 재사용")
+
+    # 같은 함수의 이전 버전 zip은 정리한다
+    for name in os.listdir(build_dir):
+        if name.startswith(function_name + "-") and name.endswith(".zip") and name != zip_name:
+            os.remove(os.path.join(build_dir, name))
+
+    return {
+        "filename": os.path.relpath(zip_path, TERRAFORM_DIR).replace(os.sep, "/"),
+        "source_code_hash": file_base64_sha256(zip_path),
+        "content_hash": digest,
+        "files": files,
+        "built": built,
+    }
+
+
+def build_all(functions=None, build_dir=BUILD_DIR, tfvars_path=ARTIFACTS_TFVARS):
+    functions = functions or FUNCTIONS
+    artifacts = {name: build_function(name, entry, build_dir) for name, entry in sorted(functions.items())}
+    # Terraform이 자동으로 읽는 *.auto.tfvars.json으로 zip 경로와 해시를 넘긴다
+    tfvars = {"lambda_artifacts": {name: {"filename": artifact["filename"],
+                                          "source_code_hash": artifact["source_code_hash"]}
+                                   for name, artifact in artifacts.items()}}
+    content = json.dumps(tfvars, indent=2, sort_keys=True) + "\n"
+    existing = None
+    if os.path.isfile(tfvars_path):
+        with open(tfvars_path, encoding="utf-8") as f:
+            existing = f.read()
+    if existing != content:
+        with open(tfvars_path, "w", encoding="utf-8") as f:
+            f.write(content)
+    built = sum(1 for artifact in artifacts.values() if artifact["built"])
+    logger.info(f"✅ Lambda 패키징 완료: {len(artifacts)}개 함수 중 {built}개 새로 빌드")
+    return artifacts
+
+
+if __name__ == "__main__":
+    build_all()
@@ -0,0 +1,92 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class ProvisioningStep:
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+def _timed(step):
+    started = time.monotonic()
+    try:
+        result = step.func()
+        status = "ok" if result is not False else "failed"
+    except Exception as e:
+        logger.error(f"❗ 단계 실패 [{step.name}]: {str(e)}")
+        result, status = None, "failed"
+    return status, result, time.monotonic() - started
+
+
+def run_provisioning(steps, max_workers=4):
+    # 의존성이 모두 성공한 단계부터 동시에 실행하고, 실패한 단계의 후속 단계는 건너뛴다
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        missing = [dep for dep in step.depends_on if dep not in by_name]
+        if missing:
+            raise ValueError(f"알 수 없는 선행 단계: {step.name} → {missing}")
+
+    results = {}
+    pending = dict(by_name)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while pending or running:
+            for name, step in list(pending.items()):
+                dep_status = [results[dep]["status"] for dep in step.depends_on if dep in results]
+                if any(status != "ok" for status in dep_status):
+                    results[name] = {"status": "skipped", "result": None, "elapsed": 0.0}
+                    del pending[name]
+                elif len(dep_status) == len(step.depends_on):
+                    running[pool.submit(_timed, step)] = name
+                    del pending[name]
+            if not running:
+                if pending:
+                    raise ValueError(f"순환 의존성: {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                status, result, elapsed = future.result()
+                results[name] = {"status": status, "result": result, "elapsed": elapsed}
+                logger.info(f"⏱️ [{name}] {status} ({elapsed:.1f}초)")
+
+    return results, time.monotonic() - started
+
+
+def failed_steps(results):
+    return [name for name, value in results.items() if value["status"] != "ok"]
+
+
+def print_timing_report(results, total):
+    print("\n⏱️ 단계별 소요 시간")
+    print(f"  {'단계':<24} {'상태':<8} {'초':>7}")
+    for name, value in sorted(results.items(), key=lambda item: -item[1]["elapsed"]):
+        print(f"  {name:<24} {value['status']:<8} {value['elapsed']:>7.1f}")
+    serial = sum(value["elapsed"] for value in results.values())
+    print(f"  {'전체 (실제 경과)':<24} {'':<8} {total:>7.1f}")
+    print(f"  {'순차 실행 시 합계':<24} {'':<8} {serial:>7.1f}")
+
+
+def backend_bootstrap_steps(manager, repo_owner, repo_name):
+    # S3 / DynamoDB / OIDC 역할은 서로 독립적이고, HTTPS 정책만 버킷 생성 뒤에 적용한다
+    steps = [
+        ProvisioningStep("s3_bucket", manager.create_s3_bucket),
+        ProvisioningStep("https_only_policy", manager.set_https_only_policy, depends_on=["s3_bucket"]),
+        ProvisioningStep("dynamodb_table", manager.create_dynamodb_table),
+    ]
+    if repo_name:
+        steps.append(ProvisioningStep("github_oidc_role",
+                                      lambda: manager.create_github_oidc_role(repo_owner, repo_name)))
+    return steps
+
+
+def provision_backend(manager, repo_owner, repo_name, max_workers=4):
+    results, total = run_provisioning(backend_bootstrap_steps(manager, repo_owner, repo_name), max_workers=max_workers)
+    print_timing_report(results, total)
+    return results
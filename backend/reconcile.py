@@ -0,0 +1,199 @@
+import json
+import logging
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+MISSING = "MISSING"
+
+# 대상 리소스 자체가 없을 때 돌아오는 오류 코드
+_NOT_FOUND_CODES = {
+    "404", "NotFound", "NoSuchBucket",
+    "ResourceNotFoundException", "TableNotFoundException",
+    "NoSuchEntity",
+}
+
+
+def normalize_document(value):
+    # AWS가 돌려주는 정책/설정은 숫자·불리언을 문자열로, 원소 하나짜리 배열을 스칼라로 바꾸기도 한다.
+    # 양쪽을 같은 형태로 맞춰 의미가 같은 문서는 같다고 판단한다.
+    if isinstance(value, dict):
+        return {key: normalize_document(item) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [normalize_document(item) for item in value]
+        if len(items) == 1:
+            return items[0]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def same_document(actual, desired):
+    if actual in (None, MISSING):
+        return False
+    return normalize_document(actual) == normalize_document(desired)
+
+
+def _policy_document(document):
+    # IAM은 정책을 URL 인코딩된 JSON으로 돌려줄 수 있다 (boto3가 풀어주지 않는 경우 대비)
+    if isinstance(document, str):
+        document = json.loads(urllib.parse.unquote(document))
+    return document
+
+
+class BackendReconciler:
+    def __init__(self, manager, repo_owner=None, repo_name=None, max_workers=8):
+        self.manager = manager
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.max_workers = max_workers
+
+    def _read(self, func, absent=()):
+        try:
+            return func()
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code in absent:
+                return None
+            if code in _NOT_FOUND_CODES:
+                return MISSING
+            raise
+
+    def _readers(self):
+        m = self.manager
+        bucket = m.bucket_name
+        readers = {
+            "bucket": (lambda: m.s3_client.head_bucket(Bucket=bucket) and "ACTIVE", ()),
+            "versioning": (lambda: m.s3_client.get_bucket_versioning(Bucket=bucket).get("Status"), ()),
+            "encryption": (
+                lambda: m.s3_client.get_bucket_encryption(Bucket=bucket)["ServerSideEncryptionConfiguration"],
+                ("ServerSideEncryptionConfigurationNotFoundError",),
+            ),
+            "public_access_block": (
+                lambda: m.s3_client.get_public_access_block(Bucket=bucket)["PublicAccessBlockConfiguration"],
+                ("NoSuchPublicAccessBlockConfiguration",),
+            ),
+            "bucket_policy": (
+                lambda: json.loads(m.s3_client.get_bucket_policy(Bucket=bucket)["Policy"]),
+                ("NoSuchBucketPolicy",),
+            ),
+            "table": (lambda: m.dynamodb.describe_table(TableName=m.ddb_table)["Table"], ()),
+            "point_in_time_recovery": (
+                lambda: m.dynamodb.describe_continuous_backups(TableName=m.ddb_table)["ContinuousBackupsDescription"]
+                .get("PointInTimeRecoveryDescription", {}).get("PointInTimeRecoveryStatus"),
+                (),
+            ),
+        }
+        if self.repo_name:
+            role_name = m.github_oidc_role_name(self.repo_name)
+            readers["oidc_provider"] = (
+                lambda: m.iam.get_open_id_connect_provider(OpenIDConnectProviderArn=m.github_oidc_provider_arn())
+                and "ACTIVE",
+                (),
+            )
+            readers["role_trust_policy"] = (
+                lambda: _policy_document(m.iam.get_role(RoleName=role_name)["Role"]["AssumeRolePolicyDocument"]),
+                (),
+            )
+            readers["role_state_policy"] = (
+                lambda: _policy_document(m.iam.get_role_policy(
+                    RoleName=role_name, PolicyName="TerraformStateAccess")["PolicyDocument"]),
+                (),
+            )
+        return readers
+
+    def read_actual(self):
+        # 모든 현재 설정을 한 번의 동시 읽기 단계로 가져온다
+        started = time.monotonic()
+        readers = self._readers()
+        if self.repo_name:
+            self.manager.get_account_id()  # 여러 IAM 읽기가 같은 계정 ID를 쓰므로 먼저 한 번만 조회
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {name: pool.submit(self._read, func, absent) for name, (func, absent) in readers.items()}
+            actual = {name: future.result() for name, future in futures.items()}
+        logger.info(f"🔎 현재 설정 {len(actual)}건 조회 완료 ({time.monotonic() - started:.1f}초)")
+        return actual
+
+    def plan(self, actual=None):
+        m = self.manager
+        actual = actual if actual is not None else self.read_actual()
+        changes, skipped = [], []
+
+        def check(name, in_sync, apply):
+            if in_sync:
+                skipped.append(name)
+            else:
+                changes.append((name, apply))
+
+        if actual["bucket"] == MISSING:
+            changes.append(("s3_bucket", m.create_s3_bucket))
+            changes.append(("https_only_policy", m.set_https_only_policy))
+        else:
+            check("versioning", actual["versioning"] == m.versioning_configuration()["Status"], m.enable_versioning)
+            check("encryption",
+                  actual["encryption"] not in (None, MISSING)
+                  and same_document(actual["encryption"]["Rules"], m.encryption_configuration()["Rules"]),
+                  m.enable_encryption)
+            check("public_access_block",
+                  same_document(actual["public_access_block"], m.public_access_block_configuration()),
+                  m.block_public_access)
+            check("https_only_policy", same_document(actual["bucket_policy"], m.https_only_policy()),
+                  m.set_https_only_policy)
+
+        if actual["table"] == MISSING:
+            changes.append(("dynamodb_table", m.create_dynamodb_table))
+        else:
+            check("point_in_time_recovery", actual["point_in_time_recovery"] == "ENABLED",
+                  m.enable_point_in_time_recovery)
+            stream = actual["table"].get("StreamSpecification", {})
+            check("lock_stream",
+                  stream.get("StreamEnabled")
+                  and stream.get("StreamViewType") == m.lock_stream_specification()["StreamViewType"],
+                  m.enable_lock_stream)
+
+        if self.repo_name:
+            role_name = m.github_oidc_role_name(self.repo_name)
+            if actual["role_trust_policy"] == MISSING:
+                changes.append(("github_oidc_role",
+                                lambda: m.create_github_oidc_role(self.repo_owner, self.repo_name)))
+            else:
+                check("oidc_provider", actual["oidc_provider"] != MISSING, m.ensure_github_oidc_provider)
+                trust_policy = m.github_trust_policy(m.github_oidc_provider_arn(), self.repo_owner, self.repo_name)
+                check("role_trust_policy", same_document(actual["role_trust_policy"], trust_policy),
+                      lambda: m.update_trust_policy(role_name, trust_policy))
+                account_id = m.get_account_id()
+                check("role_state_policy",
+                      same_document(actual["role_state_policy"], m.terraform_state_policy(account_id)),
+                      lambda: m.put_state_access_policy(role_name, account_id))
+
+        return changes, skipped
+
+    def reconcile(self, dry_run=False):
+        changes, skipped = self.plan()
+        applied, failed = [], []
+        if not dry_run:
+            for name, apply in changes:
+                try:
+                    ok = apply() is not False
+                except Exception as e:
+                    logger.error(f"❗ {name} 적용 실패: {str(e)}")
+                    ok = False
+                (applied if ok else failed).append(name)
+
+        print("\n🧭 Reconcile 결과" + (" (계획만)" if dry_run else ""))
+        if dry_run:
+            for name, _ in changes:
+                print(f"  ~ 변경 필요: {name}")
+        for name in applied:
+            print(f"  ✔ 적용: {name}")
+        for name in failed:
+            print(f"  ✘ 실패: {name}")
+        for name in skipped:
+            print(f"  = 건너뜀 (이미 일치): {name}")
+        print(f"  변경 {len(changes)}건 / 건너뜀 {len(skipped)}건")
+        return {"changes": [name for name, _ in changes], "applied": applied, "failed": failed, "skipped": skipped}
@@ -0,0 +1,209 @@
+# S3 Inventory 보고서로 버킷의 버전 수/용량을 미리 보고, 삭제 시 목록 조회 대신 보고서의 버전 목록을 쓴다.
+# 수백만 버전 버킷은 list_object_versions 페이지 조회 자체가 병목이라, 인벤토리를 한 줄씩 흘려 읽는다.
+#
+# 사용법: python backend/s3_inventory.py <manifest.json 경로 또는 s3://버킷/.../manifest.json> [--workers 32]
+# 인벤토리 설정은 "모든 버전(IncludedObjectVersions=All)"이어야 VersionId/IsDeleteMarker가 들어 있다.
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from urllib.parse import unquote_plus
+
+from s3_purge import MAX_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 삭제 시간 추정용: DeleteObjects 1000건 배치 하나의 평균 응답 시간과 S3 접두어별 쓰기 한도
+BATCH_LATENCY_SECONDS = 0.5
+S3_WRITES_PER_PREFIX = 3500
+REQUIRED_FIELDS = ("Key", "VersionId")
+# ORC/Parquet 인벤토리는 열 이름이 snake_case(key, version_id, is_latest ...)라서
+# 소문자로 바꾸고 밑줄을 뺀 이름으로 CSV 열 이름에 맞춘다
+COLUMN_FIELDS = {"key": "Key", "versionid": "VersionId", "islatest": "IsLatest",
+                 "isdeletemarker": "IsDeleteMarker", "size": "Size"}
+
+
+def _normalize_column(name):
+    return name.lower().replace("_", "")
+
+
+def _check_required(fields, where):
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        raise ValueError(f"{where}에 {missing} 열이 없습니다 (모든 버전 포함으로 설정해야 합니다)")
+
+
+def _split_s3_url(url):
+    bucket, _, key = url[len("s3://"):].partition("/")
+    return bucket, key
+
+
+class InventoryManifest:
+    def __init__(self, location, s3=None, root=None):
+        # location: 로컬 manifest.json 경로 또는 s3:// URL. 로컬이면 데이터 파일은 root(대상 버킷을 옮겨 둔 디렉터리) 기준
+        self.location = location
+        self.s3 = s3
+        if location.startswith("s3://"):
+            if s3 is None:
+                raise ValueError("S3 인벤토리를 읽으려면 s3 클라이언트가 필요합니다")
+            bucket, key = _split_s3_url(location)
+            self.manifest = json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+            self.data_bucket = self.manifest["destinationBucket"].split(":::", 1)[-1]
+        else:
+            with open(location, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            self.data_bucket = None
+        self.root = root
+        self.source_bucket = self.manifest.get("sourceBucket")
+        self.file_format = self.manifest.get("fileFormat", "CSV").upper()
+        schema = self.manifest.get("fileSchema", "")
+        if self.file_format == "CSV":
+            self.fields = [field.strip() for field in schema.split(",")]
+            _check_required(self.fields, "인벤토리")
+        else:
+            # ORC는 "struct<bucket:string,key:string,...>", Parquet은 "message s3.inventory { ... binary key; ... }"
+            # 형태라 식별자만 뽑아 본다. 스키마가 없으면 파일을 읽을 때 확인한다
+            self.fields = [COLUMN_FIELDS[_normalize_column(token)] for token in re.findall(r"\w+", schema)
+                           if _normalize_column(token) in COLUMN_FIELDS]
+            if schema:
+                _check_required(self.fields, "인벤토리")
+        self.files = self.manifest.get("files", [])
+
+    def _local_path(self, key):
+        if self.root:
+            return os.path.join(self.root, key)
+        # 대상 버킷을 그대로 내려받았다면 manifest.json 위쪽 어딘가가 버킷 루트다
+        directory = os.path.dirname(os.path.abspath(self.location))
+        while True:
+            candidate = os.path.join(directory, key)
+            if os.path.exists(candidate):
+                return candidate
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return os.path.join(os.path.dirname(os.path.abspath(self.location)), os.path.basename(key))
+            directory = parent
+
+    def _open_binary(self, key):
+        if self.data_bucket:
+            return self.s3.get_object(Bucket=self.data_bucket, Key=key)["Body"]
+        return open(self._local_path(key), "rb")
+
+    def _iter_csv(self, key):
+        body = self._open_binary(key)
+        try:
+            with gzip.GzipFile(fileobj=body) as raw:
+                for row in csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline="")):
+                    yield dict(zip(self.fields, row))
+        finally:
+            body.close()
+
+    def _iter_columnar(self, key):
+        try:
+            import pyarrow.orc as orc
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError(f"{self.file_format} 인벤토리를 읽으려면 pyarrow가 필요합니다 (pip install pyarrow)")
+        # ORC/Parquet은 임의 접근이 필요해 S3 파일은 임시 파일로 흘려 받은 뒤 배치 단위로 읽는다
+        tmp = None
+        if self.data_bucket:
+            tmp = tempfile.NamedTemporaryFile(suffix="." + self.file_format.lower(), delete=False)
+            body = self._open_binary(key)
+            try:
+                with tmp:
+                    shutil.copyfileobj(body, tmp, 1024 * 1024)
+            finally:
+                body.close()
+            path = tmp.name
+        else:
+            path = self._local_path(key)
+        try:
+            if self.file_format == "ORC":
+                reader = orc.ORCFile(path)
+                batches = (reader.read_stripe(index) for index in range(reader.nstripes))
+            else:
+                batches = pq.ParquetFile(path).iter_batches(batch_size=64 * 1024)
+            for batch in batches:
+                columns = {COLUMN_FIELDS[_normalize_column(name)]: column.to_pylist()
+                           for name, column in zip(batch.schema.names, batch.columns)
+                           if _normalize_column(name) in COLUMN_FIELDS}
+                _check_required(columns, f"인벤토리 파일 {key}")
+                for index in range(batch.num_rows):
+                    yield {field: values[index] for field, values in columns.items()}
+        finally:
+            if tmp is not None:
+                os.remove(tmp.name)
+
+    def rows(self):
+        reader = self._iter_csv if self.file_format == "CSV" else self._iter_columnar
+        for entry in self.files:
+            yield from reader(entry["key"])
+
+    def versions(self):
+        # S3VersionPurger.purge(versions=...)에 그대로 넘길 수 있는 형태로
+        for row in self.rows():
+            key = row["Key"]
+            if self.file_format == "CSV":
+                # CSV 인벤토리의 키는 URL 인코딩되어 있다
+                key = unquote_plus(key)
+            # 버전 관리 전에 올라간 객체는 VersionId가 비어 있고, 삭제 API에서는 "null"로 지정한다
+            yield {"Key": key, "VersionId": row.get("VersionId") or "null"}
+
+
+def _flag(value):
+    return value is True or str(value).lower() == "true"
+
+
+def plan_inventory(manifest, workers=32):
+    counts = {"versions": 0, "current": 0, "noncurrent": 0, "delete_markers": 0, "bytes": 0}
+    prefixes = set()
+    for row in manifest.rows():
+        counts["versions"] += 1
+        if _flag(row.get("IsDeleteMarker")):
+            counts["delete_markers"] += 1
+        elif _flag(row.get("IsLatest")):
+            counts["current"] += 1
+        else:
+            counts["noncurrent"] += 1
+        size = row.get("Size")
+        counts["bytes"] += int(size) if size not in (None, "") else 0
+        # 쓰기 한도는 접두어별이라 최상위 접두어 수로 병렬도 상한을 잡는다 (너무 많으면 더 세지 않음)
+        if len(prefixes) < 1000:
+            prefixes.add(str(row["Key"]).split("/", 1)[0])
+
+    requests = -(-counts["versions"] // MAX_BATCH_SIZE)
+    api_rate = workers * MAX_BATCH_SIZE / BATCH_LATENCY_SECONDS
+    s3_rate = S3_WRITES_PER_PREFIX * max(len(prefixes), 1)
+    rate = min(api_rate, s3_rate)
+    return dict(counts, source_bucket=manifest.source_bucket, files=len(manifest.files),
+                format=manifest.file_format, delete_requests=requests, workers=workers,
+                estimated_seconds=round(counts["versions"] / rate, 1) if counts["versions"] else 0.0)
+
+
+def print_plan(plan):
+    print(f"\n📋 인벤토리 기반 삭제 계획: s3://{plan['source_bucket']} ({plan['format']} 파일 {plan['files']}개)")
+    print(f"  버전 {plan['versions']:,}개 (현재 {plan['current']:,} / 이전 {plan['noncurrent']:,} / "
+          f"삭제 마커 {plan['delete_markers']:,})")
+    print(f"  용량 {plan['bytes'] / (1024 ** 3):,.2f} GiB")
+    print(f"  DeleteObjects 요청 {plan['delete_requests']:,}건, 예상 삭제 시간 약 {plan['estimated_seconds']:,.0f}초 "
+          f"(워커 {plan['workers']})")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="S3 Inventory로 버킷 버전 수/용량/삭제 시간 추정 (dry-run)")
+    parser.add_argument("manifest")
+    parser.add_argument("--root", help="로컬 인벤토리 파일의 기준 디렉터리 (대상 버킷 루트)")
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    s3 = None
+    if args.manifest.startswith("s3://"):
+        import boto3
+        s3 = boto3.client("s3")
+    print_plan(plan_inventory(InventoryManifest(args.manifest, s3=s3, root=args.root), workers=args.workers))
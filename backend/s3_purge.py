@@ -0,0 +1,165 @@
+import logging
+import queue
+import threading
+import time
+
+from adaptive import AdaptiveConcurrency, backoff_delay, is_throttle, is_throttle_code
+
+logger = logging.getLogger(__name__)
+
+# delete_objects 한 번에 보낼 수 있는 최대 키 수 (S3 제한)
+MAX_BATCH_SIZE = 1000
+
+
+class S3VersionPurger:
+    def __init__(self, s3_client, bucket_name, max_workers=8, batch_size=MAX_BATCH_SIZE,
+                 max_attempts=5, progress_interval=5.0, concurrency=None, list_client=None):
+        # s3_client는 DeleteObjects에만 쓴다. 스로틀을 제어기가 보도록 재시도 없는 클라이언트를 넘기고,
+        # 목록 조회는 재시도가 있는 list_client로 한다 (없으면 s3_client)
+        self.s3 = s3_client
+        self.list_client = list_client or s3_client
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_attempts = max_attempts
+        self.progress_interval = progress_interval
+        # 실제 동시 삭제 수는 AIMD 제어기가 정한다 (워커 수는 상한).
+        # 여러 회차/버킷에서 학습한 속도를 이어 쓰려면 같은 제어기를 넘긴다.
+        self.concurrency = concurrency or AdaptiveConcurrency(
+            "s3:DeleteObjects", initial=min(4, max_workers), maximum=max_workers)
+
+        # 생산자가 너무 앞서 나가지 않도록 대기 중인 신규 배치 수를 제한 (메모리 상한).
+        # 재시도 배치는 슬롯을 잡지 않으므로 워커끼리 서로를 막지 않는다.
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_workers * 2)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listing_done = False
+        self.listed = 0
+        self.deleted = 0
+        self.failed = []
+
+    def _list_versions(self):
+        paginator = self.list_client.get_paginator('list_object_versions')
+        for page in paginator.paginate(Bucket=self.bucket_name):
+            for version in page.get('Versions', []) + page.get('DeleteMarkers', []):
+                yield {'Key': version['Key'], 'VersionId': version['VersionId']}
+
+    def _produce(self, versions):
+        batch = []
+        try:
+            for obj in versions:
+                batch.append(obj)
+                if len(batch) >= self.batch_size:
+                    self._enqueue(batch)
+                    batch = []
+            if batch:
+                self._enqueue(batch)
+        finally:
+            with self._lock:
+                self._listing_done = True
+
+    def _enqueue(self, batch):
+        self._slots.acquire()
+        with self._lock:
+            self.listed += len(batch)
+        self._queue.put((batch, 1, 0))
+
+    def _consume(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch, attempt, throttled = item
+            try:
+                self._delete_batch(batch, attempt, throttled)
+            finally:
+                # 생산자가 잡은 슬롯은 처음 들어온 배치만 반환한다
+                if attempt == 1 and throttled == 0:
+                    self._slots.release()
+                self._queue.task_done()
+
+    def _delete_batch(self, batch, attempt, throttled):
+        self.concurrency.acquire()
+        try:
+            response = self.s3.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': batch, 'Quiet': True}
+            )
+            errors = response.get('Errors', [])
+            slowed = any(is_throttle_code(err.get('Code')) for err in errors)
+        except Exception as e:
+            slowed = is_throttle(e)
+            if not slowed:
+                logger.warning(f"⚠️ 배치 삭제 호출 실패 ({len(batch)}개, 시도 {attempt}): {str(e)}")
+            errors = [{'Key': obj['Key'], 'VersionId': obj['VersionId'],
+                       'Code': 'SlowDown' if slowed else 'RequestFailed'} for obj in batch]
+        self.concurrency.release(throttled=slowed)
+
+        with self._lock:
+            self.deleted += len(batch) - len(errors)
+
+        if not errors:
+            return
+
+        retry = [{'Key': err['Key'], 'VersionId': err['VersionId']} for err in errors]
+        # 스로틀은 실패가 아니라 속도 신호이므로 시도 횟수를 쓰지 않고 별도 한도로 재시도한다
+        if slowed and throttled < self.concurrency.max_throttle_retries:
+            time.sleep(backoff_delay(throttled))
+            self._queue.put((retry, attempt, throttled + 1))
+            return
+        if attempt >= self.max_attempts or slowed:
+            logger.error(f"❗ {len(retry)}개 버전 삭제 재시도 한도 초과 (예: {errors[0].get('Code')})")
+            with self._lock:
+                self.failed.extend(retry)
+            return
+
+        # 실패한 키만 다시 큐에 넣는다 (지수 백오프 후)
+        time.sleep(min(0.2 * (2 ** attempt), 10))
+        self._queue.put((retry, attempt + 1, throttled))
+
+    def _report_progress(self, started):
+        while not self._stop.wait(self.progress_interval):
+            self._log_progress(started)
+
+    def _log_progress(self, started):
+        with self._lock:
+            listed, deleted, listing_done = self.listed, self.deleted, self._listing_done
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rate = deleted / elapsed
+        remaining = listed - deleted - len(self.failed)
+        suffix = "" if listing_done else "+ (목록 조회 중)"
+        logger.info(f"🔄 {self.bucket_name}: {deleted}개 삭제, {rate:.0f}개/초, 남은 버전 {remaining}{suffix}, "
+                    f"동시성 {self.concurrency.limit}/{self.max_workers}")
+
+    def purge(self, versions=None):
+        started = time.monotonic()
+        if versions is None:
+            versions = self._list_versions()
+
+        workers = [threading.Thread(target=self._consume, daemon=True) for _ in range(self.max_workers)]
+        for worker in workers:
+            worker.start()
+        progress = threading.Thread(target=self._report_progress, args=(started,), daemon=True)
+        progress.start()
+
+        try:
+            # 생산자(목록 조회)는 현재 스레드에서 실행되어 삭제와 겹쳐 진행된다
+            self._produce(versions)
+            self._queue.join()
+        finally:
+            for _ in workers:
+                self._queue.put(None)
+            for worker in workers:
+                worker.join()
+            self._stop.set()
+            progress.join()
+
+        self._log_progress(started)
+        return {
+            'listed': self.listed,
+            'deleted': self.deleted,
+            'failed': len(self.failed),
+            'elapsed': time.monotonic() - started,
+        }
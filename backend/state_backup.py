@@ -0,0 +1,319 @@
+# 상태 버킷의 객체 버전을 다른 버킷(다른 리전)으로 증분 백업한다.
+# 복사는 모두 서버측(copy_object / upload_part_copy)이라 실행 환경을 바이트가 지나가지 않는다.
+# 백업 버킷에 체크포인트(키별 마지막 백업 버전)를 두고, 그 이후에 생긴 버전만 복사한다.
+#
+# 사용법: python backend/state_backup.py <원본 버킷> <백업 버킷> --dest-region us-west-2 [--prefix env:/]
+#         [--time-limit 초]
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from adaptive import AdaptiveConcurrency
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "_backup/checkpoint.json"
+CHECKPOINT_FORMAT = 1
+# 이보다 큰 버전은 파트 단위 upload_part_copy로 나눠 동시에 복사한다 (copy_object 한도는 5GB)
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+PART_SIZE = 64 * 1024 * 1024
+PART_WORKERS = 4
+SOURCE_VERSION_METADATA = "backup-source-version-id"
+SOURCE_MODIFIED_METADATA = "backup-source-last-modified"
+# 중간에 프로세스가 죽어도 이만큼만 다시 복사하도록 키 수/시간 간격으로 체크포인트를 저장한다
+CHECKPOINT_EVERY_KEYS = 50
+CHECKPOINT_INTERVAL = 30
+# 목록/체크포인트/멀티파트 제어 요청은 botocore adaptive 재시도에 맡긴다
+ADAPTIVE_RETRIES = {"mode": "adaptive", "max_attempts": 10}
+# AdaptiveConcurrency.call로 보내는 복사 요청 전용 클라이언트는 botocore가 재시도하지 않는다.
+# 두 층이 겹치면 요청 하나가 최대 10×10번 시도되고 제어기는 스로틀을 보지 못해 동시성을 줄이지 못한다
+COPY_RETRIES = {"mode": "standard", "total_max_attempts": 1}
+
+
+def load_checkpoint(s3, bucket, source_bucket):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=CHECKPOINT_KEY)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return {}
+        raise
+    checkpoint = json.loads(obj["Body"].read())
+    if checkpoint.get("format") != CHECKPOINT_FORMAT or checkpoint.get("source_bucket") != source_bucket:
+        logger.warning(f"⚠️ 체크포인트가 {source_bucket}의 것이 아니거나 형식이 달라 전체 백업합니다")
+        return {}
+    return checkpoint.get("keys", {})
+
+
+def save_checkpoint(s3, bucket, source_bucket, keys):
+    body = json.dumps({"format": CHECKPOINT_FORMAT, "source_bucket": source_bucket,
+                       "saved_at": time.time(), "keys": keys}, ensure_ascii=False, sort_keys=True)
+    s3.put_object(Bucket=bucket, Key=CHECKPOINT_KEY, Body=body.encode("utf-8"), ContentType="application/json")
+    logger.info(f"📌 백업 체크포인트 저장: s3://{bucket}/{CHECKPOINT_KEY} ({len(keys)}개 키)")
+
+
+class StateBackup:
+    def __init__(self, source_s3, source_bucket, dest_s3, dest_bucket, prefix="", max_workers=8,
+                 concurrency=None, multipart_threshold=MULTIPART_THRESHOLD, part_size=PART_SIZE,
+                 source_copy_s3=None, dest_copy_s3=None, time_limit=None):
+        self.source_s3 = source_s3
+        self.source_bucket = source_bucket
+        # 복사 요청은 대상 리전 엔드포인트로 보낸다 (CopySource가 다른 리전이어도 서버측 복사)
+        self.dest_s3 = dest_s3
+        self.dest_bucket = dest_bucket
+        # concurrency.call로 보내는 요청은 재시도 없는 클라이언트로 한다 (없으면 source_s3/dest_s3)
+        self.source_copy_s3 = source_copy_s3 or source_s3
+        self.dest_copy_s3 = dest_copy_s3 or dest_s3
+        # time_limit초가 지나면 새 키를 시작하지 않고 체크포인트를 저장한 뒤 끝낸다 (다음 실행이 이어서 한다)
+        self.time_limit = time_limit
+        self.deadline = None
+        self.prefix = prefix
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.concurrency = concurrency or AdaptiveConcurrency(
+            "s3:CopyObject", initial=min(4, max_workers), maximum=max_workers * PART_WORKERS)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._keys_since_save = 0
+        self._last_save = time.monotonic()
+        self.checkpoint = {}
+        self.copied = 0
+        self.copied_bytes = 0
+        self.deleted = 0
+        self.skipped = 0
+        self.failed = []
+
+    def _current_objects(self):
+        paginator = self.source_s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.source_bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                yield obj
+
+    def changed_keys(self):
+        # 현재 객체 목록만 훑어 체크포인트와 다른 키를 찾는다 (버전 목록은 바뀐 키만 조회)
+        seen = set()
+        changed = []
+        for obj in self._current_objects():
+            key = obj["Key"]
+            seen.add(key)
+            saved = self.checkpoint.get(key)
+            if not saved or saved.get("deleted") or saved.get("etag") != obj["ETag"] \
+                    or saved.get("last_modified") != obj["LastModified"].isoformat():
+                changed.append(key)
+        # 체크포인트 이후 삭제된 키는 목록에 없으므로 따로 모은다
+        changed.extend(key for key, saved in self.checkpoint.items()
+                       if key not in seen and not saved.get("deleted") and key.startswith(self.prefix))
+        return sorted(changed), len(seen)
+
+    def pending_versions(self, key):
+        # 체크포인트 이후의 버전과 삭제 마커를 오래된 순으로.
+        # LastModified는 초 단위라 같은 초의 버전은 S3가 돌려준 최신순을 그대로 믿는다 (안정 정렬)
+        entries = []
+        paginator = self.source_s3.get_paginator("list_object_versions")
+        for page in paginator.paginate(Bucket=self.source_bucket, Prefix=key):
+            entries.extend(dict(v, IsDeleteMarker=False) for v in page.get("Versions", []) if v["Key"] == key)
+            entries.extend(dict(m, IsDeleteMarker=True) for m in page.get("DeleteMarkers", []) if m["Key"] == key)
+        entries.sort(key=lambda entry: entry["LastModified"], reverse=True)
+        entries.reverse()
+        saved = self.checkpoint.get(key)
+        if not saved:
+            return entries
+        ids = [entry["VersionId"] for entry in entries]
+        if saved["version_id"] in ids:
+            return entries[ids.index(saved["version_id"]) + 1:]
+        # 마지막 백업 버전이 수명 주기로 지워졌다면 시각으로 자른다
+        return [entry for entry in entries if entry["LastModified"].isoformat() > saved["last_modified"]]
+
+    def _copy_source(self, key, version_id):
+        return {"Bucket": self.source_bucket, "Key": key, "VersionId": version_id}
+
+    def _destination_attributes(self, key, version):
+        # 원본의 Content-Type/Encoding/메타데이터를 유지하고 원본 버전 정보를 덧붙인다
+        head = self.concurrency.call(self.source_copy_s3.head_object, Bucket=self.source_bucket, Key=key,
+                                     VersionId=version["VersionId"])
+        metadata = dict(head.get("Metadata", {}))
+        metadata[SOURCE_VERSION_METADATA] = version["VersionId"]
+        metadata[SOURCE_MODIFIED_METADATA] = version["LastModified"].isoformat()
+        attributes = {"Metadata": metadata, "ContentType": head.get("ContentType", "application/json")}
+        if head.get("ContentEncoding"):
+            attributes["ContentEncoding"] = head["ContentEncoding"]
+        return attributes
+
+    def _copy_version(self, key, version):
+        attributes = self._destination_attributes(key, version)
+        if version["Size"] < self.multipart_threshold:
+            self.concurrency.call(self.dest_copy_s3.copy_object, Bucket=self.dest_bucket, Key=key,
+                                  CopySource=self._copy_source(key, version["VersionId"]),
+                                  MetadataDirective="REPLACE", **attributes)
+        else:
+            self._multipart_copy(key, version, attributes)
+
+    def _multipart_copy(self, key, version, attributes):
+        upload = self.dest_s3.create_multipart_upload(Bucket=self.dest_bucket, Key=key, **attributes)
+        upload_id = upload["UploadId"]
+        size = version["Size"]
+        ranges = [(number, start, min(start + self.part_size, size) - 1)
+                  for number, start in enumerate(range(0, size, self.part_size), 1)]
+
+        def copy_part(part):
+            number, start, end = part
+            response = self.concurrency.call(
+                self.dest_copy_s3.upload_part_copy, Bucket=self.dest_bucket, Key=key, UploadId=upload_id,
+                PartNumber=number, CopySource=self._copy_source(key, version["VersionId"]),
+                CopySourceRange=f"bytes={start}-{end}")
+            return {"PartNumber": number, "ETag": response["CopyPartResult"]["ETag"]}
+
+        try:
+            with ThreadPoolExecutor(max_workers=PART_WORKERS) as pool:
+                parts = list(pool.map(copy_part, ranges))
+            self.dest_s3.complete_multipart_upload(Bucket=self.dest_bucket, Key=key, UploadId=upload_id,
+                                                   MultipartUpload={"Parts": parts})
+        except Exception:
+            self.dest_s3.abort_multipart_upload(Bucket=self.dest_bucket, Key=key, UploadId=upload_id)
+            raise
+        logger.info(f"🧩 멀티파트 복사 완료: {key}@{version['VersionId']} ({len(ranges)}개 파트, {size} bytes)")
+
+    def backup_key(self, key):
+        # 같은 키의 버전은 순서대로 복사해야 백업 버킷의 버전 순서가 원본과 같아진다
+        try:
+            pending = self.pending_versions(key)
+        except Exception as e:
+            logger.error(f"❗ {key} 버전 목록 조회 실패: {str(e)}")
+            with self._lock:
+                self.failed.append({"key": key, "error": str(e)})
+            return
+        for version in pending:
+            try:
+                if version["IsDeleteMarker"]:
+                    self.concurrency.call(self.dest_copy_s3.delete_object, Bucket=self.dest_bucket, Key=key)
+                else:
+                    self._copy_version(key, version)
+            except Exception as e:
+                logger.error(f"❗ {key}@{version['VersionId']} 복사 실패: {str(e)}")
+                with self._lock:
+                    self.failed.append({"key": key, "version_id": version["VersionId"], "error": str(e)})
+                # 뒤 버전을 먼저 복사하면 순서가 어긋나므로 이 키는 여기서 멈추고 다음 실행에서 이어간다
+                return
+            with self._lock:
+                if version["IsDeleteMarker"]:
+                    self.deleted += 1
+                else:
+                    self.copied += 1
+                    self.copied_bytes += version["Size"]
+                # 체크포인트는 성공한 버전까지만 전진한다
+                self.checkpoint[key] = {
+                    "version_id": version["VersionId"],
+                    "last_modified": version["LastModified"].isoformat(),
+                    "etag": version.get("ETag"),
+                    "deleted": version["IsDeleteMarker"],
+                }
+
+    def save_progress(self, wait=False):
+        # 워커 여럿이 동시에 저장하지 않게 한다. 다른 워커가 저장 중이면 건너뛴다 (다음 키에서 다시 시도)
+        if not self._save_lock.acquire(blocking=wait):
+            return
+        try:
+            with self._lock:
+                snapshot = dict(self.checkpoint)
+                self._keys_since_save = 0
+                self._last_save = time.monotonic()
+            save_checkpoint(self.dest_s3, self.dest_bucket, self.source_bucket, snapshot)
+        finally:
+            self._save_lock.release()
+
+    def _backup_and_checkpoint(self, key):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            with self._lock:
+                self.skipped += 1
+            return
+        self.backup_key(key)
+        with self._lock:
+            self._keys_since_save += 1
+            due = (self._keys_since_save >= CHECKPOINT_EVERY_KEYS
+                   or time.monotonic() - self._last_save >= CHECKPOINT_INTERVAL)
+        if due:
+            try:
+                self.save_progress()
+            except Exception as e:
+                # 중간 저장 실패로 백업을 멈추지 않는다 (마지막 저장이 다시 시도)
+                logger.warning(f"⚠️ 중간 체크포인트 저장 실패: {str(e)}")
+
+    def run(self):
+        started = time.monotonic()
+        if self.time_limit is not None:
+            self.deadline = started + self.time_limit
+        self.checkpoint = load_checkpoint(self.dest_s3, self.dest_bucket, self.source_bucket)
+        changed, scanned = self.changed_keys()
+        logger.info(f"🔎 s3://{self.source_bucket}/{self.prefix} 키 {scanned}개 중 {len(changed)}개 변경 "
+                    f"→ s3://{self.dest_bucket} (워커 {self.max_workers})")
+        self._last_save = time.monotonic()
+        try:
+            if changed:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    list(pool.map(self._backup_and_checkpoint, changed))
+        finally:
+            # 중간에 실패해도 끝난 만큼은 체크포인트에 남겨 다음 실행이 이어서 한다
+            if changed:
+                self.save_progress(wait=True)
+        if self.skipped:
+            logger.warning(f"⏳ 제한 시간 {self.time_limit}초 도달 → 키 {self.skipped}개는 다음 실행에서 백업합니다")
+        summary = {
+            "source": self.source_bucket,
+            "destination": self.dest_bucket,
+            "keys": scanned,
+            "changed_keys": len(changed),
+            "copied": self.copied,
+            "copied_bytes": self.copied_bytes,
+            "deleted": self.deleted,
+            "skipped_keys": self.skipped,
+            "failed": self.failed,
+            "elapsed": round(time.monotonic() - started, 2),
+        }
+        logger.info(f"✅ 백업 완료: 버전 {self.copied}개 ({self.copied_bytes} bytes) 복사, 삭제 마커 {self.deleted}개, "
+                    f"실패 {len(self.failed)}건 ({summary['elapsed']}초)")
+        return summary
+
+
+def main():
+    import boto3
+    from botocore.config import Config
+
+    import lambda_modules  # noqa: F401
+    from aws_metrics import instrument_client, metrics
+
+    parser = argparse.ArgumentParser(description="Terraform 상태 버킷 증분 교차 리전 백업")
+    parser.add_argument("source_bucket")
+    parser.add_argument("dest_bucket")
+    parser.add_argument("--source-region")
+    parser.add_argument("--dest-region", required=True)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--time-limit", type=float,
+                        help="이 시간(초)이 지나면 새 키를 시작하지 않고 체크포인트를 저장한 뒤 끝낸다")
+    args = parser.parse_args()
+
+    def client(region, retries):
+        config = Config(max_pool_connections=args.workers * PART_WORKERS + 2, retries=retries)
+        return instrument_client(boto3.client("s3", region_name=region, config=config))
+
+    try:
+        summary = StateBackup(client(args.source_region, ADAPTIVE_RETRIES), args.source_bucket,
+                              client(args.dest_region, ADAPTIVE_RETRIES), args.dest_bucket, args.prefix,
+                              max_workers=args.workers,
+                              source_copy_s3=client(args.source_region, COPY_RETRIES),
+                              dest_copy_s3=client(args.dest_region, COPY_RETRIES),
+                              time_limit=args.time_limit).run()
+        if summary["failed"]:
+            raise SystemExit(1)
+    finally:
+        print("\n" + metrics.summary_table())
+
+
+if __name__ == "__main__":
+    main()
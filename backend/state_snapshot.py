@@ -0,0 +1,143 @@
+# 비교용 pre/post 상태 스냅샷을 압축해 올린다. tfstate는 보통 10~20배 줄어 전송량과 Lambda 다운로드 시간이 준다.
+# Content-Encoding과 tfstate-serial/tfstate-lineage 메타데이터를 함께 남겨, Lambda는 인코딩을 보고 풀면서 읽고
+# 매니페스트(state_manifest)는 본문을 받지 않고도 같은 상태인지 확인한다.
+#
+# 사용법: terraform state pull | python backend/state_snapshot.py - s3://<버킷>/pre_terraform.tfstate [--encoding zstd]
+import argparse
+import gzip
+import logging
+import sys
+import tempfile
+
+import lambda_modules  # noqa: F401
+from state_codec import open_state_body
+from tfstate_reader import TfstateReader
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("gzip", "zstd", "identity")
+# 압축 결과가 이보다 작으면 메모리에서, 크면 임시 파일에서 업로드한다
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+# 단일 PutObject 한도. 이보다 크면 멀티파트로 올리며, 이때 ETag는 본문 MD5가 아니다
+PUT_OBJECT_MAX_BYTES = 5 * 1024 ** 3
+COPY_CHUNK = 1024 * 1024
+
+
+def _compressor(encoding, target, level=None):
+    if encoding == "gzip":
+        # mtime=0: 같은 상태면 같은 바이트가 나온다. upload_snapshot이 한 번의 PutObject로 올리므로 ETag(MD5)도 같다
+        return gzip.GzipFile(fileobj=target, mode="wb", compresslevel=level or 6, mtime=0)
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd로 압축하려면 zstandard 패키지가 필요합니다 (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=level or 10).stream_writer(target, closefd=False)
+    return None
+
+
+def compress_state(source, encoding="gzip", level=None):
+    # 입력을 한 번만 읽으며 압축해 임시 저장소에 쓴다. 반환: (압축본, 원본 크기)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"지원하지 않는 인코딩: {encoding} (가능: {', '.join(ENCODINGS)})")
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    writer = _compressor(encoding, spool, level)
+    raw_size = 0
+    while True:
+        chunk = source.read(COPY_CHUNK)
+        if not chunk:
+            break
+        raw_size += len(chunk)
+        (writer or spool).write(chunk)
+    if writer is not None:
+        writer.close()
+    spool.seek(0)
+    return spool, raw_size
+
+
+def read_state_meta(spool, encoding):
+    # Terraform은 serial/lineage를 resources보다 앞에 쓰므로 첫 리소스까지만 풀어 보면 된다
+    body, _ = open_state_body(_Unclosable(spool), None if encoding == "identity" else encoding)
+    reader = TfstateReader(body)
+    try:
+        for _ in reader.resources():
+            if "serial" in reader.meta and "lineage" in reader.meta:
+                break
+    finally:
+        body.close()
+        spool.seek(0)
+    return reader.meta
+
+
+# 메타데이터를 읽는 동안 압축본 임시 파일이 닫히지 않게 한다 (업로드에 다시 써야 함)
+class _Unclosable:
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, size=-1):
+        return self._f.read(size)
+
+    def close(self):
+        pass
+
+
+def upload_snapshot(s3, bucket, key, source, encoding="gzip", level=None):
+    spool, raw_size = compress_state(source, encoding, level)
+    try:
+        if raw_size == 0:
+            logger.warning(f"⚠️ 상태가 비어 있어 스냅샷을 올리지 않습니다: s3://{bucket}/{key}")
+            return None
+        meta = read_state_meta(spool, encoding)
+        spool.seek(0, 2)
+        compressed_size = spool.tell()
+        spool.seek(0)
+        extra_args = {
+            "ContentType": "application/json",
+            "Metadata": {
+                "tfstate-serial": str(meta.get("serial")),
+                "tfstate-lineage": str(meta.get("lineage")),
+                "tfstate-uncompressed-size": str(raw_size),
+            },
+        }
+        if encoding != "identity":
+            extra_args["ContentEncoding"] = encoding
+        if compressed_size < PUT_OBJECT_MAX_BYTES:
+            # upload_fileobj는 8MB를 넘으면 멀티파트로 올려 같은 본문이라도 ETag가 달라지므로 한 번에 올린다
+            s3.put_object(Bucket=bucket, Key=key, Body=spool, ContentLength=compressed_size, **extra_args)
+        else:
+            s3.upload_fileobj(spool, bucket, key, ExtraArgs=extra_args)
+    finally:
+        spool.close()
+    ratio = raw_size / max(compressed_size, 1)
+    logger.info(f"📸 스냅샷 업로드: s3://{bucket}/{key} (serial {meta.get('serial')}, {encoding}, "
+                f"{raw_size} → {compressed_size} bytes, {ratio:.1f}배)")
+    return {"serial": meta.get("serial"), "lineage": meta.get("lineage"), "encoding": encoding,
+            "raw_bytes": raw_size, "stored_bytes": compressed_size}
+
+
+def main():
+    import boto3
+
+    from aws_metrics import instrument_client
+
+    parser = argparse.ArgumentParser(description="tfstate 스냅샷을 압축해 S3에 업로드")
+    parser.add_argument("source", help="tfstate 파일 경로 (- 이면 표준 입력)")
+    parser.add_argument("destination", help="s3://버킷/키")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="gzip")
+    parser.add_argument("--level", type=int, help="압축 수준 (gzip 1-9, zstd 1-22)")
+    args = parser.parse_args()
+
+    if not args.destination.startswith("s3://"):
+        raise SystemExit("대상은 s3://버킷/키 형식이어야 합니다")
+    bucket, _, key = args.destination[len("s3://"):].partition("/")
+    s3 = instrument_client(boto3.client("s3"))
+    if args.source == "-":
+        upload_snapshot(s3, bucket, key, sys.stdin.buffer, args.encoding, args.level)
+    else:
+        with open(args.source, "rb") as f:
+            upload_snapshot(s3, bucket, key, f, args.encoding, args.level)
+
+
+if __name__ == "__main__":
+    main()
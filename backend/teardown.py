@@ -0,0 +1,234 @@
+# TerraformBackendManager가 만든 리소스(CreatedBy=TerraformBackendManager 태그)를 한 번에 찾아 지운다.
+# S3 버킷/DynamoDB 테이블은 Resource Groups Tagging API로, IAM 역할/OIDC 제공자는 IAM 목록 API로 찾고,
+# 의존성 순서를 지키는 삭제 계획을 provisioning의 DAG 실행기로 병렬 실행한다.
+#
+# 태그를 붙이기 전에 만든 리소스는 찾지 못한다. 그런 IAM 역할은 --include-untagged-roles로
+# 이름(GitHubTerraformOIDCRole-*)과 GitHub OIDC 신뢰 정책을 보고 포함할 수 있고,
+# 버킷/테이블은 이름을 알 수 없으므로 terraform_backend_cleaner.py로 직접 지운다.
+#
+# 사용법: python backend/teardown.py --regions ap-northeast-2,us-east-1 [--yes] [--workers 8]
+#         [--purge-strategy api|auto|lifecycle] [--lifecycle-wait 0] [--include-untagged-roles]
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import boto3
+from botocore.config import Config
+
+import lambda_modules  # noqa: F401
+from aws_metrics import instrument_client, metrics
+from provisioning import ProvisioningStep, failed_steps, print_timing_report, run_provisioning
+from terraform_backend_cleaner import ADAPTIVE_RETRIES, TerraformBackendCleaner
+from terraform_backend_minimum import GITHUB_OIDC_ROLE_PREFIX, MANAGED_TAG_KEY, MANAGED_TAG_VALUE
+
+logger = logging.getLogger(__name__)
+
+TAGGED_RESOURCE_TYPES = ["s3", "dynamodb:table"]
+# 태그를 조회할 IAM 역할 수가 많아도 IAM 속도 제한을 넘지 않을 정도의 동시 조회 수
+IAM_LOOKUP_WORKERS = 4
+GITHUB_OIDC_HOST = "token.actions.githubusercontent.com"
+
+
+def is_managed(tags):
+    return any(tag["Key"] == MANAGED_TAG_KEY and tag["Value"] == MANAGED_TAG_VALUE for tag in tags)
+
+
+def federated_principals(document):
+    # 신뢰 정책의 Principal.Federated 목록. boto3는 list_roles 문서를 dict로 풀어 주지만
+    # 다른 경로로 받은 문서는 URL 인코딩된 문자열일 수 있다
+    if isinstance(document, str):
+        document = json.loads(unquote(document))
+    statements = document.get("Statement", [])
+    principals = []
+    for statement in [statements] if isinstance(statements, dict) else statements:
+        principal = statement.get("Principal")
+        federated = principal.get("Federated", []) if isinstance(principal, dict) else []
+        principals.extend([federated] if isinstance(federated, str) else federated)
+    return principals
+
+
+def trusts_provider(document, provider_arn):
+    return provider_arn in federated_principals(document)
+
+
+def trusts_github_oidc(document):
+    return any(arn.endswith(f"oidc-provider/{GITHUB_OIDC_HOST}") for arn in federated_principals(document))
+
+
+class ManagedResourceFinder:
+    def __init__(self, regions, purge_workers=32, include_untagged_roles=False):
+        self.regions = regions
+        self.include_untagged_roles = include_untagged_roles
+        # 리전별 정리기 (S3/DynamoDB 클라이언트가 리전에 묶여 있다). IAM은 전역이라 첫 정리기 것을 쓴다
+        self.cleaners = {region: TerraformBackendCleaner(region, purge_workers=purge_workers) for region in regions}
+        self.iam_cleaner = self.cleaners[regions[0]]
+        # 역할 이름 → 신뢰 정책 (OIDC 제공자를 아직 쓰는 역할 확인용)
+        self.trust_policies = {}
+        # 태그 없는 역할이 아직 신뢰하고 있어 남겨 둘 OIDC 제공자 → 그 역할 이름들
+        self.providers_in_use = {}
+        # 태그 없이 이름과 신뢰 정책으로 포함한 역할 (태그 도입 전에 만든 역할)
+        self.untagged_roles = []
+
+    def tagged_resources(self, region):
+        tagging = instrument_client(boto3.client("resourcegroupstaggingapi", region_name=region,
+                                                 config=Config(retries=ADAPTIVE_RETRIES)))
+        buckets, tables = [], []
+        paginator = tagging.get_paginator("get_resources")
+        for page in paginator.paginate(TagFilters=[{"Key": MANAGED_TAG_KEY, "Values": [MANAGED_TAG_VALUE]}],
+                                       ResourceTypeFilters=TAGGED_RESOURCE_TYPES):
+            for resource in page.get("ResourceTagMappingList", []):
+                arn = resource["ResourceARN"]
+                if arn.startswith("arn:aws:s3:::"):
+                    buckets.append(arn.split(":::", 1)[1])
+                elif ":table/" in arn:
+                    tables.append(arn.split(":table/", 1)[1])
+        return buckets, tables
+
+    def managed_roles(self):
+        iam = self.iam_cleaner.iam
+        candidates = []
+        for page in iam.get_paginator("list_roles").paginate():
+            for role in page["Roles"]:
+                self.trust_policies[role["RoleName"]] = role.get("AssumeRolePolicyDocument", {})
+            # 이 도구가 만드는 역할은 GitHub OIDC 역할뿐이므로 그 이름만 태그를 조회한다 (역할마다 IAM 호출 1회)
+            candidates.extend(role["RoleName"] for role in page["Roles"]
+                              if role["RoleName"].startswith(GITHUB_OIDC_ROLE_PREFIX))
+
+        def tags_of(role_name):
+            tags = []
+            for page in iam.get_paginator("list_role_tags").paginate(RoleName=role_name):
+                tags.extend(page["Tags"])
+            return role_name, tags
+
+        with ThreadPoolExecutor(max_workers=IAM_LOOKUP_WORKERS) as pool:
+            tagged = {name: is_managed(tags) for name, tags in pool.map(tags_of, candidates)}
+        if self.include_untagged_roles:
+            self.untagged_roles = sorted(name for name, managed in tagged.items()
+                                         if not managed and trusts_github_oidc(self.trust_policies[name]))
+        return sorted([name for name, managed in tagged.items() if managed] + self.untagged_roles)
+
+    def managed_oidc_providers(self):
+        iam = self.iam_cleaner.iam
+        providers = []
+        for provider in iam.list_open_id_connect_providers()["OpenIDConnectProviderList"]:
+            arn = provider["Arn"]
+            tags = iam.list_open_id_connect_provider_tags(OpenIDConnectProviderArn=arn).get("Tags", [])
+            if is_managed(tags):
+                providers.append(arn)
+        return sorted(providers)
+
+    def oidc_provider_users(self, provider_arn, managed_roles):
+        # OIDC 제공자는 계정 전체에 하나라 이 도구가 만들지 않은 역할도 신뢰할 수 있다
+        return sorted(name for name, document in self.trust_policies.items()
+                      if name not in managed_roles and trusts_provider(document, provider_arn))
+
+    def discover(self):
+        inventory = {"buckets": [], "tables": [], "roles": [], "oidc_providers": []}
+        with ThreadPoolExecutor(max_workers=len(self.regions) + 2) as pool:
+            regional = {region: pool.submit(self.tagged_resources, region) for region in self.regions}
+            roles = pool.submit(self.managed_roles)
+            providers = pool.submit(self.managed_oidc_providers)
+            seen = set()
+            for region, future in regional.items():
+                buckets, tables = future.result()
+                # S3 버킷은 전역 이름이라 여러 리전 조회에 겹쳐 나올 수 있다
+                inventory["buckets"].extend((region, name) for name in sorted(buckets) if name not in seen)
+                seen.update(buckets)
+                inventory["tables"].extend((region, name) for name in sorted(tables))
+            inventory["roles"] = roles.result()
+            for provider_arn in providers.result():
+                users = self.oidc_provider_users(provider_arn, set(inventory["roles"]))
+                if users:
+                    self.providers_in_use[provider_arn] = users
+                else:
+                    inventory["oidc_providers"].append(provider_arn)
+        return inventory
+
+
+def teardown_steps(finder, inventory, purge_strategy="api", lifecycle_wait=0):
+    # 버킷/테이블/역할은 서로 독립이라 동시에 지우고, OIDC 제공자는 그것을 신뢰하는 역할이 모두 지워진 뒤에 지운다.
+    # 수명 주기 만료는 하루 이상 걸려 DAG 워커를 붙잡으므로 기본은 API 삭제이고,
+    # lifecycle/auto를 골라도 lifecycle_wait(기본 0)만 기다린 뒤 "아직 비지 않음"으로 끝낸다 (다시 실행하면 이어서 확인)
+    steps = []
+    for region, bucket_name in inventory["buckets"]:
+        steps.append(ProvisioningStep(
+            f"s3:{bucket_name}",
+            lambda c=finder.cleaners[region], b=bucket_name: c.delete_s3_bucket(
+                b, strategy=purge_strategy, max_wait=lifecycle_wait)))
+    for region, table_name in inventory["tables"]:
+        steps.append(ProvisioningStep(f"dynamodb:{region}:{table_name}",
+                                      lambda c=finder.cleaners[region], t=table_name: c.delete_dynamodb_table(t)))
+    role_steps = [f"iam_role:{role_name}" for role_name in inventory["roles"]]
+    for step_name, role_name in zip(role_steps, inventory["roles"]):
+        steps.append(ProvisioningStep(step_name, lambda r=role_name: finder.iam_cleaner.delete_iam_role(r)))
+    for provider_arn in inventory["oidc_providers"]:
+        steps.append(ProvisioningStep(f"oidc:{provider_arn.rsplit('/', 1)[-1]}",
+                                      lambda p=provider_arn: finder.iam_cleaner.delete_oidc_provider(p),
+                                      depends_on=role_steps))
+    return steps
+
+
+def print_plan(inventory, providers_in_use=None, untagged_roles=()):
+    print("\n🗂️ 삭제 계획 (CreatedBy=TerraformBackendManager)")
+    for region, name in inventory["buckets"]:
+        print(f"  🪣 S3 버킷          {name} ({region}, 모든 버전 포함)")
+    for region, name in inventory["tables"]:
+        print(f"  📄 DynamoDB 테이블  {name} ({region})")
+    for name in inventory["roles"]:
+        note = ", 태그 없음: 이름으로 찾음" if name in untagged_roles else ""
+        print(f"  🔐 IAM 역할         {name} (정책/인스턴스 프로파일 포함{note})")
+    for arn in inventory["oidc_providers"]:
+        print(f"  🪪 OIDC 제공자      {arn} (역할 삭제 후)")
+    for arn, users in (providers_in_use or {}).items():
+        print(f"  ⏭️ OIDC 제공자 유지  {arn} (태그 없는 역할이 아직 신뢰함: {', '.join(users)})")
+    total = sum(len(items) for items in inventory.values())
+    print(f"  합계 {total}개")
+    return total
+
+
+def teardown(regions, assume_yes=False, max_workers=8, purge_workers=32, purge_strategy="api", lifecycle_wait=0,
+             include_untagged_roles=False):
+    finder = ManagedResourceFinder(regions, purge_workers=purge_workers, include_untagged_roles=include_untagged_roles)
+    inventory = finder.discover()
+    if not print_plan(inventory, finder.providers_in_use, finder.untagged_roles):
+        print("✅ 정리할 리소스가 없습니다")
+        return {}
+    if not assume_yes:
+        confirm = input("⚠️ 위 리소스를 모두 삭제하시겠습니까? (yes/no): ").strip().lower()
+        if confirm != "yes":
+            print("⛔ 삭제 취소됨.")
+            return {}
+    steps = teardown_steps(finder, inventory, purge_strategy=purge_strategy, lifecycle_wait=lifecycle_wait)
+    results, total = run_provisioning(steps, max_workers=max_workers)
+    print_timing_report(results, total)
+    failed = failed_steps(results)
+    if failed:
+        logger.error(f"❗ 삭제 실패/건너뜀: {', '.join(failed)}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="태그 기반 Terraform 백엔드 리소스 일괄 정리")
+    parser.add_argument("--regions", required=True, help="쉼표로 구분한 리전 목록 (예: ap-northeast-2,us-east-1)")
+    parser.add_argument("--yes", action="store_true", help="확인 없이 삭제")
+    parser.add_argument("--workers", type=int, default=8, help="동시에 삭제할 리소스 수")
+    parser.add_argument("--purge-strategy", choices=("api", "auto", "lifecycle"), default="api",
+                        help="버킷 비우기 방식 (기본 api: 배치 삭제)")
+    parser.add_argument("--lifecycle-wait", type=int, default=0,
+                        help="수명 주기 만료로 비울 때 버킷이 빌 때까지 기다릴 최대 초 (기본 0: 규칙만 걸고 다음 실행에서 확인)")
+    parser.add_argument("--include-untagged-roles", action="store_true",
+                        help=f"태그 도입 전에 만든 {GITHUB_OIDC_ROLE_PREFIX}* 역할도 GitHub OIDC를 신뢰하면 포함")
+    args = parser.parse_args()
+
+    print("\n🧨 Terraform 백엔드 리소스 태그 기반 정리")
+    try:
+        results = teardown([region.strip() for region in args.regions.split(",") if region.strip()],
+                           assume_yes=args.yes, max_workers=args.workers,
+                           purge_strategy=args.purge_strategy, lifecycle_wait=args.lifecycle_wait,
+                           include_untagged_roles=args.include_untagged_roles)
+        if failed_steps(results):
+            raise SystemExit(1)
+    finally:
+        print("\n" + metrics.summary_table())
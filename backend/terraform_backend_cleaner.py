@@ -1,56 +1,265 @@
 import boto3
 import logging
+import time
+from datetime import datetime, timedelta, timezone
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from adaptive import AdaptiveConcurrency, backoff_delay
+import lambda_modules  # noqa: F401
+from aws_metrics import instrument_client, metrics
+from s3_inventory import InventoryManifest, plan_inventory, print_plan
+from s3_purge import S3VersionPurger
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 버킷을 비우는 동안에도 상태 파일이 써질 수 있다 (아직 끝나지 않은 CI apply, state_backup 복제, 다른 작업자의 잠금 해제).
+# 그렇게 남은 버전이 있으면 delete_bucket이 BucketNotEmpty로 실패하므로, 회차마다 비었는지 확인하고 최대 이만큼 다시 지운다
+MAX_PURGE_PASSES = 3
+
+# 예상 버전 수가 이보다 많으면 API로 지우지 않고 수명 주기 규칙으로 S3가 직접 지우게 한다
+LIFECYCLE_PURGE_THRESHOLD = 1_000_000
+LIFECYCLE_RULE_PREFIX = "terraform-backend-cleaner-purge"
+# 수명 주기 삭제는 하루 단위로 돌므로 비었는지 확인하는 간격을 1분부터 1시간까지 늘려 간다
+LIFECYCLE_POLL_BASE = 60
+LIFECYCLE_POLL_CAP = 3600
+LIFECYCLE_MAX_WAIT = 3 * 24 * 3600
+# 지표/인벤토리가 없을 때 버전 수를 어림하려고 훑어보는 목록 페이지 수
+ESTIMATE_SAMPLE_PAGES = 5
+
+# botocore adaptive 재시도: 클라이언트별 토큰 버킷이 스로틀 응답에 맞춰 전송 속도를 줄인다.
+ADAPTIVE_RETRIES = {"mode": "adaptive", "max_attempts": 10}
+# 배치 삭제 전용 클라이언트는 botocore가 재시도하지 않는다. 스로틀을 AdaptiveConcurrency가 직접 받아
+# 동시성을 줄이고 그 배치를 다시 보낸다 (두 층이 겹치면 배치 하나가 최대 10×10번 시도되고 제어기는 스로틀을 못 본다)
+PURGE_RETRIES = {"mode": "standard", "total_max_attempts": 1}
+
 class TerraformBackendCleaner:
-    def __init__(self, region, bucket_name, ddb_table, role_name):
+    def __init__(self, region, bucket_name=None, ddb_table=None, role_name=None, purge_workers=32,
+                 lifecycle_threshold=LIFECYCLE_PURGE_THRESHOLD):
         self.region = region
         self.bucket_name = bucket_name
         self.ddb_table = ddb_table
         self.role_name = role_name
+        self.purge_workers = purge_workers
+        self.lifecycle_threshold = lifecycle_threshold
+        self.sleep = time.sleep
+
+        self.s3 = instrument_client(boto3.client("s3", region_name=region, config=Config(retries=ADAPTIVE_RETRIES)))
+        # 병렬 배치 삭제 워커 수만큼 커넥션 풀을 확보
+        self.purge_s3 = instrument_client(boto3.client("s3", region_name=region, config=Config(
+            max_pool_connections=purge_workers + 2, retries=PURGE_RETRIES)))
+        self.dynamodb = instrument_client(boto3.client("dynamodb", region_name=region,
+                                                       config=Config(retries=ADAPTIVE_RETRIES)))
+        self.iam = instrument_client(boto3.client("iam", region_name=region,
+                                                  config=Config(retries=ADAPTIVE_RETRIES)))
+        self.cloudwatch = instrument_client(boto3.client("cloudwatch", region_name=region,
+                                                         config=Config(retries=ADAPTIVE_RETRIES)))
+
+        # S3 배치 삭제 동시성 제어기. 삭제 회차가 바뀌어도 학습한 동시성을 이어 쓴다
+        self.s3_concurrency = AdaptiveConcurrency("s3", initial=min(4, purge_workers), maximum=purge_workers)
+
+    def _bucket_has_versions(self, bucket_name):
+        response = self.s3.list_object_versions(Bucket=bucket_name, MaxKeys=1)
+        return bool(response.get('Versions') or response.get('DeleteMarkers'))
+
+    def estimate_version_count(self, bucket_name, inventory=None, plan=None):
+        # 반환: (버전 수, 근거). 근거가 "sample"이면 목록 일부만 본 하한값이다
+        # plan: 이미 만든 plan_inventory 결과. 주면 인벤토리를 다시 읽지 않는다
+        if plan is not None:
+            return plan['versions'], "inventory"
+        if inventory is not None:
+            return plan_inventory(inventory, workers=self.purge_workers)['versions'], "inventory"
+
+        # CloudWatch S3 저장소 지표(하루 1회 갱신)의 객체 수는 이전 버전까지 센다. 요청 한 번이면 된다
+        now = datetime.now(timezone.utc)
+        try:
+            response = self.cloudwatch.get_metric_statistics(
+                Namespace="AWS/S3", MetricName="NumberOfObjects",
+                Dimensions=[{"Name": "BucketName", "Value": bucket_name},
+                            {"Name": "StorageType", "Value": "AllStorageTypes"}],
+                StartTime=now - timedelta(days=3), EndTime=now, Period=86400, Statistics=["Average"])
+            datapoints = sorted(response.get('Datapoints', []), key=lambda point: point['Timestamp'])
+        except ClientError as e:
+            # cloudwatch:GetMetricStatistics 권한이 없는 역할도 많다. 목록 표본으로 대신 어림한다
+            logger.warning(f"⚠️ CloudWatch 지표 조회 실패 → 목록 조회로 추정: {e.response['Error']['Code']}")
+            datapoints = []
+        if datapoints:
+            return int(datapoints[-1]['Average']), "cloudwatch"
+
+        count = 0
+        paginator = self.s3.get_paginator('list_object_versions')
+        for page in paginator.paginate(Bucket=bucket_name, PaginationConfig={"MaxItems": ESTIMATE_SAMPLE_PAGES * 1000}):
+            count += len(page.get('Versions', [])) + len(page.get('DeleteMarkers', []))
+            if not page.get('IsTruncated'):
+                return count, "listing"
+        return count, "sample"
+
+    def choose_purge_strategy(self, bucket_name, inventory=None, plan=None):
+        count, source = self.estimate_version_count(bucket_name, inventory, plan)
+        strategy = "lifecycle" if count >= self.lifecycle_threshold else "api"
+        bound = "이상" if source == "sample" else ""
+        logger.info(f"🧭 {bucket_name}: 예상 버전 {count:,}개{bound} ({source}) → "
+                    f"{'수명 주기 만료' if strategy == 'lifecycle' else 'API 일괄 삭제'}")
+        return strategy
+
+    def _api_purge(self, bucket_name, inventory=None):
+        # 삭제 도중 새로 써진 버전이 있을 수 있으므로 비었는지 확인하고 남으면 한 번 더 돈다
+        for purge_pass in range(1, MAX_PURGE_PASSES + 1):
+            purger = S3VersionPurger(self.purge_s3, bucket_name, max_workers=self.purge_workers,
+                                     concurrency=self.s3_concurrency, list_client=self.s3)
+            # 인벤토리 이후에 생긴 버전은 다음 회차의 목록 조회가 마저 지운다
+            versions = inventory.versions() if inventory is not None and purge_pass == 1 else None
+            result = purger.purge(versions=versions)
+            if result['failed']:
+                logger.error(f"S3 버킷 삭제 중단: {result['failed']}개 버전을 삭제하지 못함")
+                return False
+            logger.info(f"🗑️ {result['deleted']}개 버전 삭제 완료 ({result['elapsed']:.1f}초, {purge_pass}회차)")
+            if not self._bucket_has_versions(bucket_name):
+                return True
+        logger.error(f"S3 버킷 삭제 중단: {MAX_PURGE_PASSES}회 삭제 후에도 버전이 남아 있음")
+        return False
+
+    def purge_lifecycle_rules(self):
+        # 현재 버전은 하루 뒤 만료(삭제 마커로 바뀜), 이전 버전은 하루 뒤 영구 삭제,
+        # 남은 삭제 마커와 미완료 멀티파트 업로드도 정리한다
+        return [
+            {
+                'ID': f"{LIFECYCLE_RULE_PREFIX}-versions",
+                'Filter': {'Prefix': ''},
+                'Status': 'Enabled',
+                'Expiration': {'Days': 1},
+                'NoncurrentVersionExpiration': {'NoncurrentDays': 1},
+                'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': 1}
+            },
+            {
+                'ID': f"{LIFECYCLE_RULE_PREFIX}-markers",
+                'Filter': {'Prefix': ''},
+                'Status': 'Enabled',
+                'Expiration': {'ExpiredObjectDeleteMarker': True}
+            }
+        ]
+
+    def _lifecycle_rules(self, bucket_name):
+        try:
+            return self.s3.get_bucket_lifecycle_configuration(Bucket=bucket_name).get('Rules', [])
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchLifecycleConfiguration':
+                return []
+            raise
+
+    def _purge_lifecycle_applied(self, bucket_name):
+        return any(rule.get('ID', '').startswith(LIFECYCLE_RULE_PREFIX) for rule in self._lifecycle_rules(bucket_name))
+
+    def lifecycle_purge(self, bucket_name, max_wait=LIFECYCLE_MAX_WAIT):
+        # PUT은 설정 전체를 바꾸므로 기존 규칙을 먼저 읽어 만료 규칙과 합친다.
+        # 이미 규칙을 걸어 둔 버킷이면 (이전 실행) 확인만 이어서 한다
+        existing = self._lifecycle_rules(bucket_name)
+        if any(rule.get('ID', '').startswith(LIFECYCLE_RULE_PREFIX) for rule in existing):
+            logger.info(f"♻️ 수명 주기 만료 규칙이 이미 적용됨: {bucket_name}")
+        else:
+            self.s3.put_bucket_lifecycle_configuration(
+                Bucket=bucket_name,
+                LifecycleConfiguration={'Rules': existing + self.purge_lifecycle_rules()}
+            )
+            logger.info(f"⏳ 수명 주기 만료 규칙 적용 (기존 규칙 {len(existing)}개 유지): {bucket_name}. "
+                        f"S3가 1~2일 안에 모든 버전을 지웁니다")
 
-        self.s3 = boto3.client("s3", region_name=region)
-        self.dynamodb = boto3.client("dynamodb", region_name=region)
-        self.iam = boto3.client("iam", region_name=region)
+        # 비었는지는 MaxKeys=1 목록 조회 한 번으로 확인하고, 간격은 지수적으로 늘린다
+        started = time.monotonic()
+        attempt = 0
+        while self._bucket_has_versions(bucket_name):
+            remaining = max_wait - (time.monotonic() - started)
+            if remaining <= 0:
+                logger.warning(f"⏸️ {bucket_name}에 아직 버전이 남아 있음. 다시 실행하면 이어서 확인합니다")
+                return False
+            delay = min(backoff_delay(attempt, base=LIFECYCLE_POLL_BASE, cap=LIFECYCLE_POLL_CAP), remaining)
+            logger.info(f"🕒 {bucket_name} 만료 대기 중 ({attempt + 1}번째 확인, {delay:.0f}초 후 다시 확인)")
+            self.sleep(delay)
+            attempt += 1
+        logger.info(f"✅ 수명 주기 만료로 버킷이 비었습니다: {bucket_name} ({attempt}번 확인)")
+        return True
 
-    def delete_s3_bucket(self):
+    def delete_s3_bucket(self, bucket_name=None, inventory=None, strategy="auto", max_wait=LIFECYCLE_MAX_WAIT,
+                         plan=None):
+        # inventory(s3_inventory.InventoryManifest)를 주면 첫 회차는 목록 조회 대신 인벤토리의 버전 목록을 쓴다.
+        # strategy: "api"(배치 삭제) | "lifecycle"(수명 주기 만료 후 삭제) | "auto"(예상 버전 수로 선택)
+        # max_wait=0이면 수명 주기 규칙만 걸고 기다리지 않는다 (버킷이 비면 다시 실행해 삭제)
+        bucket_name = bucket_name or self.bucket_name
         try:
-            logger.info(f"🔄 S3 버킷 내 객체 삭제 중: {self.bucket_name}")
-            paginator = self.s3.get_paginator('list_object_versions')
-            for page in paginator.paginate(Bucket=self.bucket_name):
-                versions = page.get('Versions', []) + page.get('DeleteMarkers', [])
-                for version in versions:
-                    self.s3.delete_object(
-                        Bucket=self.bucket_name,
-                        Key=version['Key'],
-                        VersionId=version['VersionId']
-                    )
-            self.s3.delete_bucket(Bucket=self.bucket_name)
-            logger.info(f"🧹 S3 버킷 삭제 완료: {self.bucket_name}")
+            if inventory is not None and inventory.source_bucket != bucket_name:
+                # 다른 버킷의 인벤토리로 지우면 엉뚱한 키를 지우거나 아무것도 지우지 못한다
+                logger.error(f"S3 버킷 삭제 중단: 인벤토리 대상({inventory.source_bucket})이 {bucket_name}이 아님")
+                return False
+            if strategy == "auto":
+                strategy = self.choose_purge_strategy(bucket_name, inventory, plan)
+            if strategy == "lifecycle":
+                if not self.lifecycle_purge(bucket_name, max_wait=max_wait):
+                    return False
+            else:
+                logger.info(f"🔄 S3 버킷 내 객체 삭제 중: {bucket_name}")
+                if not self._api_purge(bucket_name, inventory):
+                    return False
+            self.s3.delete_bucket(Bucket=bucket_name)
+            stats = self.s3_concurrency.stats()
+            logger.info(f"🧹 S3 버킷 삭제 완료: {bucket_name} "
+                        f"(최대 동시성 {stats['peak']}, 스로틀 {stats['throttles']}회)")
+            return True
         except Exception as e:
             logger.error(f"S3 버킷 삭제 실패: {str(e)}")
+            return False
 
-    def delete_dynamodb_table(self):
+    def delete_dynamodb_table(self, table_name=None):
+        table_name = table_name or self.ddb_table
         try:
-            self.dynamodb.delete_table(TableName=self.ddb_table)
-            logger.info(f"🗑️ DynamoDB 테이블 삭제 완료: {self.ddb_table}")
+            self.dynamodb.delete_table(TableName=table_name)
+            logger.info(f"🗑️ DynamoDB 테이블 삭제 완료: {table_name}")
+            return True
         except Exception as e:
             logger.error(f"DynamoDB 테이블 삭제 실패: {str(e)}")
+            return False
+
+    def _role_attachments(self, role_name):
+        # 역할을 지우기 전에 떼어내야 하는 것들: 인라인 정책, 연결된 관리형 정책, 인스턴스 프로파일
+        inline, attached, profiles = [], [], []
+        for page in self.iam.get_paginator('list_role_policies').paginate(RoleName=role_name):
+            inline.extend(page['PolicyNames'])
+        for page in self.iam.get_paginator('list_attached_role_policies').paginate(RoleName=role_name):
+            attached.extend(policy['PolicyArn'] for policy in page['AttachedPolicies'])
+        for page in self.iam.get_paginator('list_instance_profiles_for_role').paginate(RoleName=role_name):
+            profiles.extend(page['InstanceProfiles'])
+        return inline, attached, profiles
 
-    def delete_iam_role(self):
+    def delete_iam_role(self, role_name=None):
+        role_name = role_name or self.role_name
         try:
-            # 인라인 정책 삭제
-            self.iam.delete_role_policy(
-                RoleName=self.role_name,
-                PolicyName="TerraformStateAccess"
-            )
-            # 역할 삭제
-            self.iam.delete_role(RoleName=self.role_name)
-            logger.info(f"🚫 IAM 역할 삭제 완료: {self.role_name}")
+            inline, attached, profiles = self._role_attachments(role_name)
+            for policy_name in inline:
+                self.iam.delete_role_policy(RoleName=role_name, PolicyName=policy_name)
+            for policy_arn in attached:
+                self.iam.detach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
+            for profile in profiles:
+                self.iam.remove_role_from_instance_profile(InstanceProfileName=profile['InstanceProfileName'],
+                                                           RoleName=role_name)
+                # 이 역할만 담고 있던 프로파일은 함께 지운다 (다른 역할이 있으면 남긴다)
+                if len(profile.get('Roles', [])) <= 1:
+                    self.iam.delete_instance_profile(InstanceProfileName=profile['InstanceProfileName'])
+            self.iam.delete_role(RoleName=role_name)
+            logger.info(f"🚫 IAM 역할 삭제 완료: {role_name} (인라인 정책 {len(inline)}개, "
+                        f"관리형 정책 {len(attached)}개 분리, 인스턴스 프로파일 {len(profiles)}개)")
+            return True
         except Exception as e:
             logger.error(f"IAM 역할 삭제 실패: {str(e)}")
+            return False
+
+    def delete_oidc_provider(self, provider_arn):
+        try:
+            self.iam.delete_open_id_connect_provider(OpenIDConnectProviderArn=provider_arn)
+            logger.info(f"🚫 OIDC 제공자 삭제 완료: {provider_arn}")
+            return True
+        except Exception as e:
+            logger.error(f"OIDC 제공자 삭제 실패: {str(e)}")
+            return False
 
 if __name__ == "__main__":
     print("\n🧨 Terraform 상태 저장소 리소스 정리 도구")
@@ -60,16 +269,36 @@ if __name__ == "__main__":
         ddb_table = input("📄 삭제할 DynamoDB 테이블 이름: ").strip()
         role_name = input("🔐 삭제할 IAM Role 이름: ").strip()
 
+        manifest_path = input("📋 S3 Inventory manifest.json (로컬 경로 또는 s3://, 없으면 Enter): ").strip()
+
         cleaner = TerraformBackendCleaner(region, bucket_name, ddb_table, role_name)
 
+        inventory, plan = None, None
+        if manifest_path:
+            inventory = InventoryManifest(manifest_path, s3=cleaner.s3)
+            plan = plan_inventory(inventory, workers=cleaner.purge_workers)
+            print_plan(plan)
+
+        strategy = input("🧭 버킷 비우기 방식 (auto/api/lifecycle, 기본 auto): ").strip().lower() or "auto"
+        # 수명 주기 만료는 1~2일 걸리므로 기본은 규칙만 걸고 바로 돌아온다
+        max_wait = int(input("⏱️ 수명 주기 만료 대기 시간(초, 기본 0 = 규칙만 적용): ").strip() or 0)
+
         confirm = input("⚠️ 모든 리소스를 삭제하시겠습니까? (yes/no): ").strip().lower()
-        if confirm == "yes":
-            cleaner.delete_s3_bucket()
+        if confirm != "yes":
+            print("⛔ 삭제 취소됨.")
+        elif cleaner.delete_s3_bucket(inventory=inventory, strategy=strategy, max_wait=max_wait, plan=plan):
             cleaner.delete_dynamodb_table()
             cleaner.delete_iam_role()
             print("\n✅ 리소스 삭제 완료!")
+        elif cleaner._purge_lifecycle_applied(bucket_name):
+            # 버킷이 아직 남아 있으므로 잠금 테이블과 Role은 다음 실행에서 함께 지운다
+            print(f"\n⏸️ {bucket_name}에 수명 주기 만료 규칙을 걸어 두었습니다. S3가 1~2일 안에 버전을 지웁니다.")
+            print("   버킷이 빈 뒤 같은 값으로 다시 실행하면 버킷, DynamoDB 테이블, IAM Role을 마저 삭제합니다.")
+            print(f"   남은 버전 확인: aws s3api list-object-versions --bucket {bucket_name} --max-items 1")
         else:
-            print("⛔ 삭제 취소됨.")
+            print("\n⛔ S3 버킷 삭제 실패. 로그를 확인한 뒤 다시 실행하세요.")
 
     except Exception as e:
         logger.error(f"삭제 도중 오류 발생: {str(e)}")
+    finally:
+        print("\n" + metrics.summary_table())
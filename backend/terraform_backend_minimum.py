@@ -1,39 +1,97 @@
 import boto3
+import botocore.session
+import functools
 import json
+import random
 import re
+import threading
 import time
 from datetime import datetime
 import logging
+from botocore.exceptions import ClientError
+
+import lambda_modules  # noqa: F401
+from aws_metrics import instrument_client, metrics
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+GITHUB_OIDC_URL = "token.actions.githubusercontent.com"
+STATE_ACCESS_POLICY_NAME = "TerraformStateAccess"
+# 이 도구가 만든 리소스 표시. 정리 도구(teardown)가 이 태그로 전부 찾아 지운다
+MANAGED_TAG_KEY = "CreatedBy"
+MANAGED_TAG_VALUE = "TerraformBackendManager"
+# 이 도구가 만드는 IAM 역할 이름 접두사 (teardown이 태그를 조회할 후보를 이 이름으로 좁힌다)
+GITHUB_OIDC_ROLE_PREFIX = "GitHubTerraformOIDCRole-"
+
+@functools.lru_cache(maxsize=None)
+def _available_regions():
+    # 번들된 endpoints 데이터에서 한 번만 읽는다 (네트워크 호출 없음, 프로세스당 1회)
+    return frozenset(botocore.session.get_session().get_available_regions('s3'))
+
 class TerraformBackendManager:
-    def __init__(self, region, bucket_name, ddb_table="terraform-lock"):
+    def __init__(self, region, bucket_name, ddb_table="terraform-lock", client_factory=None, snapshot_buckets=()):
         if not self._validate_region(region):
             raise ValueError(f"유효하지 않은 AWS 리전: {region}")
         if not self._validate_bucket_name(bucket_name):
             raise ValueError(f"유효하지 않은 S3 버킷 이름: {bucket_name}")
         if not self._validate_ddb_table_name(ddb_table):
             raise ValueError(f"유효하지 않은 DynamoDB 테이블 이름: {ddb_table}")
+        for snapshot_bucket in snapshot_buckets:
+            if not self._validate_bucket_name(snapshot_bucket):
+                raise ValueError(f"유효하지 않은 스냅샷 버킷 이름: {snapshot_bucket}")
 
         self.region = region
         self.bucket_name = bucket_name
         self.ddb_table = ddb_table
-
-        try:
-            self.s3_client = boto3.client("s3", region_name=region)
-            self.dynamodb = boto3.client("dynamodb", region_name=region)
-            self.iam = boto3.client("iam", region_name=region)
-            self.sts = boto3.client("sts", region_name=region)
-        except Exception as e:
-            logger.error(f"AWS 클라이언트 초기화 실패: {str(e)}")
-            raise
+        # 배포 워크플로가 pre/post 상태 스냅샷을 올리는 버킷 (CI 역할에 PutObject를 허용)
+        self.snapshot_buckets = tuple(snapshot_buckets)
+
+        # 클라이언트는 처음 사용할 때 만든다 (S3 단계만 실행하면 IAM/STS 클라이언트는 만들지 않음)
+        # client_factory(region, service)를 주면 여러 매니저가 같은 클라이언트를 공유한다
+        self._client_factory = client_factory
+        self._session = None
+        self._clients = {}
+        self._client_lock = threading.Lock()
+        self._account_id = None
+
+    def _client(self, service):
+        with self._client_lock:
+            client = self._clients.get(service)
+            if client is None:
+                try:
+                    if self._client_factory is not None:
+                        client = self._client_factory(self.region, service)
+                    else:
+                        if self._session is None:
+                            self._session = boto3.session.Session(region_name=self.region)
+                        client = self._session.client(service, region_name=self.region)
+                except Exception as e:
+                    logger.error(f"AWS 클라이언트 초기화 실패 ({service}): {str(e)}")
+                    raise
+                # 작업별 호출 수/지연/재시도 집계 (공유 클라이언트는 한 번만 등록된다)
+                self._clients[service] = instrument_client(client)
+            return client
+
+    @property
+    def s3_client(self):
+        return self._client("s3")
+
+    @property
+    def dynamodb(self):
+        return self._client("dynamodb")
+
+    @property
+    def iam(self):
+        return self._client("iam")
+
+    @property
+    def sts(self):
+        return self._client("sts")
 
     def _validate_region(self, region):
-        valid_regions = boto3.session.Session().get_available_regions('s3')
-        return region in valid_regions
+        return region in _available_regions()
 
     def _validate_bucket_name(self, bucket_name):
         pattern = r'^[a-z0-9][a-z0-9\.-]{1,61}[a-z0-9]$'
@@ -48,24 +106,50 @@ class TerraformBackendManager:
         repo_pattern = r'^[a-zA-Z0-9_.-]{1,100}$'
         return bool(re.match(owner_pattern, repo_owner) and re.match(repo_pattern, repo_name))
 
+    def resource_tags(self, purpose, **extra):
+        tags = [{'Key': 'Purpose', 'Value': purpose}]
+        tags.extend({'Key': key, 'Value': value} for key, value in extra.items())
+        tags.append({'Key': MANAGED_TAG_KEY, 'Value': MANAGED_TAG_VALUE})
+        tags.append({'Key': 'CreatedDate', 'Value': datetime.now().strftime("%Y-%m-%d")})
+        return tags
+
     def get_account_id(self):
+        if self._account_id is not None:
+            return self._account_id
         try:
-            return self.sts.get_caller_identity()["Account"]
+            self._account_id = self.sts.get_caller_identity()["Account"]
+            return self._account_id
         except Exception as e:
             logger.error(f"계정 ID 조회 실패: {str(e)}")
             raise
 
+    def _backoff_delays(self, attempts, base=0.5, cap=8.0):
+        # 지수 백오프 + 지터: 대부분 첫 몇 번 안에 끝나고, 동시에 도는 단계끼리 호출이 몰리지 않는다
+        for i in range(attempts):
+            delay = min(cap, base * (2 ** i))
+            yield delay / 2 + random.uniform(0, delay / 2)
+
+    def _retry_with_backoff(self, func, retry_codes, attempts=8):
+        for i, delay in enumerate(self._backoff_delays(attempts)):
+            try:
+                return func()
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in retry_codes or i == attempts - 1:
+                    raise
+                logger.info(f"재시도 대기 중 ({e.response['Error']['Code']}, {delay:.1f}초)")
+                time.sleep(delay)
+
     def wait_for_resource(self, resource_type, resource_name, status_method, expected_status):
         max_retries = 10
-        for i in range(max_retries):
+        for i, delay in enumerate(self._backoff_delays(max_retries)):
             try:
                 status = getattr(self, status_method)(resource_name)
                 if status == expected_status:
                     return True
                 logger.info(f"{resource_type} {resource_name} 준비 대기 중... ({i+1}/{max_retries})")
-                time.sleep(2)
             except Exception as e:
                 logger.warning(f"{resource_type} 상태 확인 실패: {str(e)}")
+            time.sleep(delay)
         logger.error(f"{resource_type} {resource_name}가 준비되지 않음")
         return False
 
@@ -94,42 +178,60 @@ class TerraformBackendManager:
                     CreateBucketConfiguration={'LocationConstraint': self.region},
                     ObjectLockEnabledForBucket=True
                 )
+                self.s3_client.put_bucket_tagging(
+                    Bucket=self.bucket_name,
+                    Tagging={'TagSet': self.resource_tags('TerraformState')}
+                )
                 logger.info(f"✅ S3 버킷 생성 완료 (삭제 방지 활성화): {self.bucket_name}")
                 self.wait_for_resource("S3 버킷", self.bucket_name, "get_s3_bucket_status", "ACTIVE")
 
-            self.s3_client.put_bucket_versioning(
-                Bucket=self.bucket_name,
-                VersioningConfiguration={'Status': 'Enabled'}
-            )
-            logger.info("📚 버전 관리 활성화 완료")
-
-            self.s3_client.put_bucket_encryption(
-                Bucket=self.bucket_name,
-                ServerSideEncryptionConfiguration={
-                    'Rules': [{
-                        'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'},
-                        'BucketKeyEnabled': True
-                    }]
-                }
-            )
-            logger.info("🔒 서버측 암호화 설정 완료")
-
+            self.enable_versioning()
+            self.enable_encryption()
             self.block_public_access()
             return True
         except Exception as e:
             logger.error(f"S3 버킷 생성 실패: {str(e)}")
             return False
 
+    # 원하는 설정값: 생성 경로와 reconcile 모드가 같은 정의를 쓴다
+    def versioning_configuration(self):
+        return {'Status': 'Enabled'}
+
+    def encryption_configuration(self):
+        return {
+            'Rules': [{
+                'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'},
+                'BucketKeyEnabled': True
+            }]
+        }
+
+    def public_access_block_configuration(self):
+        return {
+            'BlockPublicAcls': True,
+            'IgnorePublicAcls': True,
+            'BlockPublicPolicy': True,
+            'RestrictPublicBuckets': True
+        }
+
+    def enable_versioning(self):
+        self.s3_client.put_bucket_versioning(
+            Bucket=self.bucket_name,
+            VersioningConfiguration=self.versioning_configuration()
+        )
+        logger.info("📚 버전 관리 활성화 완료")
+
+    def enable_encryption(self):
+        self.s3_client.put_bucket_encryption(
+            Bucket=self.bucket_name,
+            ServerSideEncryptionConfiguration=self.encryption_configuration()
+        )
+        logger.info("🔒 서버측 암호화 설정 완료")
+
     def block_public_access(self):
         try:
             self.s3_client.put_public_access_block(
                 Bucket=self.bucket_name,
-                PublicAccessBlockConfiguration={
-                    'BlockPublicAcls': True,
-                    'IgnorePublicAcls': True,
-                    'BlockPublicPolicy': True,
-                    'RestrictPublicBuckets': True
-                }
+                PublicAccessBlockConfiguration=self.public_access_block_configuration()
             )
             logger.info("🚫 퍼블릭 접근 차단 설정 완료")
             return True
@@ -137,8 +239,8 @@ class TerraformBackendManager:
             logger.error(f"퍼블릭 접근 차단 설정 실패: {str(e)}")
             return False
 
-    def set_https_only_policy(self):
-        policy = {
+    def https_only_policy(self):
+        return {
             "Version": "2012-10-17",
             "Statement": [
                 {
@@ -157,10 +259,12 @@ class TerraformBackendManager:
                 }
             ]
         }
+
+    def set_https_only_policy(self):
         try:
             self.s3_client.put_bucket_policy(
                 Bucket=self.bucket_name,
-                Policy=json.dumps(policy)
+                Policy=json.dumps(self.https_only_policy())
             )
             logger.info("🔐 HTTPS 전용 접근 정책 적용 완료")
             return True
@@ -171,35 +275,30 @@ class TerraformBackendManager:
     def create_dynamodb_table(self):
         try:
             try:
-                self.dynamodb.describe_table(TableName=self.ddb_table)
+                table = self.dynamodb.describe_table(TableName=self.ddb_table)['Table']
                 logger.warning(f"⚠️ 이미 존재하는 테이블: {self.ddb_table}")
+                # 예전에 만든 테이블은 스트림이 없어 lock_cleaner 이벤트 소스 매핑을 만들 수 없다
+                if not table.get('StreamSpecification', {}).get('StreamEnabled'):
+                    self.enable_lock_stream()
+                    logger.info(f"📡 기존 테이블에 잠금 스트림 활성화: {self.ddb_table}")
             except self.dynamodb.exceptions.ResourceNotFoundException:
                 self.dynamodb.create_table(
                     TableName=self.ddb_table,
                     AttributeDefinitions=[{'AttributeName': 'LockID', 'AttributeType': 'S'}],
                     KeySchema=[{'AttributeName': 'LockID', 'KeyType': 'HASH'}],
                     BillingMode='PAY_PER_REQUEST',
+                    StreamSpecification=self.lock_stream_specification(),
                     SSESpecification={
                         'Enabled': True,
                         'SSEType': 'KMS'
                     },
-                    Tags=[
-                        {'Key': 'Purpose', 'Value': 'TerraformLock'},
-                        {'Key': 'Environment', 'Value': 'Infrastructure'},
-                        {'Key': 'CreatedBy', 'Value': 'TerraformBackendManager'},
-                        {'Key': 'CreatedDate', 'Value': datetime.now().strftime("%Y-%m-%d")}
-                    ]
+                    Tags=self.resource_tags('TerraformLock', Environment='Infrastructure')
                 )
                 logger.info(f"✅ DynamoDB 테이블 생성 완료: {self.ddb_table}")
                 self.wait_for_resource("DynamoDB 테이블", self.ddb_table, "get_ddb_table_status", "ACTIVE")
 
             try:
-                time.sleep(2)
-                self.dynamodb.update_continuous_backups(
-                    TableName=self.ddb_table,
-                    PointInTimeRecoverySpecification={'PointInTimeRecoveryEnabled': True}
-                )
-                logger.info("💾 DynamoDB 연속 백업 활성화 완료")
+                self.enable_point_in_time_recovery()
             except Exception as backup_error:
                 logger.warning(f"⚠️ DynamoDB 백업 설정 실패 (무시됨): {str(backup_error)}")
 
@@ -208,12 +307,40 @@ class TerraformBackendManager:
             logger.error(f"DynamoDB 테이블 생성 실패: {str(e)}")
             return False
 
+    def lock_stream_specification(self):
+        # 잠금 획득/해제를 lock_cleaner가 스트림으로 받아 기한이 지난 잠금만 정리한다
+        return {'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+
+    def enable_lock_stream(self):
+        self._retry_with_backoff(
+            lambda: self.dynamodb.update_table(
+                TableName=self.ddb_table,
+                StreamSpecification=self.lock_stream_specification()
+            ),
+            retry_codes=("ResourceInUseException", "LimitExceededException")
+        )
+        logger.info("📡 DynamoDB 잠금 스트림 활성화 완료")
+
+    def enable_point_in_time_recovery(self):
+        # 테이블 생성 직후에는 연속 백업을 아직 켤 수 없으므로 고정 대기 대신 백오프로 재시도
+        self._retry_with_backoff(
+            lambda: self.dynamodb.update_continuous_backups(
+                TableName=self.ddb_table,
+                PointInTimeRecoverySpecification={'PointInTimeRecoveryEnabled': True}
+            ),
+            retry_codes=("ContinuousBackupsUnavailableException", "ResourceInUseException")
+        )
+        logger.info("💾 DynamoDB 연속 백업 활성화 완료")
+
     def _get_github_thumbprint(self):
         return "6938fd4d98bab03faadb97b34396831e3780aea1"
 
+    def github_oidc_provider_arn(self):
+        return f"arn:aws:iam::{self.get_account_id()}:oidc-provider/{GITHUB_OIDC_URL}"
+
     def ensure_github_oidc_provider(self):
-        oidc_url = "token.actions.githubusercontent.com"
-        provider_arn = f"arn:aws:iam::{self.get_account_id()}:oidc-provider/{oidc_url}"
+        oidc_url = GITHUB_OIDC_URL
+        provider_arn = self.github_oidc_provider_arn()
         try:
             try:
                 self.iam.get_open_id_connect_provider(OpenIDConnectProviderArn=provider_arn)
@@ -221,152 +348,179 @@ class TerraformBackendManager:
                 return provider_arn
             except self.iam.exceptions.NoSuchEntityException:
                 thumbprint = self._get_github_thumbprint()
-                response = self.iam.create_open_id_connect_provider(
-                    Url=f"https://{oidc_url}",
-                    ClientIDList=["sts.amazonaws.com"],
-                    ThumbprintList=[thumbprint]
-                )
+                try:
+                    response = self.iam.create_open_id_connect_provider(
+                        Url=f"https://{oidc_url}",
+                        ClientIDList=["sts.amazonaws.com"],
+                        ThumbprintList=[thumbprint],
+                        Tags=self.resource_tags('GitHubOIDC')
+                    )
+                except self.iam.exceptions.EntityAlreadyExistsException:
+                    # 같은 계정의 다른 백엔드(fleet 동시 실행)가 조회와 생성 사이에 먼저 만들었다
+                    logger.info(f"✓ GitHub OIDC 제공자를 다른 작업이 먼저 생성함: {oidc_url}")
+                    return provider_arn
                 logger.info(f"✅ GitHub OIDC 제공자 생성 완료: {oidc_url}")
                 return response['OpenIDConnectProviderArn']
         except Exception as e:
             logger.error(f"GitHub OIDC 제공자 생성 실패: {str(e)}")
             raise
 
+    def github_oidc_role_name(self, repo_name):
+        return f"{GITHUB_OIDC_ROLE_PREFIX}{repo_name}"
+
+    def github_trust_policy(self, provider_arn, repo_owner, repo_name):
+        return {
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Principal": {"Federated": provider_arn},
+                    "Action": "sts:AssumeRoleWithWebIdentity",
+                    "Condition": {
+                        "StringEquals": {
+                            "token.actions.githubusercontent.com:sub": f"repo:{repo_owner}/{repo_name}:environment:production",
+                            "token.actions.githubusercontent.com:aud": "sts.amazonaws.com"
+                        }
+                    }
+                }
+            ]
+        }
+
+    def terraform_state_policy(self, account_id):
+        policy = {
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "iam:CreateRole",
+                        "iam:PutRolePolicy",
+                        "iam:CreatePolicy",
+                        "iam:AttachRolePolicy",
+                        "iam:DetachRolePolicy",
+                        "iam:GetRole",
+                        "iam:GetPolicy",
+                        "iam:GetRolePolicy",
+                        "iam:GetPolicyVersion",
+                        "iam:ListRolePolicies",
+                        "iam:ListAttachedRolePolicies",
+                        "iam:ListPolicyVersions",
+                        "iam:ListInstanceProfilesForRole",
+                        "iam:DeletePolicy",
+                        "iam:DeleteRole",
+                        "iam:PassRole",
+                        "iam:DeleteRolePolicy"
+                    ],
+                    "Resource": f"arn:aws:iam::{account_id}:role/tf-*"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "s3:GetObject", "s3:PutObject", "s3:ListBucket"
+                    ],
+                    "Resource": [
+                        f"arn:aws:s3:::{self.bucket_name}",
+                        f"arn:aws:s3:::{self.bucket_name}/*"
+                    ]
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:DeleteItem", "dynamodb:CreateTable", "dynamodb:DescribeTable"
+                    ],
+                    "Resource": f"arn:aws:dynamodb:{self.region}:{account_id}:table/{self.ddb_table}"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "sns:ListTopics", "sns:GetTopicAttributes", "sns:ListTagsForResource", "sns:Subscribe", "sns:Unsubscribe", "sns:GetSubscriptionAttributes"
+                    ],
+                    "Resource": "*"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "lambda:GetFunctionCodeSigningConfig", "lambda:GetFunction", "lambda:ListVersionsByFunction", "lambda:AddPermission",
+                        "lambda:InvokeFunction", "lambda:GetFunctionConfiguration", "lambda:CreateFunction", "lambda:UpdateFunctionCode",
+                        "lambda:GetPolicy", "lambda:RemovePermission", "lambda:DeleteFunction",
+                        "lambda:CreateEventSourceMapping", "lambda:GetEventSourceMapping", "lambda:UpdateEventSourceMapping",
+                        "lambda:DeleteEventSourceMapping"
+                    ],
+                    "Resource": "*"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": "dynamodb:DescribeStream",
+                    "Resource": f"arn:aws:dynamodb:{self.region}:{account_id}:table/{self.ddb_table}/stream/*"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": "iam:PassRole",
+                    "Resource": f"arn:aws:iam::{account_id}:role/lockcleaner-role*"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "events:PutRule", "events:PutTargets", "events:DescribeRule", "events:RemoveTargets", "events:DeleteRule"
+                    ],
+                    "Resource": "arn:aws:events:ap-northeast-2:*:rule/tf-lock-cleaner-schedule-*"
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": "events:ListTagsForResource",
+                    "Resource": "arn:aws:events:ap-northeast-2:*:rule/tf-lock-cleaner-schedule-*"
+                }
+            ]
+        }
+        if self.snapshot_buckets:
+            # 배포 전/후 state_snapshot.py 업로드용. 스냅샷 버킷에는 쓰기만 허용한다
+            policy["Statement"].append({
+                "Effect": "Allow",
+                "Action": "s3:PutObject",
+                "Resource": [f"arn:aws:s3:::{bucket}/*" for bucket in self.snapshot_buckets]
+            })
+        return policy
+
+    def update_trust_policy(self, role_name, trust_policy):
+        self.iam.update_assume_role_policy(
+            RoleName=role_name,
+            PolicyDocument=json.dumps(trust_policy)
+        )
+        logger.info(f"🔄 IAM Role 신뢰 정책 업데이트 완료: {role_name}")
+
+    def put_state_access_policy(self, role_name, account_id):
+        self.iam.put_role_policy(
+            RoleName=role_name,
+            PolicyName=STATE_ACCESS_POLICY_NAME,
+            PolicyDocument=json.dumps(self.terraform_state_policy(account_id))
+        )
+        logger.info("📝 IAM Role에 최소 권한 정책 적용 완료")
+
     def create_github_oidc_role(self, repo_owner, repo_name):
         if not self._validate_github_repo(repo_owner, repo_name):
             raise ValueError(f"유효하지 않은 GitHub 저장소: {repo_owner}/{repo_name}")
 
-        role_name = f"GitHubTerraformOIDCRole-{repo_name}"
+        role_name = self.github_oidc_role_name(repo_name)
         account_id = self.get_account_id()  # Move this line here
 
         try:
             provider_arn = self.ensure_github_oidc_provider()
-            trust_policy = {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Principal": {"Federated": provider_arn},
-                        "Action": "sts:AssumeRoleWithWebIdentity",
-                        "Condition": {
-                            "StringEquals": {
-                                "token.actions.githubusercontent.com:sub": f"repo:{repo_owner}/{repo_name}:environment:production",
-                                "token.actions.githubusercontent.com:aud": "sts.amazonaws.com"
-                            }
-                        }
-                    }
-                ]
-            }
+            trust_policy = self.github_trust_policy(provider_arn, repo_owner, repo_name)
 
             try:
                 self.iam.get_role(RoleName=role_name)
                 logger.warning(f"⚠️ 이미 존재하는 IAM Role: {role_name}")
-                self.iam.update_assume_role_policy(
-                    RoleName=role_name,
-                    PolicyDocument=json.dumps(trust_policy)
-                )
-                logger.info(f"🔄 IAM Role 신뢰 정책 업데이트 완료: {role_name}")
+                self.update_trust_policy(role_name, trust_policy)
             except self.iam.exceptions.NoSuchEntityException:
                 self.iam.create_role(
                     RoleName=role_name,
                     AssumeRolePolicyDocument=json.dumps(trust_policy),
                     Description=f"GitHub Actions OIDC Role for {repo_owner}/{repo_name}",
-                    Tags=[
-                        {'Key': 'Purpose', 'Value': 'GitHubOIDC'},
-                        {'Key': 'Repository', 'Value': f"{repo_owner}/{repo_name}"},
-                        {'Key': 'CreatedBy', 'Value': 'TerraformBackendManager'},
-                        {'Key': 'CreatedDate', 'Value': datetime.now().strftime("%Y-%m-%d")}
-                    ]
+                    Tags=self.resource_tags('GitHubOIDC', Repository=f"{repo_owner}/{repo_name}")
                 )
                 logger.info(f"✅ IAM Role 생성 완료: {role_name}")
 
-            terraform_policy = {
-    "Version": "2012-10-17",
-    "Statement": [
-        {
-            "Effect": "Allow",
-            "Action": [
-                "iam:CreateRole",
-                "iam:PutRolePolicy",
-                "iam:CreatePolicy",
-                "iam:AttachRolePolicy",
-                "iam:DetachRolePolicy",
-                "iam:GetRole",
-                "iam:GetPolicy",
-                "iam:GetRolePolicy",
-                "iam:GetPolicyVersion",
-                "iam:ListRolePolicies",
-                "iam:ListAttachedRolePolicies",
-                "iam:ListPolicyVersions",
-                "iam:ListInstanceProfilesForRole",
-                "iam:DeletePolicy",
-                "iam:DeleteRole",
-                "iam:PassRole",
-                "iam:DeleteRolePolicy"
-            ],
-            "Resource": f"arn:aws:iam::{account_id}:role/tf-*"
-        },
-        {
-            "Effect": "Allow",
-            "Action": [
-                "s3:GetObject", "s3:PutObject", "s3:ListBucket"
-            ],
-            "Resource": [
-                f"arn:aws:s3:::{self.bucket_name}",
-                f"arn:aws:s3:::{self.bucket_name}/*"
-            ]
-        },
-        {
-            "Effect": "Allow",
-            "Action": [
-                "dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:DeleteItem", "dynamodb:CreateTable", "dynamodb:DescribeTable"
-            ],
-            "Resource": f"arn:aws:dynamodb:{self.region}:{account_id}:table/{self.ddb_table}"
-        },
-        {
-            "Effect": "Allow",
-            "Action": [
-                "sns:ListTopics", "sns:GetTopicAttributes", "sns:ListTagsForResource", "sns:Subscribe", "sns:Unsubscribe", "sns:GetSubscriptionAttributes"
-            ],
-            "Resource": "*"
-        },
-        {
-            "Effect": "Allow",
-            "Action": [
-                "lambda:GetFunctionCodeSigningConfig", "lambda:GetFunction", "lambda:ListVersionsByFunction", "lambda:AddPermission",
-                "lambda:InvokeFunction", "lambda:GetFunctionConfiguration", "lambda:CreateFunction", "lambda:UpdateFunctionCode",
-                "lambda:GetPolicy", "lambda:RemovePermission", "lambda:DeleteFunction"
-            ],
-            "Resource": "*"
-        },
-        {
-            "Effect": "Allow",
-            "Action": "iam:PassRole",
-            "Resource": f"arn:aws:iam::{account_id}:role/lockcleaner-role*"
-        },
-        {
-            "Effect": "Allow",
-            "Action": [
-                "events:PutRule", "events:PutTargets", "events:DescribeRule", "events:RemoveTargets", "events:DeleteRule"
-            ],
-            "Resource": "arn:aws:events:ap-northeast-2:*:rule/lockcleaner-schedule"
-        },
-        {
-            "Effect": "Allow",
-            "Action": "events:ListTagsForResource",
-            "Resource": "arn:aws:events:ap-northeast-2:*:rule/lockcleaner-schedule"
-        }
-    ]
-}
-
-
-            self.iam.put_role_policy(
-                RoleName=role_name,
-                PolicyName="TerraformStateAccess",
-                PolicyDocument=json.dumps(terraform_policy)
-            )
-
-            logger.info("📝 IAM Role에 최소 권한 정책 적용 완료")
+            self.put_state_access_policy(role_name, account_id)
 
             return f"arn:aws:iam::{account_id}:role/{role_name}"
         except Exception as e:
@@ -381,8 +535,10 @@ if __name__ == "__main__":
         bucket_name = input("\U0001FAA3 상태 저장용 S3 버킷 이름: ").strip()
         repo_owner = input("\U0001F419 GitHub 저장소 Owner (예: your-org): ").strip()
         repo_name = input("📁 GitHub 저장소 Name (예: your-repo): ").strip()
+        snapshot_buckets = input("📸 배포 전/후 상태 스냅샷 버킷 (쉼표 구분, 없으면 Enter): ").strip()
 
-        manager = TerraformBackendManager(region, bucket_name)
+        manager = TerraformBackendManager(region, bucket_name,
+                                          snapshot_buckets=[b.strip() for b in snapshot_buckets.split(",") if b.strip()])
 
         print("""
 \U0001F4A1 실행할 작업을 선택하세요:
@@ -390,6 +546,8 @@ if __name__ == "__main__":
 2. DynamoDB 테이블 생성
 3. GitHub OIDC 역할 생성 + 정책 적용
 4. 전체 자동 실행 (1~3)
+5. 변경된 설정만 반영 (reconcile)
+6. 변경 계획만 확인 (plan)
         """)
         choice = input("👉 번호 입력 (예: 1): ").strip()
 
@@ -404,12 +562,16 @@ if __name__ == "__main__":
             manager.create_github_oidc_role(repo_owner, repo_name)
 
         elif choice == "4":
-            if manager.create_s3_bucket():
-                manager.set_https_only_policy()
-            manager.create_dynamodb_table()
-            manager.create_github_oidc_role(repo_owner, repo_name)
+            from provisioning import provision_backend
+            provision_backend(manager, repo_owner, repo_name)
+
+        elif choice in ("5", "6"):
+            from reconcile import BackendReconciler
+            BackendReconciler(manager, repo_owner, repo_name).reconcile(dry_run=(choice == "6"))
 
         print("\n✅ 선택한 작업이 완료되었습니다!")
 
     except Exception as e:
-        logger.error(f"프로그램 실행 중 오류 발생: {str(e)}")
\ No newline at end of file
+        logger.error(f"프로그램 실행 중 오류 발생: {str(e)}")
+    finally:
+        print("\n" + metrics.summary_table())
\ No newline at end of file
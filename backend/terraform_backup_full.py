@@ -1,6 +1,19 @@
-# ✅ Lambda 코드(zip) 생성 + 락 클리너 배포 포함
-from terraform_lambda_sns import create_lambda_zip, deploy_lock_cleaner_lambda
+# ✅ Lambda 코드(zip) 생성 (tfstate 비교 + 락 클리너, 배포는 Terraform이 담당)
+import boto3
+from botocore.config import Config
+
+import lambda_modules  # noqa: F401
+from aws_metrics import instrument_client
+from terraform_lambda_sns import create_lambda_zip
 from terraform_backend_minimum import TerraformBackendManager
+from provisioning import provision_backend
+from state_backup import COPY_RETRIES, StateBackup
+
+
+def copy_client(region):
+    # 복사 요청은 StateBackup의 AdaptiveConcurrency가 스로틀을 직접 받아 재시도한다
+    return instrument_client(boto3.client("s3", region_name=region, config=Config(retries=COPY_RETRIES)))
+
 
 if __name__ == "__main__":
     print("\U0001F4E6 Terraform Backend 전체 자동화 (S3 + DynamoDB + GitHub OIDC + Lambda)")
@@ -10,18 +23,28 @@ if __name__ == "__main__":
         bucket_name = input("\U0001FAA3 상태 저장용 S3 버킷 이름: ").strip()
         repo_owner = input("\U0001F419 GitHub 저장소 Owner (예: your-org): ").strip()
         repo_name = input("📁 GitHub 저장소 Name (예: your-repo): ").strip()
+        backup_region = input("\U0001F30F 백업 리전 (비우면 상태 백업 생략): ").strip()
+        backup_bucket = input("\U0001F5C4 백업용 S3 버킷 이름: ").strip() if backup_region else ""
 
         manager = TerraformBackendManager(region, bucket_name)
 
-        print("\n✅ Lambda 패키징 및 Cleaner 배포 시작...")
+        print("\n✅ Lambda 패키징 시작 (tfstate 비교 + 락 클리너)...")
         create_lambda_zip()
-        deploy_lock_cleaner_lambda()
 
         print("\n✅ 백엔드 리소스 생성 시작...")
-        if manager.create_s3_bucket():
-            manager.set_https_only_policy()
-        manager.create_dynamodb_table()
-        manager.create_github_oidc_role(repo_owner, repo_name)
+        provision_backend(manager, repo_owner, repo_name)
+
+        if backup_bucket:
+            # 백업 버킷도 같은 기준(버전 관리/암호화/퍼블릭 차단)으로 만들고, 바뀐 버전만 서버측 복사한다
+            print("\n✅ 상태 백업 시작 (교차 리전 증분 복사)...")
+            backup_manager = TerraformBackendManager(backup_region, backup_bucket)
+            if not backup_manager.create_s3_bucket():
+                raise RuntimeError(f"백업 버킷 준비 실패: {backup_bucket}")
+            summary = StateBackup(manager.s3_client, bucket_name, backup_manager.s3_client, backup_bucket,
+                                  source_copy_s3=copy_client(region),
+                                  dest_copy_s3=copy_client(backup_region)).run()
+            if summary["failed"]:
+                print(f"⚠️ 백업 실패 {len(summary['failed'])}건 (다음 실행에서 이어서 복사)")
 
         print("\n✅ 전체 자동화 완료!")
 
@@ -0,0 +1,47 @@
+# TerraformBackendManager import + 생성 비용 측정 (네트워크/자격 증명 불필요)
+# 사용법: python benchmarks/bench_startup.py [--runs 10]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+
+# 매 실행을 새 프로세스에서 돌려 모듈 캐시 없이 CLI 시작 비용을 그대로 잰다
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+from terraform_backend_minimum import TerraformBackendManager
+t1 = time.perf_counter()
+TerraformBackendManager("ap-northeast-2", "startup-benchmark-bucket")
+t2 = time.perf_counter()
+TerraformBackendManager("ap-northeast-2", "startup-benchmark-bucket-2")
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "construct": t2 - t1, "construct_again": t3 - t2}))
+"""
+
+
+def run_probe():
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    output = subprocess.run([sys.executable, "-c", PROBE], env=env, cwd=BACKEND_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TerraformBackendManager 시작 비용 벤치마크")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    print(f"📏 {args.runs}회 실행 (중앙값 / 최댓값, ms)")
+    for phase in ("import", "construct", "construct_again"):
+        values = [sample[phase] * 1000 for sample in samples]
+        print(f"  {phase:<16} {statistics.median(values):>8.1f} / {max(values):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+# 관리자/클리너/tfstate 비교의 오프라인 벤치마크 (moto로 AWS를 로컬에서 대체)
+#
+# 사용법:
+#   pip install -r benchmarks/requirements.txt
+#   python benchmarks/run_benchmarks.py                       # 전체 실행 → benchmarks/results/<시각>-<커밋>.json
+#   python benchmarks/run_benchmarks.py --quick               # 작은 규모만
+#   python benchmarks/run_benchmarks.py --only tfstate_diff   # 이름에 포함된 케이스만
+#   python benchmarks/run_benchmarks.py --compare old.json new.json
+#
+# 각 케이스마다 실행 시간, 최대 메모리(tracemalloc), AWS API 호출 수(작업별)를 기록한다.
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, os.path.join(ROOT, "backend", "lambda_package"))
+
+# 실제 계정에 닿지 않도록 가짜 자격 증명과 기본값을 먼저 설정
+os.environ.update({
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_DEFAULT_REGION": "ap-northeast-2",
+    "PRE_DEPLOY_STATE_BUCKET": "bench-pre-state",
+    "POST_DEPLOY_STATE_BUCKET": "bench-post-state",
+})
+os.environ.pop("AWS_PROFILE", None)
+
+from moto import mock_aws  # noqa: E402
+from moto.core.botocore_stubber import BotocoreStubber  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+REGION = os.environ["AWS_DEFAULT_REGION"]
+
+# --- AWS 호출 집계 -----------------------------------------------------------------
+# moto는 모든 요청을 before-send 핸들러 하나로 처리한다. 여기서 작업 이름별로 호출을 센다.
+# moto 백엔드는 스레드 안전하지 않으므로 실제 단일 로컬 서버처럼 요청을 하나씩 처리한다.
+api_calls = Counter()
+_stand_in_lock = threading.Lock()
+_original_stubber_call = BotocoreStubber.__call__
+
+
+def _counting_stubber_call(self, event_name, request, **kwargs):
+    with _stand_in_lock:
+        response = _original_stubber_call(self, event_name, request, **kwargs)
+        if response is not None:
+            api_calls[event_name.split(".", 1)[1]] += 1
+        return response
+
+
+BotocoreStubber.__call__ = _counting_stubber_call
+
+
+# --- 합성 데이터 -------------------------------------------------------------------
+def synthetic_state(resource_count, serial=1, seed=0, changed_ratio=0.0, churn_ratio=0.0):
+    rng = random.Random(seed)
+    resources = []
+    for i in range(resource_count):
+        if churn_ratio and rng.random() < churn_ratio:
+            i += resource_count  # 주소를 바꿔 추가/삭제를 만든다
+        changed = changed_ratio and rng.random() < changed_ratio
+        attributes = {
+            "id": f"res-{i}",
+            "arn": f"arn:aws:s3:::bench-{i}",
+            "tags": {"Name": f"bench-{i}", "Owner": "platform" if not changed else "infra"},
+            "policy": json.dumps({"Version": "2012-10-17", "Statement": [
+                {"Effect": "Allow", "Action": ["s3:GetObject"], "Resource": f"arn:aws:s3:::bench-{i}/*"}]}),
+            "ingress": [{"from_port": 443, "to_port": 443, "cidr_blocks": ["10.0.0.0/16"]}],
+            "versioning": [{"enabled": True, "mfa_delete": False}],
+        }
+        resources.append({
+            "module": f"module.m{i % 20}",
+            "mode": "managed",
+            "type": "aws_s3_bucket",
+            "name": f"b{i // 20}",
+            "provider": "provider[\"registry.terraform.io/hashicorp/aws\"]",
+            "instances": [{"index_key": i % 3, "schema_version": 0, "attributes": attributes}],
+        })
+    state = {"version": 4, "terraform_version": "1.5.7", "serial": serial,
+             "lineage": "bench-lineage", "outputs": {}, "resources": resources}
+    return json.dumps(state).encode("utf-8")
+
+
+# --- 케이스 ------------------------------------------------------------------------
+def case_tfstate_diff(size):
+    import lambda_function
+    from tfstate_reader import TfstateReader
+
+    pre_raw = synthetic_state(size, serial=1)
+    post_raw = synthetic_state(size, serial=2, seed=1, changed_ratio=0.05, churn_ratio=0.01)
+
+    def run():
+        pre = lambda_function.extract_resources(TfstateReader(io.BytesIO(pre_raw)).resources())
+        post = lambda_function.extract_resources(TfstateReader(io.BytesIO(post_raw)).resources())
+        lambda_function.compare_resources(pre, post)
+    return run, {"resources": size, "state_bytes": len(post_raw)}
+
+
+def case_lambda_handler(size):
+    import boto3
+    import lambda_function
+    from state_cache import StateCache
+
+    s3 = boto3.client("s3", region_name=REGION)
+    for bucket in (os.environ["PRE_DEPLOY_STATE_BUCKET"], os.environ["POST_DEPLOY_STATE_BUCKET"]):
+        s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_object(Bucket=os.environ["PRE_DEPLOY_STATE_BUCKET"], Key=lambda_function.PRE_STATE_KEY,
+                  Body=synthetic_state(size, serial=1))
+    s3.put_object(Bucket=os.environ["POST_DEPLOY_STATE_BUCKET"], Key=lambda_function.POST_STATE_KEY,
+                  Body=synthetic_state(size, serial=2, seed=1, changed_ratio=0.05, churn_ratio=0.01))
+    topic = boto3.client("sns", region_name=REGION).create_topic(Name="bench-topic")["TopicArn"]
+    lambda_function.SNS_TOPIC_ARN = topic
+    lambda_function.state_cache = StateCache(lambda_function.STATE_CACHE_MAX_BYTES)
+
+    def run():
+        result = lambda_function.lambda_handler({}, None)
+        if result.get("statusCode") == 500:
+            raise RuntimeError(result["body"])
+    return run, {"resources": size}
+
+
+def case_delete_s3_bucket(versions):
+    import boto3
+    from terraform_backend_cleaner import TerraformBackendCleaner
+
+    bucket = "bench-teardown-bucket"
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_versioning(Bucket=bucket, VersioningConfiguration={"Status": "Enabled"})
+    keys = max(1, versions // 10)
+    for i in range(versions):
+        s3.put_object(Bucket=bucket, Key=f"env:/ws{i % keys}/terraform.tfstate", Body=b"{}")
+    cleaner = TerraformBackendCleaner(REGION, bucket, "unused-table", "unused-role")
+
+    def run():
+        cleaner.delete_s3_bucket()
+        remaining = [b["Name"] for b in s3.list_buckets()["Buckets"] if b["Name"] == bucket]
+        if remaining:
+            raise RuntimeError("버킷이 삭제되지 않음")
+    return run, {"versions": versions}
+
+
+def write_inventory(s3, bucket, directory, rows_per_file=5000):
+    # S3 Inventory(CSV, 모든 버전)와 같은 배치: <루트>/<버킷>/<설정>/data/*.csv.gz + manifest.json
+    import csv
+    import gzip
+    from urllib.parse import quote_plus
+
+    rows = []
+    for page in s3.get_paginator("list_object_versions").paginate(Bucket=bucket):
+        for version in page.get("Versions", []):
+            rows.append([bucket, quote_plus(version["Key"]), version["VersionId"], str(version["IsLatest"]).lower(),
+                         "false", str(version["Size"])])
+        for marker in page.get("DeleteMarkers", []):
+            rows.append([bucket, quote_plus(marker["Key"]), marker["VersionId"], str(marker["IsLatest"]).lower(),
+                         "true", ""])
+    data_dir = os.path.join(directory, bucket, "all-versions", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    files = []
+    for index in range(0, len(rows), rows_per_file):
+        key = f"{bucket}/all-versions/data/part-{index // rows_per_file:05d}.csv.gz"
+        with gzip.open(os.path.join(directory, key), "wt", newline="") as f:
+            csv.writer(f).writerows(rows[index:index + rows_per_file])
+        files.append({"key": key})
+    manifest = os.path.join(directory, bucket, "all-versions", "2024-01-01T00-00Z", "manifest.json")
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    with open(manifest, "w") as f:
+        json.dump({"sourceBucket": bucket, "destinationBucket": "arn:aws:s3:::bench-inventory", "fileFormat": "CSV",
+                   "fileSchema": "Bucket, Key, VersionId, IsLatest, IsDeleteMarker, Size", "files": files}, f)
+    return manifest
+
+
+def case_delete_s3_bucket_inventory(versions):
+    import tempfile
+
+    import boto3
+    from s3_inventory import InventoryManifest, plan_inventory
+    from terraform_backend_cleaner import TerraformBackendCleaner
+
+    bucket = "bench-inventory-bucket"
+    s3 = boto3.client("s3", region_name=REGION)
+    s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": REGION})
+    s3.put_bucket_versioning(Bucket=bucket, VersioningConfiguration={"Status": "Enabled"})
+    keys = max(1, versions // 10)
+    for i in range(versions):
+        s3.put_object(Bucket=bucket, Key=f"env:/ws{i % keys}/terraform.tfstate", Body=b"{}")
+    inventory = InventoryManifest(write_inventory(s3, bucket, tempfile.mkdtemp(prefix="bench-inventory-")))
+    cleaner = TerraformBackendCleaner(REGION, bucket, "unused-table", "unused-role")
+
+    def run():
+        plan = plan_inventory(inventory)
+        if plan["versions"] != versions:
+            raise RuntimeError(f"인벤토리 버전 수 불일치: {plan['versions']}")
+        cleaner.delete_s3_bucket(inventory=inventory)
+        remaining = [b["Name"] for b in s3.list_buckets()["Buckets"] if b["Name"] == bucket]
+        if remaining:
+            raise RuntimeError("버킷이 삭제되지 않음")
+    return run, {"versions": versions}
+
+
+def case_create_s3_bucket(_):
+    from terraform_backend_minimum import TerraformBackendManager
+    manager = TerraformBackendManager(REGION, "bench-create-bucket")
+
+    def run():
+        if not manager.create_s3_bucket():
+            raise RuntimeError("버킷 생성 실패")
+    return run, {}
+
+
+def synthetic_locks(count, stale_ratio=0.5, now=None):
+    # Terraform S3 백엔드가 쓰는 형태의 잠금 항목과 -md5 다이제스트 항목
+    now = now or time.time()
+    items = []
+    for i in range(count):
+        age = 3600 if i < count * stale_ratio else 10
+        created = datetime.fromtimestamp(now - age, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f000Z")
+        info = json.dumps({"ID": f"lock-{i}", "Operation": "OperationTypeApply", "Who": "ci@runner",
+                           "Version": "1.5.7", "Created": created, "Path": f"bench/env{i}/terraform.tfstate"})
+        items.append({"LockID": {"S": f"bench/env{i}/terraform.tfstate"}, "Info": {"S": info}})
+        items.append({"LockID": {"S": f"bench/env{i}/terraform.tfstate-md5"}, "Digest": {"S": "0" * 32}})
+    return items
+
+
+def stream_records(items, released=()):
+    # DynamoDB Stream 레코드 형식 (INSERT는 잠금 획득, REMOVE는 해제)
+    records = [{"eventName": "INSERT", "eventSource": "aws:dynamodb",
+                "dynamodb": {"Keys": {"LockID": item["LockID"]}, "NewImage": item}} for item in items]
+    records += [{"eventName": "REMOVE", "eventSource": "aws:dynamodb",
+                 "dynamodb": {"Keys": {"LockID": {"S": lock_id}}}} for lock_id in released]
+    return records
+
+
+def _lock_table(count):
+    import boto3
+    import lock_cleaner
+
+    dynamodb = boto3.client("dynamodb", region_name=REGION)
+    dynamodb.create_table(TableName=lock_cleaner.table_name, BillingMode="PAY_PER_REQUEST",
+                          AttributeDefinitions=[{"AttributeName": "LockID", "AttributeType": "S"}],
+                          KeySchema=[{"AttributeName": "LockID", "KeyType": "HASH"}],
+                          StreamSpecification={"StreamEnabled": True, "StreamViewType": "NEW_AND_OLD_IMAGES"})
+    items = synthetic_locks(count)
+    for item in items:
+        dynamodb.put_item(TableName=lock_cleaner.table_name, Item=item)
+    return dynamodb, items
+
+
+def case_lock_sweep(count):
+    import lock_cleaner
+
+    dynamodb, _ = _lock_table(count)
+
+    def run():
+        totals = lock_cleaner.sweep_locks()
+        if totals.get("expired") != count // 2:
+            raise RuntimeError(f"만료 수 불일치: {totals}")
+    return run, {"locks": count}
+
+
+def case_lock_stream(count):
+    import lock_cleaner
+
+    dynamodb, items = _lock_table(count)
+    lock_cleaner.scheduler_role_arn = f"arn:aws:iam::123456789012:role/bench-scheduler"
+    lock_cleaner.expiry_target_arn = f"arn:aws:lambda:{REGION}:123456789012:function:bench-lock-cleaner"
+    lock_cleaner._scheduler = None
+    # 신선한 잠금의 절반은 같은 배치 안에서 해제된다
+    released = [item["LockID"]["S"] for item in items[count::2][::2] if "Info" in item]
+    records = stream_records(items, released)
+
+    def run():
+        stats = lock_cleaner.lambda_handler({"Records": records}, None)
+        if stats["expired"] != count // 2:
+            raise RuntimeError(f"만료 수 불일치: {stats}")
+    return run, {"locks": count, "records": len(records)}
+
+
+CASES = {
+    "tfstate_diff": (case_tfstate_diff, [1_000, 10_000, 100_000], [1_000]),
+    "lambda_handler": (case_lambda_handler, [1_000, 10_000, 100_000], [1_000]),
+    "delete_s3_bucket": (case_delete_s3_bucket, [1_000, 10_000], [1_000]),
+    "delete_s3_bucket_inventory": (case_delete_s3_bucket_inventory, [1_000, 10_000], [1_000]),
+    "create_s3_bucket": (case_create_s3_bucket, [None], [None]),
+    "lock_sweep": (case_lock_sweep, [100, 1_000], [100]),
+    "lock_stream": (case_lock_stream, [100, 1_000], [100]),
+}
+
+
+def measure(name, factory, size, trace_memory=True):
+    # tracemalloc은 실행 시간을 몇 배 늘리므로 시간만 볼 때는 --no-memory로 끈다
+    with mock_aws():
+        run, params = factory(size)
+        api_calls.clear()
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        error = None
+        try:
+            run()
+        except Exception as e:
+            error = str(e)
+        wall = time.perf_counter() - started
+        peak = None
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    result = {
+        "case": name if size is None else f"{name}[{size}]",
+        "params": params,
+        "wall_seconds": round(wall, 4),
+        "peak_memory_bytes": peak,
+        "api_calls": sum(api_calls.values()),
+        "api_calls_by_operation": dict(sorted(api_calls.items())),
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old_report = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new_report = json.load(f)
+    if old_report.get("tracemalloc") != new_report.get("tracemalloc"):
+        print("⚠️ 두 결과의 tracemalloc 설정이 달라 실행 시간을 직접 비교하기 어렵습니다")
+    old = {r["case"]: r for r in old_report["results"]}
+    new = {r["case"]: r for r in new_report["results"]}
+    print(f"{'케이스':<28} {'시간(s)':>18} {'메모리(MB)':>18} {'API 호출':>14}")
+    for case in sorted(old.keys() & new.keys()):
+        o, n = old[case], new[case]
+        time_delta = (n["wall_seconds"] / o["wall_seconds"] - 1) * 100 if o["wall_seconds"] else 0.0
+        memory = "-"
+        if o["peak_memory_bytes"] is not None and n["peak_memory_bytes"] is not None:
+            memory = f"{o['peak_memory_bytes'] / 2**20:.1f}→{n['peak_memory_bytes'] / 2**20:.1f}"
+        print(f"{case:<28} {o['wall_seconds']:>7.2f}→{n['wall_seconds']:<7.2f}{time_delta:+5.0f}% "
+              f"{memory:>18} {o['api_calls']:>6}→{n['api_calls']:<6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 성능 벤치마크")
+    parser.add_argument("--quick", action="store_true", help="작은 규모만 실행")
+    parser.add_argument("--only", action="append", default=[], help="이름에 이 문자열이 들어간 케이스만 실행")
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc 없이 실행 시간만 측정")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: benchmarks/results/<시각>-<커밋>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="두 결과 파일 비교")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    logging.disable(logging.INFO)
+    results = []
+    for name, (factory, sizes, quick_sizes) in CASES.items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        for size in (quick_sizes if args.quick else sizes):
+            result = measure(name, factory, size, trace_memory=not args.no_memory)
+            results.append(result)
+            status = f"❌ {result['error']}" if "error" in result else "✅"
+            memory = "-" if result["peak_memory_bytes"] is None else f"{result['peak_memory_bytes'] / 2**20:.1f}"
+            print(f"{status} {result['case']:<28} {result['wall_seconds']:>8.2f}s "
+                  f"{memory:>8}MB {result['api_calls']:>7} calls")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "tracemalloc": not args.no_memory,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n🧾 결과 저장: {output}")
+    return 1 if any("error" in result for result in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,4 +1,13 @@
-from backend.terraform_backend_minimum import TerraformBackendManager
+import os
+import sys
+
+# backend 모듈은 서로를 형제 모듈로 import 하므로 backend 디렉터리를 경로에 추가
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import lambda_modules  # noqa: F401
+from aws_metrics import metrics
+from provisioning import failed_steps, provision_backend
+from terraform_backend_minimum import TerraformBackendManager
 
 if __name__ == "__main__":
     print("\U0001f4e6 Terraform 백엔드 인프라 생성 CLI")
@@ -7,21 +16,21 @@ if __name__ == "__main__":
     bucket_name = input("📺 상태 저장용 S3 버킷 이름: ").strip()
     repo_owner = input("👩‍💼 GitHub 저장소 Owner (예: your-org): ").strip()
     repo_name = input("📁 GitHub 저장소 Name (예: your-repo): ").strip()
+    snapshot_buckets = input("📸 배포 전/후 상태 스냅샷 버킷 (쉼표 구분, 없으면 Enter): ").strip()
 
     try:
-        manager = TerraformBackendManager(region, bucket_name)
-
-        print("\n🔢 S3 버킷 생성 중...")
-        if manager.create_s3_bucket():
-            manager.set_https_only_policy()
-
-        print("\n📂 DynamoDB 테이블 생성 중...")
-        manager.create_dynamodb_table()
+        manager = TerraformBackendManager(region, bucket_name,
+                                          snapshot_buckets=[b.strip() for b in snapshot_buckets.split(",") if b.strip()])
 
-        print("\n🔐 GitHub OIDC 역할 생성 중...")
-        oidc_role_arn = manager.create_github_oidc_role(repo_owner, repo_name)
-        manager.combine_bucket_policies(oidc_role_arn)
+        # S3 / DynamoDB / OIDC 역할을 의존성 그래프에 따라 동시에 생성
+        print("\n🔢 백엔드 리소스 생성 중 (S3 · DynamoDB · GitHub OIDC)...")
+        results = provision_backend(manager, repo_owner, repo_name)
+        failed = failed_steps(results)
+        if failed:
+            raise RuntimeError(f"일부 단계 실패: {', '.join(failed)}")
 
         print("\n✅ 모든 백엔드 리소스가 성공적으로 생성되었습니다!")
     except Exception as e:
         print(f"\n❌ 오류 발생: {e}")
+    finally:
+        print("\n" + metrics.summary_table())
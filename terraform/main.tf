@@ -47,6 +47,15 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "arn:aws:s3:::${var.post_deploy_state_bucket}/*"
         ]
       },
+      {
+        Effect = "Allow",
+        Action = [
+          "s3:PutObject"
+        ],
+        Resource = [
+          "arn:aws:s3:::${var.post_deploy_state_bucket}/post_terraform.tfstate.digests.json.gz"
+        ]
+      },
       {
         Effect = "Allow",
         Action = [
@@ -58,23 +67,216 @@ resource "aws_iam_role_policy" "lambda_policy" {
   })
 }
 
+# 큰 비교 보고서를 S3에 올리고 presigned 링크를 만들 수 있도록 (report_bucket 지정 시에만)
+resource "aws_iam_role_policy" "lambda_report_policy" {
+  count = var.report_bucket == "" ? 0 : 1
+  name  = "tf-lambda-report-policy-${var.project_name}"
+  role  = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "s3:PutObject",
+          "s3:GetObject",
+          "s3:AbortMultipartUpload"
+        ],
+        Resource = "arn:aws:s3:::${var.report_bucket}/*"
+      }
+    ]
+  })
+}
+
+# 버전 관리되는 백엔드 버킷에서 과거 상태를 직접 읽어 비교 (mode = "history", state_bucket 지정 시에만)
+resource "aws_iam_role_policy" "lambda_history_policy" {
+  count = var.state_bucket == "" ? 0 : 1
+  name  = "tf-lambda-history-policy-${var.project_name}"
+  role  = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "s3:ListBucket",
+          "s3:ListBucketVersions"
+        ],
+        Resource = "arn:aws:s3:::${var.state_bucket}"
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "s3:GetObject",
+          "s3:GetObjectVersion"
+        ],
+        Resource = "arn:aws:s3:::${var.state_bucket}/*"
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "s3:PutObject"
+        ],
+        Resource = "arn:aws:s3:::${var.state_bucket}/*.history.jsonl.gz"
+      }
+    ]
+  })
+}
+
 resource "aws_lambda_function" "tfstate_compare" {
   function_name = "tfstate-compare-lambda-${var.project_name}"
   role          = aws_iam_role.lambda_role.arn
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.9"
-  timeout       = 10
-  filename      = "tfstate_compare.zip"
+  timeout       = var.compare_timeout
+  memory_size   = var.compare_memory_size
+
+  # 내용 해시로 이름 붙인 결정적 zip (backend/lambda_packaging.py가 생성)
+  filename         = var.lambda_artifacts["tfstate_compare"].filename
+  source_code_hash = var.lambda_artifacts["tfstate_compare"].source_code_hash
 
   environment {
     variables = {
       SNS_TOPIC_ARN            = var.sns_topic_arn
       PRE_DEPLOY_STATE_BUCKET  = var.pre_deploy_state_bucket
       POST_DEPLOY_STATE_BUCKET = var.post_deploy_state_bucket
+      REPORT_BUCKET            = var.report_bucket
+      STATE_BUCKET             = var.state_bucket
+      STATE_KEY                = var.state_key
     }
   }
 }
 
+resource "aws_iam_role_policy" "lock_cleaner_policy" {
+  name = "tf-lambda-lock-cleaner-policy-${var.project_name}"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:Scan",
+          "dynamodb:DeleteItem"
+        ],
+        Resource = "arn:aws:dynamodb:*:*:table/${var.lock_table_name}"
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ],
+        Resource = "arn:aws:dynamodb:*:*:table/${var.lock_table_name}/stream/*"
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "scheduler:CreateSchedule",
+          "scheduler:UpdateSchedule",
+          "scheduler:DeleteSchedule"
+        ],
+        Resource = "arn:aws:scheduler:*:*:schedule/default/tflock-*"
+      },
+      {
+        Effect   = "Allow",
+        Action   = "iam:PassRole",
+        Resource = aws_iam_role.lock_expiry_scheduler.arn
+      }
+    ]
+  })
+}
+
+# 잠금 만료 시각에 한 번만 실행되는 EventBridge Scheduler 일정이 lock_cleaner를 호출할 때 쓰는 역할
+resource "aws_iam_role" "lock_expiry_scheduler" {
+  name = "tf-lock-expiry-scheduler-role-${var.project_name}"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [{
+      Action    = "sts:AssumeRole",
+      Effect    = "Allow",
+      Principal = { Service = "scheduler.amazonaws.com" }
+    }]
+  })
+}
+
+resource "aws_iam_role_policy" "lock_expiry_scheduler" {
+  name = "tf-lock-expiry-scheduler-policy-${var.project_name}"
+  role = aws_iam_role.lock_expiry_scheduler.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [{
+      Effect   = "Allow",
+      Action   = "lambda:InvokeFunction",
+      Resource = aws_lambda_function.lock_cleaner.arn
+    }]
+  })
+}
+
+resource "aws_lambda_function" "lock_cleaner" {
+  function_name = "tf-lock-cleaner-lambda-${var.project_name}"
+  role          = aws_iam_role.lambda_role.arn
+  handler       = "lock_cleaner.lambda_handler"
+  runtime       = "python3.9"
+  timeout       = 60
+
+  filename         = var.lambda_artifacts["lock_cleaner"].filename
+  source_code_hash = var.lambda_artifacts["lock_cleaner"].source_code_hash
+
+  environment {
+    variables = {
+      LOCK_TABLE_NAME         = var.lock_table_name
+      LOCK_SWEEP              = "true"
+      LOCK_SCHEDULER_ROLE_ARN = aws_iam_role.lock_expiry_scheduler.arn
+    }
+  }
+}
+
+# 잠금 획득/해제를 DynamoDB Stream으로 받아 만료 시각에만 정리한다 (유휴 시 테이블을 읽지 않음)
+data "aws_dynamodb_table" "lock" {
+  name = var.lock_table_name
+}
+
+# 스트림이 없는 예전 테이블에서는 매핑을 만들지 않는다 (백엔드 생성/reconcile이 스트림을 켜면 다음 apply에서 생성)
+resource "aws_lambda_event_source_mapping" "lock_stream" {
+  count = coalesce(data.aws_dynamodb_table.lock.stream_arn, "-") != "-" ? 1 : 0
+
+  event_source_arn                   = data.aws_dynamodb_table.lock.stream_arn
+  function_name                      = aws_lambda_function.lock_cleaner.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 5
+  maximum_retry_attempts             = 5
+  bisect_batch_on_function_error     = true
+}
+
+# 스트림 레코드가 유실된 경우를 위한 백스톱 스윕
+resource "aws_cloudwatch_event_rule" "lock_cleaner_schedule" {
+  name                = "tf-lock-cleaner-schedule-${var.project_name}"
+  schedule_expression = var.lock_cleaner_schedule
+}
+
+resource "aws_cloudwatch_event_target" "lock_cleaner" {
+  rule = aws_cloudwatch_event_rule.lock_cleaner_schedule.name
+  arn  = aws_lambda_function.lock_cleaner.arn
+}
+
+resource "aws_lambda_permission" "lock_cleaner_schedule" {
+  statement_id  = "AllowEventBridgeInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.lock_cleaner.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.lock_cleaner_schedule.arn
+}
+
 resource "null_resource" "trigger_tfstate_compare" {
   provisioner "local-exec" {
     command = <<EOT
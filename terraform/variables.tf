@@ -17,3 +17,53 @@ variable "sns_topic_arn" {
   type        = string
   description = "SNS 알림 수신 토픽 ARN"
 }
+
+variable "report_bucket" {
+  type        = string
+  description = "SNS 한도를 넘는 비교 보고서를 저장할 S3 버킷 (비우면 여러 건으로 나눠 전송)"
+  default     = ""
+}
+
+variable "lambda_artifacts" {
+  type = map(object({
+    filename         = string
+    source_code_hash = string
+  }))
+  description = "함수별 Lambda zip 경로와 해시 (lambda_artifacts.auto.tfvars.json에서 자동으로 읽음)"
+}
+
+variable "lock_table_name" {
+  type        = string
+  description = "Terraform 상태 잠금 DynamoDB 테이블 이름"
+  default     = "terraform-lock"
+}
+
+variable "lock_cleaner_schedule" {
+  type        = string
+  description = "스트림 기반 만료를 보완하는 전체 스윕 주기 (EventBridge 스케줄 표현식)"
+  default     = "rate(6 hours)"
+}
+
+variable "state_bucket" {
+  type        = string
+  description = "이력 비교에 쓸 버전 관리 Terraform 백엔드 버킷 (비우면 이력 비교 비활성)"
+  default     = ""
+}
+
+variable "state_key" {
+  type        = string
+  description = "이력 비교 기본 상태 파일 키"
+  default     = "global/s3/terraform.tfstate"
+}
+
+variable "compare_timeout" {
+  type        = number
+  description = "tfstate 비교 Lambda 제한 시간 (초)"
+  default     = 300
+}
+
+variable "compare_memory_size" {
+  type        = number
+  description = "tfstate 비교 Lambda 메모리 (MB), 드리프트 요약의 메모리 한도는 이 값의 절반"
+  default     = 1024
+}
@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+# Lambda 모듈은 배포 zip처럼 lambda_package 안에서 서로를 평평하게 import 한다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "lambda_package"))
+
+from deep_diff import decode_json_string, diff_attributes, format_changes, join_path
+
+
+def summary(changes):
+    return [(change.path, change.kind) for change in changes]
+
+
+def test_json_string_attributes_are_compared_structurally():
+    before = {"policy": json.dumps({"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "s3:GetObject"}]})}
+    # 키 순서와 공백만 다르면 변경이 아니다
+    reordered = {"policy": json.dumps({"Statement": [{"Action": "s3:GetObject", "Effect": "Allow"}],
+                                       "Version": "2012-10-17"}, indent=2)}
+    changed = {"policy": json.dumps({"Version": "2012-10-17", "Statement": [{"Effect": "Deny", "Action": "s3:GetObject"}]})}
+
+    assert diff_attributes(before, reordered) == ([], 0)
+    changes, _ = diff_attributes(before, changed)
+    assert summary(changes) == [("policy.Statement[0].Effect", "changed")]
+    assert (changes[0].before, changes[0].after) == ("Allow", "Deny")
+
+
+def test_decode_json_string_leaves_other_strings_alone():
+    assert decode_json_string('{"a": 1}') == {"a": 1}
+    assert decode_json_string("{not json}") == "{not json}"
+    assert decode_json_string('"quoted"') == '"quoted"'
+    assert decode_json_string(12) == 12
+
+
+def rule(port):
+    return {"from_port": port, "to_port": port, "protocol": "tcp"}
+
+
+def test_list_items_are_paired_by_hash_when_lengths_differ():
+    before = {"ingress": [rule(22), rule(80), rule(443)]}
+    # 앞에 하나가 끼어들어 뒤 원소의 위치가 모두 밀려도 새로 생긴 원소만 보고한다
+    after = {"ingress": [rule(8080), rule(22), rule(80), rule(443)]}
+
+    changes, _ = diff_attributes(before, after)
+
+    assert summary(changes) == [("ingress[0]", "added")]
+    assert changes[0].after == rule(8080)
+
+
+def test_unmatched_list_items_are_diffed_pairwise():
+    before = {"tags": [{"k": "a", "v": 1}, {"k": "b", "v": 2}]}
+    after = {"tags": [{"k": "a", "v": 1}, {"k": "b", "v": 3}, {"k": "c", "v": 4}]}
+
+    changes, _ = diff_attributes(before, after)
+
+    assert summary(changes) == [("tags[1].v", "changed"), ("tags[2]", "added")]
+
+
+def test_limit_truncates_and_format_reports_omitted():
+    before = {f"k{i}": i for i in range(5)}
+    after = {f"k{i}": i + 1 for i in range(5)}
+
+    changes, truncated = diff_attributes(before, after, limit=2)
+
+    assert (len(changes), truncated) == (2, 3)
+    assert format_changes(changes, truncated)[-1] == "    … 외 3건 생략"
+
+
+def test_join_path_quotes_non_identifier_keys():
+    assert join_path("", "tags") == "tags"
+    assert join_path("tags", "kubernetes.io/role") == 'tags["kubernetes.io/role"]'
+    assert join_path("ingress", 2) == "ingress[2]"
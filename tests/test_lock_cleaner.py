@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# Lambda 모듈은 배포 zip처럼 lambda_package 안에서 서로를 평평하게 import 한다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "lambda_package"))
+# lock_cleaner는 import 시점에 DynamoDB 클라이언트를 만든다
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+
+from lock_cleaner import is_digest_item, lock_created_at
+
+EPOCH = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("created, expected", [
+    ("2024-01-02T03:04:05Z", EPOCH),
+    # Go는 끝자리 0을 떼어 소수점 이하 자릿수가 제각각이고, 나노초까지 온다
+    ("2024-01-02T03:04:05.5Z", EPOCH + 0.5),
+    ("2024-01-02T03:04:05.1234Z", EPOCH + 0.1234),
+    ("2024-01-02T03:04:05.123456789Z", EPOCH + 0.123456),
+    ("2024-01-02T12:04:05.25+09:00", EPOCH + 0.25),
+])
+def test_lock_created_at_parses_terraform_timestamps(created, expected):
+    info = json.dumps({"ID": "1", "Operation": "OperationTypeApply", "Created": created})
+
+    assert lock_created_at(info) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("info", [None, "not json", json.dumps({"ID": "1"}), json.dumps({"Created": "yesterday"})])
+def test_lock_created_at_returns_none_for_unusable_info(info):
+    assert lock_created_at(info) is None
+
+
+def test_digest_items_are_not_locks():
+    assert is_digest_item({"LockID": "bucket/env/terraform.tfstate-md5", "Digest": "abc"})
+    assert not is_digest_item({"LockID": "bucket/env/terraform.tfstate", "Info": "{}"})
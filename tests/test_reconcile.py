@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import urllib.parse
+
+# backend 모듈은 서로를 형제 모듈로 import 하므로 backend 디렉터리를 경로에 추가
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from reconcile import MISSING, BackendReconciler, _policy_document, normalize_document, same_document
+from terraform_backend_minimum import TerraformBackendManager
+
+BUCKET = "reconcile-test-bucket"
+
+
+def test_normalize_document_matches_aws_rewrites():
+    desired = {"Statement": [{"Effect": "Deny", "Action": ["s3:*"], "Condition": {"Bool": {"aws:SecureTransport": False}},
+                              "Resource": ["arn:aws:s3:::b", "arn:aws:s3:::b/*"]}]}
+    # AWS는 원소 하나짜리 배열을 스칼라로, 불리언을 문자열로 돌려주고 배열 순서를 보장하지 않는다
+    actual = {"Statement": {"Resource": ["arn:aws:s3:::b/*", "arn:aws:s3:::b"], "Action": "s3:*", "Effect": "Deny",
+                            "Condition": {"Bool": {"aws:SecureTransport": "false"}}}}
+
+    assert normalize_document(actual) == normalize_document(desired)
+    assert same_document(actual, desired)
+
+
+def test_same_document_detects_real_changes_and_missing():
+    desired = {"BlockPublicAcls": True, "IgnorePublicAcls": True}
+
+    assert not same_document({"BlockPublicAcls": True, "IgnorePublicAcls": False}, desired)
+    assert not same_document(MISSING, desired)
+    assert not same_document(None, desired)
+
+
+def test_policy_document_decodes_url_encoded_json():
+    document = {"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "sts:AssumeRoleWithWebIdentity"}]}
+
+    assert _policy_document(urllib.parse.quote(json.dumps(document))) == document
+    assert _policy_document(document) is document
+
+
+def test_plan_skips_settings_already_in_sync():
+    manager = TerraformBackendManager("ap-northeast-2", BUCKET)
+    actual = {
+        "bucket": "ACTIVE",
+        "versioning": "Enabled",
+        "encryption": {"Rules": [{"ApplyServerSideEncryptionByDefault": {"SSEAlgorithm": "AES256"},
+                                  "BucketKeyEnabled": True}]},
+        "public_access_block": {"BlockPublicAcls": True, "IgnorePublicAcls": True,
+                                "BlockPublicPolicy": True, "RestrictPublicBuckets": True},
+        "bucket_policy": json.loads(json.dumps(manager.https_only_policy())),
+        "table": {"StreamSpecification": {"StreamEnabled": True, "StreamViewType": "NEW_AND_OLD_IMAGES"}},
+        "point_in_time_recovery": "DISABLED",
+    }
+
+    changes, skipped = BackendReconciler(manager).plan(actual)
+
+    assert [name for name, _ in changes] == ["point_in_time_recovery"]
+    assert "https_only_policy" in skipped and "lock_stream" in skipped
+
+
+def test_plan_creates_missing_resources_without_field_checks():
+    manager = TerraformBackendManager("ap-northeast-2", BUCKET)
+    actual = {"bucket": MISSING, "table": MISSING}
+
+    changes, skipped = BackendReconciler(manager).plan(actual)
+
+    assert [name for name, _ in changes] == ["s3_bucket", "https_only_policy", "dynamodb_table"]
+    assert skipped == []
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Lambda 모듈은 배포 zip처럼 lambda_package 안에서 서로를 평평하게 import 한다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "lambda_package"))
+
+from report import PART_MAX_BYTES, SNS_MAX_BYTES, _split_line, count_parts, iter_parts
+
+
+@pytest.mark.parametrize("offset", [0, 1, 2, 3])
+def test_split_line_cuts_on_utf8_boundaries(offset):
+    # 한글은 3바이트, 🪣는 4바이트라 한도가 글자 중간에 걸린다. 어느 위치에서 잘려도 조각이 깨지지 않아야 한다
+    line = "a" * offset + "가나다🪣" * 40000
+
+    pieces = list(_split_line(line, PART_MAX_BYTES))
+
+    assert "".join(pieces) == line
+    assert all(len(piece.encode("utf-8")) <= PART_MAX_BYTES for piece in pieces)
+    # 글자 경계까지 물러나는 것은 최대 3바이트 (4바이트 글자의 중간)
+    assert all(len(piece.encode("utf-8")) > PART_MAX_BYTES - 4 for piece in pieces[:-1])
+
+
+def test_iter_parts_keeps_each_part_under_sns_limit():
+    lines = [f"+ module.app.aws_s3_bucket.b[{i}] 버킷 {'가' * (i % 50)}" for i in range(20000)]
+    lines.insert(5000, "긴 줄 " + "나" * (PART_MAX_BYTES // 2))
+
+    parts = list(iter_parts(iter(lines)))
+
+    assert len(parts) > 1
+    assert all(len(part.encode("utf-8")) <= PART_MAX_BYTES < SNS_MAX_BYTES for part in parts)
+    # 한도보다 긴 줄만 여러 줄로 나뉘고 나머지 내용과 순서는 그대로다
+    assert "\n".join(parts) == "\n".join(piece for line in lines for piece in _split_line(line, PART_MAX_BYTES))
+    assert count_parts(lambda: iter(lines)) == len(parts)
+
+
+def test_iter_parts_small_report_is_one_part():
+    assert list(iter_parts(["첫 줄", "둘째 줄"])) == ["첫 줄\n둘째 줄"]
+    assert list(iter_parts([])) == []
@@ -0,0 +1,121 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+
+import pytest
+
+# backend 모듈은 서로를 형제 모듈로 import 하므로 backend 디렉터리를 경로에 추가
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from s3_inventory import InventoryManifest, plan_inventory
+
+SOURCE_BUCKET = "inventory-source-bucket"
+
+PARQUET_SCHEMA = ("message s3.inventory { required binary bucket (STRING); required binary key (STRING); "
+                  "optional binary version_id (STRING); optional boolean is_latest; "
+                  "optional boolean is_delete_marker; optional int64 size; }")
+
+
+def write_manifest(tmp_path, file_format, schema, data_keys):
+    manifest = {
+        "sourceBucket": SOURCE_BUCKET,
+        "destinationBucket": "arn:aws:s3:::inventory-destination",
+        "fileFormat": file_format,
+        "fileSchema": schema,
+        "files": [{"key": key} for key in data_keys],
+    }
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+    return str(path)
+
+
+def write_csv_gz(path, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wb") as f:
+        f.write(buffer.getvalue().encode("utf-8"))
+
+
+def test_csv_versions_and_plan(tmp_path):
+    write_csv_gz(tmp_path / "data" / "part-0.csv.gz", [
+        [SOURCE_BUCKET, "env/prod/terraform.tfstate", "v2", "true", "false", "120"],
+        [SOURCE_BUCKET, "env/prod/terraform.tfstate", "v1", "false", "false", "100"],
+        [SOURCE_BUCKET, "env/dev/my+state.tfstate", "", "true", "false", "7"],
+        [SOURCE_BUCKET, "old.tfstate", "v3", "true", "true", ""],
+    ])
+    location = write_manifest(tmp_path, "CSV", "Bucket, Key, VersionId, IsLatest, IsDeleteMarker, Size",
+                              ["data/part-0.csv.gz"])
+    manifest = InventoryManifest(location, root=str(tmp_path))
+
+    versions = list(manifest.versions())
+    assert versions[0] == {"Key": "env/prod/terraform.tfstate", "VersionId": "v2"}
+    # CSV 키는 URL 인코딩(+는 공백)되어 있고, 빈 VersionId는 "null"로 지운다
+    assert versions[2] == {"Key": "env/dev/my state.tfstate", "VersionId": "null"}
+
+    plan = plan_inventory(manifest, workers=4)
+    assert plan["source_bucket"] == SOURCE_BUCKET
+    assert (plan["versions"], plan["current"], plan["noncurrent"], plan["delete_markers"]) == (4, 2, 1, 1)
+    assert plan["bytes"] == 227
+    assert plan["delete_requests"] == 1
+
+
+def test_csv_without_version_id_is_rejected(tmp_path):
+    location = write_manifest(tmp_path, "CSV", "Bucket, Key, Size", [])
+    with pytest.raises(ValueError):
+        InventoryManifest(location, root=str(tmp_path))
+
+
+def test_parquet_snake_case_columns(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    (tmp_path / "data").mkdir()
+    pq.write_table(pa.table({
+        "bucket": [SOURCE_BUCKET] * 3,
+        "key": ["env/prod/terraform.tfstate", "env/prod/terraform.tfstate", "env/dev/terraform.tfstate"],
+        "version_id": ["v2", "v1", None],
+        "is_latest": [True, False, True],
+        "is_delete_marker": [False, False, True],
+        "size": [120, 100, None],
+    }), str(tmp_path / "data" / "part-0.parquet"))
+    location = write_manifest(tmp_path, "Parquet", PARQUET_SCHEMA, ["data/part-0.parquet"])
+    manifest = InventoryManifest(location, root=str(tmp_path))
+
+    # Parquet 키는 인코딩되지 않은 원래 키다
+    assert list(manifest.versions()) == [
+        {"Key": "env/prod/terraform.tfstate", "VersionId": "v2"},
+        {"Key": "env/prod/terraform.tfstate", "VersionId": "v1"},
+        {"Key": "env/dev/terraform.tfstate", "VersionId": "null"},
+    ]
+    plan = plan_inventory(manifest)
+    assert (plan["versions"], plan["current"], plan["noncurrent"], plan["delete_markers"]) == (3, 1, 1, 1)
+    assert plan["bytes"] == 220
+
+
+def test_columnar_schema_without_version_id_is_rejected(tmp_path):
+    schema = "struct<bucket:string,key:string,size:bigint,last_modified_date:timestamp>"
+    location = write_manifest(tmp_path, "ORC", schema, [])
+    with pytest.raises(ValueError):
+        InventoryManifest(location, root=str(tmp_path))
+
+
+def test_parquet_file_without_version_id_is_rejected(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    pq.write_table(pa.table({"bucket": [SOURCE_BUCKET], "key": ["a"], "size": [1]}), str(tmp_path / "part-0.parquet"))
+    # 스키마가 빠진 매니페스트도 파일을 읽을 때 필수 열을 확인한다
+    location = write_manifest(tmp_path, "Parquet", "", ["part-0.parquet"])
+    manifest = InventoryManifest(location, root=str(tmp_path))
+    with pytest.raises(ValueError):
+        list(manifest.versions())
+
+
+def test_delete_refuses_inventory_of_another_bucket(tmp_path):
+    from terraform_backend_cleaner import TerraformBackendCleaner
+
+    location = write_manifest(tmp_path, "CSV", "Bucket, Key, VersionId", [])
+    cleaner = TerraformBackendCleaner("ap-northeast-2")
+    assert cleaner.delete_s3_bucket("some-other-bucket", inventory=InventoryManifest(location), strategy="api") is False
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Lambda 모듈은 배포 zip처럼 lambda_package 안에서 서로를 평평하게 import 한다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "lambda_package"))
+# lambda_function은 import 시점에 boto3 클라이언트를 만든다
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+
+from state_cache import StateCache, estimate_size
+from state_index import ResourceRecord
+
+BUCKET = "state-cache-test-bucket"
+
+
+def records(count, prefix="r"):
+    return {f"{prefix}{i}": ResourceRecord.from_attributes({"i": i}) for i in range(count)}
+
+
+def test_put_evicts_least_recently_used_over_byte_limit():
+    small = records(1)
+    cache = StateCache(max_bytes=estimate_size(small) * 2)
+    cache.put("b", "one", '"e1"', small, {})
+    cache.put("b", "two", '"e2"', records(1, "s"), {})
+    # "one"을 최근에 썼으므로 세 번째 항목이 들어올 때 "two"가 밀려난다
+    assert cache.get("b", "one")[0] == '"e1"'
+    cache.put("b", "three", '"e3"', records(1, "t"), {})
+
+    assert cache.get("b", "two") is None
+    assert cache.get("b", "one") is not None and cache.get("b", "three") is not None
+
+
+def test_put_skips_entries_without_etag_or_over_limit():
+    cache = StateCache(max_bytes=estimate_size(records(2)))
+    cache.put("b", "k", '"e1"', records(1), {})
+    cache.put("b", "k", None, records(1), {})
+    cache.put("b", "big", '"e2"', records(50), {})
+
+    # ETag 없는 새 값은 이전 항목을 대체하지 못하고 지우기만 한다
+    assert cache.get("b", "k") is None
+    assert cache.get("b", "big") is None
+
+
+def test_load_state_reuses_parsed_state_on_not_modified():
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        import lambda_function
+
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "ap-northeast-2"})
+        state = {"version": 4, "serial": 3, "resources": [
+            {"mode": "managed", "type": "aws_s3_bucket", "name": "b", "instances": [{"attributes": {"bucket": "x"}}]}]}
+        s3.put_object(Bucket=BUCKET, Key="a.tfstate", Body=json.dumps(state).encode("utf-8"))
+        lambda_function.s3 = s3
+        lambda_function.state_cache = StateCache(1024 * 1024)
+
+        first, meta = lambda_function.load_state(BUCKET, "a.tfstate")
+        second, _ = lambda_function.load_state(BUCKET, "a.tfstate")
+
+        assert second is first
+        assert meta["serial"] == 3
+        assert (lambda_function.state_cache.hits, lambda_function.state_cache.misses) == (1, 1)
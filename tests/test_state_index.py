@@ -0,0 +1,48 @@
+import os
+import sys
+
+# Lambda 모듈은 배포 zip처럼 lambda_package 안에서 서로를 평평하게 import 한다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "lambda_package"))
+
+from state_index import ResourceRecord, classify_resources, extract_resources, resource_address
+
+
+def test_resource_address_includes_module_mode_and_index_key():
+    res = {"module": "module.net.module.vpc[\"a\"]", "mode": "data", "type": "aws_vpc", "name": "main"}
+
+    assert resource_address(res, {"index_key": "서울"}) == 'module.net.module.vpc["a"].data.aws_vpc.main["서울"]'
+    assert resource_address({"mode": "managed", "type": "aws_s3_bucket", "name": "b"},
+                            {"index_key": 0, "deposed": "00ab"}) == "aws_s3_bucket.b[0] (deposed 00ab)"
+
+
+def test_extract_resources_keeps_every_instance():
+    # 예전에는 type.name으로만 색인해 count/for_each 인스턴스가 서로 덮어썼다
+    state = [
+        {"mode": "managed", "type": "aws_sqs_queue", "name": "q",
+         "instances": [{"index_key": 0, "attributes": {"name": "a"}},
+                       {"index_key": 1, "attributes": {"name": "b"}}]},
+        {"module": "module.x", "mode": "managed", "type": "aws_sqs_queue", "name": "q",
+         "instances": [{"attributes": {"name": "c"}}]},
+    ]
+
+    resources = extract_resources(state)
+
+    assert sorted(resources) == ["aws_sqs_queue.q[0]", "aws_sqs_queue.q[1]", "module.x.aws_sqs_queue.q"]
+    assert resources["aws_sqs_queue.q[1]"].attributes == {"name": "b"}
+
+
+def test_record_digest_ignores_key_order_and_round_trips_canonical():
+    record = ResourceRecord.from_attributes({"b": 1, "a": [1, {"y": 2, "x": 1}]})
+    same = ResourceRecord.from_attributes({"a": [1, {"x": 1, "y": 2}], "b": 1})
+
+    assert record.digest == same.digest
+    assert ResourceRecord.from_canonical(record.canonical, record.digest).attributes == record.attributes
+
+
+def test_classify_resources_compares_digests_only():
+    pre = {"a": ResourceRecord.from_attributes({"v": 1}), "b": ResourceRecord.from_attributes({"v": 1}),
+           "c": ResourceRecord(b"digest-only")}
+    post = {"b": ResourceRecord.from_attributes({"v": 2}), "c": ResourceRecord(b"digest-only"),
+            "d": ResourceRecord.from_attributes({})}
+
+    assert classify_resources(pre, post) == (["d"], ["a"], ["b"])
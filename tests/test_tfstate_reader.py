@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+# Lambda 모듈은 배포 zip처럼 lambda_package 안에서 서로를 평평하게 import 한다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "lambda_package"))
+
+from tfstate_reader import TfstateReader
+
+STATE = {
+    "version": 4,
+    "terraform_version": "1.6.0",
+    "serial": 1234567,
+    "lineage": "3f1c-라인리지",
+    "outputs": {"bucket": {"value": "상태-버킷"}},
+    "resources": [
+        {"mode": "managed", "type": "aws_s3_bucket", "name": "state",
+         "instances": [{"attributes": {"bucket": "버킷-🪣", "tags": {"Name": "상태"}}}]},
+        {"mode": "data", "type": "aws_iam_policy_document", "name": "doc",
+         "instances": [{"attributes": {"json": "{\"Version\":\"2012-10-17\"}", "count": 10.25}}]},
+    ],
+    "check_results": None,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_resources_and_meta_survive_any_chunk_boundary(chunk_size):
+    # 1바이트 단위로 읽으면 멀티바이트 글자, 문자열, 버퍼 끝의 숫자(serial)가 모두 청크 경계에 걸린다
+    body = io.BytesIO(json.dumps(STATE, ensure_ascii=False, indent=2).encode("utf-8"))
+    reader = TfstateReader(body, chunk_size=chunk_size)
+
+    assert list(reader.resources()) == STATE["resources"]
+    assert reader.meta == {"version": 4, "terraform_version": "1.6.0", "serial": 1234567,
+                           "lineage": "3f1c-라인리지", "check_results": None}
+
+
+def test_number_at_end_of_buffer_is_not_truncated():
+    # 첫 청크가 "12"에서 끝나도 serial을 12로 읽지 않고 더 읽어서 끝까지 파싱한다
+    text = '{"serial": 123456789, "resources": []}'
+    reader = TfstateReader(io.BytesIO(text.encode("utf-8")), chunk_size=text.index("3"))
+
+    assert list(reader.resources()) == []
+    assert reader.meta["serial"] == 123456789
+
+
+def test_truncated_body_raises():
+    body = io.BytesIO(b'{"version": 4, "resources": [{"type": "aws_s3_bucket"')
+
+    with pytest.raises(ValueError):
+        list(TfstateReader(body, chunk_size=8).resources())